@@ -1,9 +1,6 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import pandas as pd
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
 import json
 import boto3
 import io
@@ -12,10 +9,20 @@ import requests
 import tempfile
 import base64
 from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.ticker import FuncFormatter
 from dotenv import load_dotenv
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
 import os
+from columnar import encode_dimensions, get_dimension_lookup, present_codes, code_mask
+from http_cache import conditional_json_response, json_payload
+from chart_render import new_figure
+from bedrock_client import get_bedrock_client, warm_up_in_background
+from entity_index import PROMPT_PRUNING, prompt_vocabulary
+from plan_prompt import PRUNED_NOTE
+from plan_stream import invoke_plan
+from date_index import filter_calendar
+from csv_ingest import load_csv_dataset
 
 
 load_dotenv()  
@@ -41,21 +48,21 @@ else:
     print("API Key is None or empty")
 
 anandhaas_data = None  
+# Summary of anandhaas_data and the serialized dashboard body, computed once per load
+anandhaas_analysis = None
+dashboard_payload = None
 last_pdf_data = {"data": None, "title": "", "insights": "", "filename": ""}  
 
 
 def load_anandhaas_data(csv_path: str = "anandhaas_data.csv") -> pd.DataFrame | None:
     try:
-        df = pd.read_csv(csv_path)
         required_cols = ["Branch Name", "Posting Date", "Group Name", "Category", "Row Total"]
-        missing_cols = [c for c in required_cols if c not in df.columns]
-        if missing_cols:
-            print(f"Missing required columns: {missing_cols}")
+        # Streams the CSV in typed chunks (sorted by date), or memory-maps the cached copy if the CSV is unchanged
+        df = load_csv_dataset(csv_path, required_cols, date_col="Posting Date")
+        if df is None:
             return None
-        df = df[required_cols].copy()
-        df["Posting Date"] = pd.to_datetime(df["Posting Date"], errors="coerce")
-        df["Row Total"] = pd.to_numeric(df["Row Total"], errors="coerce")
         df = df.dropna(subset=["Posting Date", "Row Total"])
+        df = encode_dimensions(df)
         print(f"Loaded Anandhaas data with {len(df)} records.")
         return df
     except Exception as e:
@@ -86,20 +93,28 @@ def analyze_anandhaas_structure(data: pd.DataFrame) -> dict:
     }
     return analysis
 
+def get_anandhaas_analysis() -> dict:
+    """analyze_anandhaas_structure() of the loaded data, computed once"""
+    global anandhaas_analysis
+    if anandhaas_analysis is None:
+        anandhaas_analysis = analyze_anandhaas_structure(anandhaas_data)
+    return anandhaas_analysis
+
 def get_ai_plan(query: str, data_analysis: dict) -> dict:
-    branches = data_analysis.get("branches", [])
-    categories = data_analysis.get("categories", [])
-    groups = data_analysis.get("groups", [])
+    vocabulary = prompt_vocabulary(query, data_analysis)
+    branches = vocabulary["branches"]
+    categories = vocabulary["categories"]
+    groups = vocabulary["groups"]
 
     try:
-        bedrock = boto3.client("bedrock-runtime", region_name="us-east-1")
+        bedrock = get_bedrock_client()
 
         prompt = f"""
 Analyze this business query about restaurant sales and create a visualization plan.
 
 Query: "{query}"
 
-Available Data:
+Available Data:{PRUNED_NOTE if PROMPT_PRUNING else ""}
 - Branches: {branches}
 - Categories: {categories}
 - Groups: {groups}
@@ -149,18 +164,8 @@ Rules:
                 "inferenceConfig": {"temperature": 0.1},
             }
         )
-        response = bedrock.invoke_model(modelId=BEDROCK_MODEL_ID, body=body)
-        raw = response["body"].read()
-        result = json.loads(raw)
-        ai_text = result["output"]["message"]["content"][0]["text"].strip()
-
-        if "{" in ai_text and "}" in ai_text:
-            start = ai_text.find("{")
-            end = ai_text.rfind("}") + 1
-            json_str = ai_text[start:end]
-            plan = json.loads(json_str)
-        else:
-            raise ValueError("Model did not return JSON")
+        # Streamed: the plan is parsed as it arrives and text after the JSON is not waited for
+        plan = invoke_plan(bedrock, BEDROCK_MODEL_ID, body).plan
 
         plan.setdefault("chart_type", "bar")
         plan.setdefault("x_axis", "Branch Name")
@@ -208,32 +213,28 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
     dual_metrics = ai_plan.get("dual_metrics", False) or ai_plan.get("y_axis") == "dual"
     
     if dual_metrics:
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(24, 10))
+        fig = new_figure((24, 10))
+        ax1, ax2 = fig.subplots(1, 2)
     else:
-        fig, ax = plt.subplots(figsize=(20, 12))
+        fig = new_figure((20, 12))
+        ax = fig.subplots()
     
     filtered_data = data.copy()
     filters = ai_plan.get("filters", [])
 
     for filter_type, filter_value in filters:
         if filter_type == "date_month":
-            filtered_data = filtered_data[
-                filtered_data["Posting Date"].dt.month == int(filter_value)
-            ]
+            filtered_data = filter_calendar(filtered_data, "Posting Date", "month", filter_value)
         elif filter_type == "date_month_in":
-            month_list = [int(m) for m in filter_value]
-            filtered_data = filtered_data[
-                filtered_data["Posting Date"].dt.month.isin(month_list)
-            ]
+            filtered_data = filter_calendar(filtered_data, "Posting Date", "month", filter_value)
         elif filter_type in ["Category", "Branch Name", "Group Name"]:
-            clean_data = filtered_data.dropna(subset=[filter_type])
-            mask = clean_data[filter_type].astype(str).str.contains(
-                str(filter_value), case=False, na=False
-            )
-            tmp = clean_data[mask]
-            if tmp.empty:
-                tmp = clean_data[clean_data[filter_type] == filter_value]
-            filtered_data = tmp
+            column = filtered_data[filter_type]
+            lookup = get_dimension_lookup(column)
+            vocab = lookup.lowered.iloc[present_codes(column)]
+            matched = vocab.str.contains(str(filter_value), case=False, na=False).to_numpy()
+            if not matched.any():
+                matched = (lookup.values.iloc[vocab.index] == filter_value).to_numpy()
+            filtered_data = filtered_data[code_mask(column, vocab.index[matched])]
         elif filter_type in ["Category_in", "Branch_in", "Group_in"]:
             col_map = {
                 "Category_in": "Category",
@@ -241,10 +242,8 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
                 "Group_in": "Group Name",
             }
             col = col_map[filter_type]
-            values = [str(v) for v in filter_value]
-            clean_data = filtered_data.dropna(subset=[col])
-            tmp = clean_data[clean_data[col].astype(str).isin(values)]
-            filtered_data = tmp
+            codes = get_dimension_lookup(filtered_data[col]).codes_for_values(filter_value)
+            filtered_data = filtered_data[code_mask(filtered_data[col], codes)]
 
     if filtered_data.empty:
         raise ValueError("No data found after applying filters.")
@@ -252,8 +251,8 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
     x_col = ai_plan.get("x_axis", "Branch Name")
     
     if dual_metrics:
-        revenue_data = filtered_data.groupby(x_col)["Row Total"].sum().sort_values(ascending=False)
-        count_data = filtered_data[x_col].value_counts().sort_values(ascending=False)
+        revenue_data = filtered_data.groupby(x_col, observed=True)["Row Total"].sum().sort_values(ascending=False)
+        count_data = filtered_data.groupby(x_col, observed=True).size().sort_values(ascending=False)
         
         # Revenue chart 
         bars1 = ax1.bar(range(len(revenue_data)), revenue_data.values, color='#1e40af', alpha=0.95, edgecolor='white', linewidth=1.5)
@@ -264,7 +263,7 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
         ax1.set_title("Revenue Analysis", fontsize=14, fontweight="bold")
         
         # Format Y-axis to show values in lakhs
-        ax1.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'{x/100000:.0f}'))
+        ax1.yaxis.set_major_formatter(FuncFormatter(lambda x, p: f'{x/100000:.0f}'))
         
         for i, bar in enumerate(bars1):
             height = bar.get_height()
@@ -280,7 +279,7 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
         ax2.set_title("Transaction Count", fontsize=14, fontweight="bold")
         
         # Format Y-axis for count 
-        ax2.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'{x/1000:.0f}k' if x >= 1000 else f'{x:.0f}'))
+        ax2.yaxis.set_major_formatter(FuncFormatter(lambda x, p: f'{x/1000:.0f}k' if x >= 1000 else f'{x:.0f}'))
         
         for i, bar in enumerate(bars2):
             height = bar.get_height()
@@ -305,9 +304,9 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
         agg_method = ai_plan.get("aggregation", "sum")
 
         if y_col == "count":
-            grouped_data = filtered_data[x_col].value_counts().sort_values(ascending=False)
+            grouped_data = filtered_data.groupby(x_col, observed=True).size().sort_values(ascending=False)
         else:
-            grouped_data = filtered_data.groupby(x_col)[y_col].agg(agg_method).sort_values(ascending=False)
+            grouped_data = filtered_data.groupby(x_col, observed=True)[y_col].agg(agg_method).sort_values(ascending=False)
 
         chart_type = ai_plan.get("chart_type", "bar")
 
@@ -347,7 +346,7 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
             ax.set_xlabel(x_col, fontsize=12, fontweight="bold")
             ax.set_ylabel(f"{y_col} {'(Lakhs)' if y_col == 'Row Total' else ''}", fontsize=12, fontweight="bold")
             if y_col == "Row Total":
-                ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'{x/100000:.0f}'))
+                ax.yaxis.set_major_formatter(FuncFormatter(lambda x, p: f'{x/100000:.0f}'))
             ax.grid(True, alpha=0.3)
         else:
             professional_colors = ['#1e40af', '#059669', '#d97706', '#dc2626', '#7c3aed', '#0891b2', '#65a30d', '#ea580c']
@@ -365,7 +364,7 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
             ax.set_xlabel(x_col, fontsize=12, fontweight="bold")
             ax.set_ylabel(f"{y_col} {'(Lakhs)' if y_col == 'Row Total' else ''}", fontsize=12, fontweight="bold")
             if y_col == "Row Total":
-                ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'{x/100000:.0f}'))
+                ax.yaxis.set_major_formatter(FuncFormatter(lambda x, p: f'{x/100000:.0f}'))
             for i, bar in enumerate(bars):
                 height = bar.get_height()
                 if y_col == "Row Total":
@@ -389,9 +388,9 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
     else:
         fig.suptitle(ai_plan.get("title", "Anandhaas Analysis"), fontsize=16, fontweight="bold")
     
-    plt.tight_layout()
+    fig.tight_layout()
     if dual_metrics:
-        plt.subplots_adjust(top=0.9)
+        fig.subplots_adjust(top=0.9)
     return chart_data, fig
 
 def generate_simple_response(ai_plan: dict) -> str:
@@ -481,7 +480,8 @@ def generate_pdf_report(fig, title, insights):
     with io.BytesIO() as pdf_buffer:
         with PdfPages(pdf_buffer) as pdf:
             pdf.savefig(fig, bbox_inches="tight", dpi=150)
-            fig_text, ax_text = plt.subplots(figsize=(6, 4))
+            fig_text = new_figure((6, 4))
+            ax_text = fig_text.subplots()
             ax_text.text(0.05, 0.95, title, fontsize=12, fontweight="bold", transform=ax_text.transAxes)
             ax_text.text(0.05, 0.85, "Key Insights:", fontsize=10, fontweight="bold", transform=ax_text.transAxes)
             insight_lines = insights.replace(". ", ".\n").split("\n")
@@ -492,7 +492,6 @@ def generate_pdf_report(fig, title, insights):
                     y_pos -= 0.08
             ax_text.axis("off")
             pdf.savefig(fig_text, bbox_inches="tight", dpi=150)
-            plt.close(fig_text)
         pdf_buffer.seek(0)
         return pdf_buffer.read()
 
@@ -506,11 +505,17 @@ def get_dashboard_data():
     if anandhaas_data is None:
         return jsonify({"error": "Data not available"}), 404
 
-    analysis = analyze_anandhaas_structure(anandhaas_data)
-    if analysis.get("date_range"):
-        analysis["date_range"]["start"] = analysis["date_range"]["start"].isoformat()
-        analysis["date_range"]["end"] = analysis["date_range"]["end"].isoformat()
-    return jsonify(analysis)
+    # The data never changes after loading: serialize once, answer repeat polls with 304
+    global dashboard_payload
+    if dashboard_payload is None:
+        analysis = dict(get_anandhaas_analysis())
+        if analysis.get("date_range"):
+            analysis["date_range"] = {
+                "start": analysis["date_range"]["start"].isoformat(),
+                "end": analysis["date_range"]["end"].isoformat(),
+            }
+        dashboard_payload = json_payload(analysis)
+    return conditional_json_response(*dashboard_payload)
 
 @app.route("/api/query", methods=["POST"])
 def process_query():
@@ -529,7 +534,7 @@ def process_query():
         detected_lang = detect_language(query)
         english_query = translate_tamil_to_english(query) if detected_lang == "tamil" else query
 
-        data_analysis = analyze_anandhaas_structure(anandhaas_data)
+        data_analysis = get_anandhaas_analysis()
         ai_plan = get_ai_plan(english_query, data_analysis)
         chart_data, fig = create_anandhaas_visualization(anandhaas_data, ai_plan)
         response_text = generate_simple_response(ai_plan)
@@ -551,7 +556,6 @@ def process_query():
             print(f"PDF generation error: {e}")
             pdf_b64 = None
 
-        plt.close(fig)
 
         return jsonify({
             "original_query": query,
@@ -709,4 +713,7 @@ def get_last_pdf_info():
         return jsonify({"available": False})
 
 if __name__ == "__main__":
+    # Open the Bedrock connection before the first question (not in the debug reloader's parent)
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        warm_up_in_background(BEDROCK_MODEL_ID)
     app.run(debug=True, port=5000)
@@ -1,9 +1,7 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
 import pandas as pd
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+import hashlib
 import json
 import boto3
 import io
@@ -11,12 +9,38 @@ import io
 import os
 import requests
 import tempfile
+import threading
+import time
 import base64
-from matplotlib.backends.backend_pdf import PdfPages
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from dotenv import load_dotenv
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
 import os
+from columnar import encode_dimensions, get_dimension_lookup
+from date_index import add_calendar_columns, filter_calendar, has_calendar_columns, month_columns
+from bitmap_index import get_bitmap_index
+from rollup import build_rollup_cube, cube_supports_plan, group_agg, group_size
+from s3_dataset import DATASET_COLUMNS, list_parquet_objects, load_parquet_dataset
+from dataset_cache import DEFAULT_CACHE_DIR, dataset_version, read_snapshot, write_snapshot
+from dataset_loader import DatasetLoader, DatasetSnapshot
+from http_cache import conditional_json_response, json_payload
+from bedrock_client import get_bedrock_client, warm_up_in_background
+from plan_cache import PlanCache, plan_cache_key
+from fast_plan import parse_query
+from plan_prompt import build_batch_plan_prompt, build_plan_prompt
+from plan_stream import invoke_plan, invoke_plan_list
+from speculation import Speculator
+from hedging import BudgetExceeded, Hedger
+from chart_render import (
+    FORMATS, PROFILES, RENDER_VERSION, ChartSpec, draw_chart, get_profile, other_label, profile_suffix, render_chart,
+    render_pages,
+)
+from render_cache import RenderCache, render_key
+from render_pool import RenderPool, RenderQueueFull
+from report_store import Report, ReportStore
+from timeseries import GRANULARITIES, downsample, period_labels, resample
 
 
 load_dotenv()  
@@ -41,42 +65,155 @@ if SARVAM_API_KEY:
 else:
     print("API Key is None or empty")
 
-anandhaas_data = None  
+# Set ANANDHAAS_FORCE_RAW_SCAN=1 (or send "force_raw": true with a query) to bypass the rollup cube
+FORCE_RAW_SCAN = os.getenv("ANANDHAAS_FORCE_RAW_SCAN", "").lower() in ("1", "true", "yes")
 last_pdf_data = {"data": None, "title": "", "insights": "", "filename": ""}  
-
-
-def load_anandhaas_data() -> pd.DataFrame | None:
-    """Load data from S3 parquet file"""
+# Local rule-based planner; plans below the confidence threshold go to the model
+FAST_PATH_ENABLED = os.getenv("ANANDHAAS_FAST_PATH", "1").lower() not in ("0", "false", "no")
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv("ANANDHAAS_FAST_PATH_MIN_CONFIDENCE", "1.0"))
+# Where each plan came from (reported by /api/plan-cache)
+plan_sources = {"fast_path": 0, "cache": 0, "model": 0, "fallback": 0}
+# Planning budget per /api/query, when to send a second (hedged) Bedrock request, and the local fallback
+PLAN_BUDGET_SECONDS = float(os.getenv("ANANDHAAS_PLAN_BUDGET_SECONDS", "10"))
+PLAN_HEDGE_SECONDS = float(os.getenv("ANANDHAAS_PLAN_HEDGE_SECONDS", "3"))
+PLAN_FALLBACK_ENABLED = os.getenv("ANANDHAAS_PLAN_FALLBACK", "1").lower() not in ("0", "false", "no")
+planner = Hedger(workers=int(os.getenv("ANANDHAAS_PLAN_WORKERS", "16")), name="plan")
+# Bedrock planning calls and the tokens they used (prompt size is what ANANDHAAS_PROMPT_PRUNING cuts)
+model_usage = {"calls": 0, "input_tokens": 0, "output_tokens": 0, "seconds": 0.0, "stopped_early": 0}
+# Hedge and batch threads update model_usage and plan_sources, sometimes after their request has returned
+usage_lock = threading.Lock()
+# Filter rows for the keyword parser's guess while Bedrock plans (ANANDHAAS_SPECULATION=0 to disable)
+SPECULATION_ENABLED = os.getenv("ANANDHAAS_SPECULATION", "1").lower() not in ("0", "false", "no")
+speculator = Speculator(workers=int(os.getenv("ANANDHAAS_SPECULATION_WORKERS", "2")))
+# /api/query/batch: questions per Bedrock call, questions per request, filter passes run at once
+BATCH_PLAN_SIZE = max(1, int(os.getenv("ANANDHAAS_BATCH_PLAN_SIZE", "8")))
+BATCH_MAX_QUERIES = int(os.getenv("ANANDHAAS_BATCH_MAX_QUERIES", "50"))
+batch_executor = ThreadPoolExecutor(max_workers=int(os.getenv("ANANDHAAS_BATCH_WORKERS", "4")), thread_name_prefix="batch")
+# Charts are drawn to PDF/PNG only when /api/report/<id> is first requested (ANANDHAAS_LAZY_RENDERING=0 to inline the PDF)
+LAZY_RENDERING = os.getenv("ANANDHAAS_LAZY_RENDERING", "1").lower() not in ("0", "false", "no")
+# Render profiles (chart_render.PROFILES) for the PDF sent to Slack, the inline PDF and the batch report pack
+SLACK_PROFILE = os.getenv("ANANDHAAS_SLACK_PROFILE", "slack")
+INLINE_PROFILE = os.getenv("ANANDHAAS_INLINE_PROFILE", "pdf")
+BATCH_PROFILE = os.getenv("ANANDHAAS_BATCH_PROFILE", "pdf")
+for _profile in (SLACK_PROFILE, INLINE_PROFILE, BATCH_PROFILE):
+    if get_profile(_profile).fmt != "pdf":
+        raise ValueError(f"Render profile {_profile} does not produce a PDF")
+# Charts are drawn in pre-started worker processes (ANANDHAAS_RENDER_WORKERS=0 draws in the request thread)
+RENDER_WORKERS = int(os.getenv("ANANDHAAS_RENDER_WORKERS", "2"))
+render_pool = RenderPool(
+    workers=RENDER_WORKERS,
+    max_queue=int(os.getenv("ANANDHAAS_RENDER_QUEUE", "16")),
+    max_jobs=int(os.getenv("ANANDHAAS_RENDER_MAX_JOBS", "200")),
+) if RENDER_WORKERS > 0 else None
+# Item and customer charts without a limit show the top N values and one "Other" bar for the rest (0 = all values)
+CHART_TOP_K = int(os.getenv("ANANDHAAS_CHART_TOP_K", "20"))
+HIGH_CARDINALITY_AXES = ("Item/Service Description", "Customer/Vendor Name")
+# How the per-value results of an aggregation combine into the "Other" value; mean, median etc. do not
+TAIL_COMBINE = {"sum": "sum", "count": "sum", "max": "max", "min": "min"}
+# Line charts over Date or Month are resampled per day/week/month and cut to this many points with LTTB
+LINE_MAX_POINTS = max(3, int(os.getenv("ANANDHAAS_LINE_MAX_POINTS", "500")))
+TIME_AXES = ("Date", "Month")
+DIMENSION_FILTERS = ("Category", "Item/Service Description", "Branch Name", "Group Name", "Customer/Vendor Name", "SubGroup")
+# Serialized /api/dashboard-data body and ETag, keyed by dataset version
+_dashboard_payload: dict[str, tuple[bytes, str]] = {}
+
+
+S3_BUCKET = os.getenv("ANANDHAAS_S3_BUCKET", "anandhaas")
+S3_PREFIX = os.getenv("ANANDHAAS_S3_PREFIX", "output/")
+# Only load the last N days of data (row groups older than that are never downloaded)
+DATA_LOOKBACK_DAYS = int(os.getenv("ANANDHAAS_LOOKBACK_DAYS", "0") or 0)
+DATA_CACHE_DIR = os.getenv("ANANDHAAS_CACHE_DIR", DEFAULT_CACHE_DIR)
+# How often the background loader checks S3 for a new dataset version (0 = load once)
+DATA_REFRESH_SECONDS = float(os.getenv("ANANDHAAS_REFRESH_SECONDS", "300"))
+# How long a request waits for the first load before answering 503
+DATA_WAIT_SECONDS = float(os.getenv("ANANDHAAS_DATA_WAIT_SECONDS", "300"))
+# LLM plans for repeated questions (empty ANANDHAAS_PLAN_CACHE_PATH = memory only)
+PLAN_CACHE_PATH = os.getenv("ANANDHAAS_PLAN_CACHE_PATH", os.path.join(DATA_CACHE_DIR, "plans.sqlite"))
+plan_cache = PlanCache(
+    PLAN_CACHE_PATH or None,
+    ttl_seconds=float(os.getenv("ANANDHAAS_PLAN_CACHE_TTL_SECONDS", "86400")),
+    max_entries=int(os.getenv("ANANDHAAS_PLAN_CACHE_MAX_ENTRIES", "5000")),
+    memory_entries=int(os.getenv("ANANDHAAS_PLAN_CACHE_MEMORY_ENTRIES", "256")),
+)
+# Rendered PDFs/PNGs on disk, keyed by plan, series and dataset version (0 bytes = off)
+RENDER_CACHE_BYTES = int(os.getenv("ANANDHAAS_RENDER_CACHE_MB", "256")) * 1024 * 1024
+render_cache = RenderCache(os.path.join(DATA_CACHE_DIR, "renders"), RENDER_CACHE_BYTES) if RENDER_CACHE_BYTES > 0 else None
+report_store = ReportStore(
+    max_reports=int(os.getenv("ANANDHAAS_REPORT_STORE_SIZE", "256")),
+    render=render_pool.render if render_pool is not None else render_chart,
+    cache=render_cache,
+)
+
+
+def dataset_source_version(s3_client) -> tuple[str, list[dict], pd.Timestamp | None]:
+    """Version key of the dataset currently in S3 (one LIST call)"""
+    since = None
+    if DATA_LOOKBACK_DAYS > 0:
+        since = pd.Timestamp.now().normalize() - pd.Timedelta(days=DATA_LOOKBACK_DAYS)
+    # Listing is cheap and carries ETag/LastModified for every object
+    objects = list_parquet_objects(s3_client, S3_BUCKET, S3_PREFIX)
+    version = dataset_version(objects, bucket=S3_BUCKET, since=since, columns=DATASET_COLUMNS)
+    return version, objects, since
+
+
+def load_anandhaas_data(s3_client=None, source=None) -> pd.DataFrame | None:
+    """Load data from the S3 parquet dataset, reusing the local snapshot when it is still current"""
     try:
-        s3_client = boto3.client('s3', region_name='us-east-1')
+        if s3_client is None:
+            s3_client = boto3.client('s3', region_name='us-east-1')
         
-        # S3 Configuration
-        S3_BUCKET = "anandhaas"
-        S3_KEY = "output/part-00000-0012309b-cf19-46df-b074-950f1ec8c616-c000.snappy.parquet"
+        version, objects, since = source or dataset_source_version(s3_client)
+        df = read_snapshot(DATA_CACHE_DIR, version)
+        if df is not None:
+            df = encode_dimensions(df)
+            return df if has_calendar_columns(df) else add_calendar_columns(df, "Date")
         
-        print(f"Loading parquet file: s3://{S3_BUCKET}/{S3_KEY}")
-        response = s3_client.get_object(Bucket=S3_BUCKET, Key=S3_KEY)
-        parquet_data = response['Body'].read()
-        
-        # Read parquet data
-        df = pd.read_parquet(io.BytesIO(parquet_data))
+        print(f"Loading parquet dataset: s3://{S3_BUCKET}/{S3_PREFIX}" + (f" (since {since.date()})" if since is not None else ""))
+        df = load_parquet_dataset(s3_client, S3_BUCKET, S3_PREFIX, columns=DATASET_COLUMNS, date_col="Date", since=since, objects=objects)
+        if df is None:
+            return None
         print(f" Loaded {len(df)} records from S3 parquet")
         print(f"Available columns: {list(df.columns)}")
         
         # Convert data types for processing
         df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
         df["Row Total"] = pd.to_numeric(df["Row Total"], errors="coerce")
+        df = encode_dimensions(df)
+        # Sorted by date with integer year/month/weekday columns for the filters
+        df = add_calendar_columns(df, "Date")
         
         print(f"Final dataset: {len(df)} records (no rows dropped)")
         print(f"Date range: {df['Date'].min()} to {df['Date'].max()}")
-        print(f"Sample branches: {df['Branch Name'].unique()[:5]}")
+        print(f"Sample branches: {list(df['Branch Name'].cat.categories[:5])}")
         
+        write_snapshot(DATA_CACHE_DIR, version, df)
         return df
         
     except Exception as e:
         print(f"Cannot load data from S3: {e}")
         return None
 
+def build_dataset_snapshot(s3_client=None) -> DatasetSnapshot | None:
+    """Load the current dataset version and everything derived from it"""
+    if s3_client is None:
+        s3_client = boto3.client('s3', region_name='us-east-1')
+    source = dataset_source_version(s3_client)
+    data = load_anandhaas_data(s3_client, source)
+    if data is None:
+        return None
+    cube = build_rollup_cube(data, date_col="Date")
+    # Build the filter indexes before the snapshot is served, not on the first query
+    get_bitmap_index(data)
+    if cube is not None:
+        get_bitmap_index(cube)
+    return DatasetSnapshot(version=source[0], data=data, cube=cube, analysis=analyze_anandhaas_structure(data))
+
+dataset_loader = DatasetLoader(
+    build_snapshot=build_dataset_snapshot,
+    source_version=lambda: dataset_source_version(boto3.client('s3', region_name='us-east-1'))[0],
+    refresh_seconds=DATA_REFRESH_SECONDS,
+)
+
 def analyze_anandhaas_structure(data: pd.DataFrame) -> dict:
     if data is None or data.empty:
         return {}
@@ -124,267 +261,256 @@ def analyze_anandhaas_structure(data: pd.DataFrame) -> dict:
     
     return analysis
 
-def get_ai_plan(query: str, data_analysis: dict) -> dict:
-    branches = data_analysis.get("branches", [])
-    categories = data_analysis.get("categories", [])
-    groups = data_analysis.get("groups", [])
-    customers = data_analysis.get("customers", [])
-    subgroups = data_analysis.get("subgroups", [])
-    items = data_analysis.get("items", [])
+def record_usage(usage: dict, seconds: float, stopped_early: bool = False) -> None:
+    """Add one Bedrock planning call to model_usage"""
+    with usage_lock:
+        model_usage["calls"] += 1
+        model_usage["input_tokens"] += usage.get("inputTokens", 0)
+        model_usage["output_tokens"] += usage.get("outputTokens", 0)
+        model_usage["seconds"] += seconds
+        model_usage["stopped_early"] += stopped_early
+
+def request_ai_plan(query: str, data_analysis: dict, on_attempt=None) -> dict:
+    """Ask the Bedrock model for a visualization plan and parse the JSON it returns
+
+    ``on_attempt()`` returns the ``on_field(key, value)`` callback for this
+    request, which sees each top-level plan field as it streams in.
+    """
+    bedrock = get_bedrock_client()
+    prompt = build_plan_prompt(query, data_analysis)
+    body = json.dumps(
+        {
+            "messages": [{"role": "user", "content": [{"text": prompt}]}],
+            "inferenceConfig": {"temperature": 0.1},
+        }
+    )
+    started = time.perf_counter()
+    # Streamed: the plan is parsed as it arrives and text after the JSON is not waited for
+    response = invoke_plan(bedrock, BEDROCK_MODEL_ID, body, on_field=on_attempt() if on_attempt else None)
+    record_usage(response.usage, time.perf_counter() - started, response.stopped_early)
+    
+    # Debug: Show what AI returned
+    print(f"DEBUG: AI Response ({len(prompt)} prompt chars, {response.usage.get('inputTokens')} input tokens, "
+          f"plan after {response.seconds:.2f}s): {response.text}")
+    return response.plan
+
+def plan_filters(plan: dict) -> list:
+    """The (filter type, value) pairs the visualization applies for ``plan``"""
+    filters = []
+
+    if plan.get("item_filters"):
+        if len(plan["item_filters"]) == 1:
+            filters.append(("Item/Service Description", plan["item_filters"][0]))
+        else:
+            filters.append(("Item/Service Description_in", plan["item_filters"]))
 
-    try:
-        bedrock = boto3.client("bedrock-runtime", region_name="us-east-1")
-
-        prompt = f"""
-Analyze this business query about restaurant sales and create a visualization plan.
-
-Query: "{query}"
-
-Available Data:
-- Branches: {branches}
-- Categories: {categories}
-- Items: {items[:50] if items else []}
-- Groups: {groups}
-- Customers: {customers[:20] if customers else []}
-- SubGroups: {subgroups}
-
-IMPORTANT: There are TWO different columns:
-1. "Category" - Food categories like "roast", "biriyani varieties", "coffee", etc.
-2. "Item/Service Description" - Specific food items like individual roast items, biriyani items, etc.
-
-Return ONLY valid JSON in this exact format:
-{{
-  "chart_type": "bar|pie|line|dual_bar",
-  "x_axis": "Branch Name|Group Name|Category|Item/Service Description|Customer/Vendor Name|SubGroup|Month|Date",
-  "y_axis": "Row Total|Quantity|count|dual",
-  "y_axis_secondary": null or "Row Total|Quantity|count",
-  "aggregation": "sum|mean|count",
-  "aggregation_secondary": null or "sum|mean|count",
-  "category_filters": null or [string, ...],
-  "item_filters": null or [string, ...],
-  "branch_filters": null or [string, ...],
-  "group_filters": null or [string, ...],
-  "customer_filters": null or [string, ...],
-  "subgroup_filters": null or [string, ...],
-  "month_filter": null or month_number or [month_numbers],
-  "date_filter": null or "YYYY-MM-DD" or ["YYYY-MM-DD", "YYYY-MM-DD"],
-  "year_filter": null or year_number or [year_numbers],
-  "limit": null or number,
-  "title": "chart title",
-  "dual_metrics": false or true,
-  "comparison_type": null or "monthly" or "metric"
-}}
-
-CRITICAL TITLE GENERATION RULES:
-- NEVER use "Vivi" or any made-up names in titles
-- Use ACTUAL branch names from the available data: {branches}
-- If query mentions specific branches, include those EXACT branch names in title
-- For branch analysis, use format: "[Branch Name] Revenue Analysis" or "Revenue Analysis by Branch"
-- For category analysis, use format: "[Category Name] Analysis" or "Analysis by Category"
-- For general queries, use descriptive titles like "Restaurant Revenue Analysis", "Sales Performance Analysis"
-- ALWAYS use real data values, never fictional names
-
-CRITICAL DISTINCTION RULES:
-- When user says "rava roast item" or "roast item" or "[anything] item" → ALWAYS use item_filters
-- When user says "rava roast category" or "roast category" or "[anything] category" → ALWAYS use category_filters
-- When user just says "rava roast" or "roast" without specifying item/category:
-  * If "rava roast" exists in categories, use category_filters: ["rava roast"]
-  * If "rava roast" exists in items, use item_filters: ["rava roast"]
-  * If both exist, prefer Category over Item
-- CRITICAL: If user explicitly mentions "item" anywhere in the query, ALWAYS use item_filters, NOT category_filters
-- CRITICAL: When user says "rava roast item", use item_filters: ["rava roast"] NOT ["Parcel Rava Roast"]
-- CRITICAL: Don't add prefixes like "Parcel" unless user specifically mentions them
-- CRITICAL: Use the EXACT term the user mentioned - if they say "rava roast", use "rava roast", not "parcel rava roast"
-
-Rules:
-- CRITICAL: TOP N QUERIES - Extract limit numbers from queries:
-  * "top 5", "top 10", "top 7", "first 5", "best 10" → extract as limit: 5, 10, 7, 5, 10
-  * "highest 3", "lowest 5", "bottom 10" → extract as limit: 3, 5, 10
-  * "show me 5", "give me 10", "list 7" → extract as limit: 5, 10, 7
-  * "Top 10 Roast Items" → extract as limit: 10
-  * "Top 5 branches" → extract as limit: 5
-  * ANY query with "top [NUMBER]" or "[NUMBER] top" → ALWAYS extract the NUMBER as limit
-  * When user specifies a number, ALWAYS extract it as limit
-  * If no number specified, set limit: null to show all results
-- Extract ALL filters from the query: categories, branches, groups, customers, subgroups, months, dates, and years
-- For months: january=1, february=2, march=3, april=4, may=5, june=6, july=7, august=8, september=9, october=10, november=11, december=12
-- For dates: extract specific dates ("2024-01-15") or date ranges (["2024-01-01", "2024-01-31"])
-- For years: extract year numbers (2023, 2024, etc.)
-- Groups are service types: "Parcel" (takeaway/delivery), "Line AC" (dine-in AC), "Line Non AC" (dine-in non-AC)
-- Categories are food items like "Biriyani Varieties", "Coffee", "Chappathi Single", etc.
-- Branches are locations: "VV", "SPM", "AVR", "RSP", "LMJ", "BRK", "GPM", "SBC", "GKNM"
-- CRITICAL: Extract ALL branch names mentioned in query, including variations:
-  * "VV branch" or "VV" → "VV"
-  * "SPM branch" or "SPM" → "SPM"
-  * "SBC branch" or "SBC" → "SBC"
-  * "GKNM branch" or "GKNM" → "GKNM"
-  * "AVR branch" or "AVR" → "AVR"
-  * Look for patterns like "X branch, Y branch, Z branch" or "X and Y and Z branches"
-  * Parse comma-separated lists: "VV, SPM, SBC, GKNM" should extract all four branches
-- When user mentions "parcel", "takeaway", "delivery" → use group_filters: ["Parcel"]
-- When user mentions "dine in AC", "AC hall" → use group_filters: ["Line AC"]
-- When user mentions "dine in", "hall", "non AC" → use group_filters: ["Line Non AC"]
-- When user mentions "customer", "vendor" → use x_axis: "Customer/Vendor Name" or customer_filters
-- When user mentions "subgroup" → use x_axis: "SubGroup" or subgroup_filters
-- If user asks "how many" or "count" with quantity → use y_axis: "Quantity" and aggregation: "sum"
-- If user asks "how many" or "count" without quantity → use y_axis: "count" and aggregation: "count"
-- For "each branch" or "by branch", use x_axis: "Branch Name"
-- For "each customer" or "by customer", use x_axis: "Customer/Vendor Name"
-- For "each subgroup" or "by subgroup", use x_axis: "SubGroup"
-- IMPORTANT: For "distribution", "breakdown", "share", "split", "proportion" → ALWAYS use chart_type: "pie"
-- For "comparison", "compare", "vs" → use bar chart
-- CRITICAL: When user mentions "by months", "monthly", "month wise", "each month" → use x_axis: "Month" NOT "Posting Date"
-- For time/trend with specific dates, use line chart with Posting Date
-- For monthly analysis, ALWAYS use x_axis: "Month" and chart_type: "bar"
-- For daily analysis over short periods, use x_axis: "Posting Date" and chart_type: "line"
-- For yearly comparisons, extract year_filter and use appropriate grouping
-- CRITICAL: DYNAMIC DUAL METRICS - Detect ANY combination of two metrics:
-  * "revenue and quantity" → y_axis: "Row Total", y_axis_secondary: "Quantity"
-  * "sales and count" → y_axis: "Row Total", y_axis_secondary: "count"
-  * "quantity and revenue" → y_axis: "Quantity", y_axis_secondary: "Row Total"
-  * "average revenue and total quantity" → y_axis: "Row Total", aggregation: "mean", y_axis_secondary: "Quantity", aggregation_secondary: "sum"
-  * "total sales and average quantity" → y_axis: "Row Total", aggregation: "sum", y_axis_secondary: "Quantity", aggregation_secondary: "mean"
-  * ANY query with "and" between two metrics → set dual_metrics: true, extract both metrics
-  * For comparison queries like "February vs March", use dual_metrics: true, comparison_type: "monthly"
-- CRITICAL: When user asks for roast count or any category count, include quantity in analysis by using y_axis: "Quantity" if available
-- CRITICAL: For category filtering, distinguish between similar items: "roast" should NOT include "rava roast", "dosa" should NOT include "masala dosa" unless specifically mentioned
-- Use exact matching first, then word boundary matching to avoid substring confusion
-- CRITICAL: Date filtering rules:
-  * "today", "yesterday" → extract current/previous date
-  * "last week", "this week" → extract date range
-  * "January 2024", "Jan 2024" → extract month and year filters
-  * "2024" → extract year filter
-  * "February 12th", "Feb 12", "12th February" → extract as "02-12" (MM-DD format)
-  * "February 12th, 2024" → extract as "2024-02-12"
-  * "from Jan 1 to Jan 31", "between 2024-01-01 and 2024-01-31" → extract date range
-  * "last 7 days", "past month" → calculate and extract date range
-- Match user terms intelligently to available data
-- IMPORTANT: When no year is specified in dates, assume current year (2025)
-"""
-        body = json.dumps(
-            {
-                "messages": [{"role": "user", "content": [{"text": prompt}]}],
-                "inferenceConfig": {"temperature": 0.1},
-            }
-        )
-        response = bedrock.invoke_model(modelId=BEDROCK_MODEL_ID, body=body)
-        raw = response["body"].read()
-        result = json.loads(raw)
-        ai_text = result["output"]["message"]["content"][0]["text"].strip()
-        
-        # Debug: Show what AI returned
-        print(f"DEBUG: AI Response: {ai_text}")
-
-        if "{" in ai_text and "}" in ai_text:
-            start = ai_text.find("{")
-            end = ai_text.rfind("}") + 1
-            json_str = ai_text[start:end]
-            plan = json.loads(json_str)
+    if plan.get("category_filters"):
+        if len(plan["category_filters"]) == 1:
+            filters.append(("Category", plan["category_filters"][0]))
         else:
-            raise ValueError("Model did not return JSON")
-        
-        # Debug: Show parsed plan
-        print(f"DEBUG: Parsed AI Plan: {plan}")
-
-        plan.setdefault("chart_type", "bar")
-        plan.setdefault("x_axis", "Branch Name")
-        plan.setdefault("y_axis", "Row Total")
-        plan.setdefault("aggregation", "sum")
-        plan.setdefault("title", "Anandhaas Revenue Analysis")
-        plan.setdefault("dual_metrics", False)
-        plan.setdefault("y_axis_secondary", None)
-        plan.setdefault("aggregation_secondary", None)
-        plan.setdefault("comparison_type", None)
-
-        filters = []
-
-        if plan.get("item_filters"):
-            if len(plan["item_filters"]) == 1:
-                filters.append(("Item/Service Description", plan["item_filters"][0]))
-            else:
-                filters.append(("Item/Service Description_in", plan["item_filters"]))
+            filters.append(("Category_in", plan["category_filters"]))
 
-        if plan.get("category_filters"):
-            if len(plan["category_filters"]) == 1:
-                filters.append(("Category", plan["category_filters"][0]))
-            else:
-                filters.append(("Category_in", plan["category_filters"]))
+    if plan.get("branch_filters"):
+        if len(plan["branch_filters"]) == 1:
+            filters.append(("Branch Name", plan["branch_filters"][0]))
+        else:
+            filters.append(("Branch_in", plan["branch_filters"]))
 
-        if plan.get("branch_filters"):
-            if len(plan["branch_filters"]) == 1:
-                filters.append(("Branch Name", plan["branch_filters"][0]))
-            else:
-                filters.append(("Branch_in", plan["branch_filters"]))
+    if plan.get("group_filters"):
+        if len(plan["group_filters"]) == 1:
+            filters.append(("Group Name", plan["group_filters"][0]))
+        else:
+            filters.append(("Group_in", plan["group_filters"]))
 
-        if plan.get("group_filters"):
-            if len(plan["group_filters"]) == 1:
-                filters.append(("Group Name", plan["group_filters"][0]))
-            else:
-                filters.append(("Group_in", plan["group_filters"]))
+    if plan.get("customer_filters"):
+        if len(plan["customer_filters"]) == 1:
+            filters.append(("Customer/Vendor Name", plan["customer_filters"][0]))
+        else:
+            filters.append(("Customer_in", plan["customer_filters"]))
 
-        if plan.get("customer_filters"):
-            if len(plan["customer_filters"]) == 1:
-                filters.append(("Customer/Vendor Name", plan["customer_filters"][0]))
-            else:
-                filters.append(("Customer_in", plan["customer_filters"]))
+    if plan.get("subgroup_filters"):
+        if len(plan["subgroup_filters"]) == 1:
+            filters.append(("SubGroup", plan["subgroup_filters"][0]))
+        else:
+            filters.append(("SubGroup_in", plan["subgroup_filters"]))
 
-        if plan.get("subgroup_filters"):
-            if len(plan["subgroup_filters"]) == 1:
-                filters.append(("SubGroup", plan["subgroup_filters"][0]))
-            else:
-                filters.append(("SubGroup_in", plan["subgroup_filters"]))
+    if plan.get("month_filter"):
+        month_val = plan["month_filter"]
+        if isinstance(month_val, list):
+            filters.append(("date_month_in", month_val))
+        else:
+            filters.append(("date_month", month_val))
 
-        if plan.get("month_filter"):
-            month_val = plan["month_filter"]
-            if isinstance(month_val, list):
-                filters.append(("date_month_in", month_val))
-            else:
-                filters.append(("date_month", month_val))
+    if plan.get("date_filter"):
+        date_val = plan["date_filter"]
+        if isinstance(date_val, list) and len(date_val) == 2:
+            filters.append(("date_range", date_val))
+        else:
+            filters.append(("date_specific", date_val))
 
-        if plan.get("date_filter"):
-            date_val = plan["date_filter"]
-            if isinstance(date_val, list) and len(date_val) == 2:
-                filters.append(("date_range", date_val))
-            else:
-                filters.append(("date_specific", date_val))
+    if plan.get("year_filter"):
+        year_val = plan["year_filter"]
+        if isinstance(year_val, list):
+            filters.append(("date_year_in", year_val))
+        else:
+            filters.append(("date_year", year_val))
+
+    return filters
+
+def local_plan(query: str, data_analysis: dict) -> tuple[dict | None, str, str | None]:
+    """(plan, source, plan cache key) without calling Bedrock; plan is None when the model is needed"""
+    # Questions the local parser fully understands never reach Bedrock
+    plan, confidence = parse_query(query, data_analysis) if FAST_PATH_ENABLED else (None, 0.0)
+    if plan is not None and confidence >= FAST_PATH_MIN_CONFIDENCE:
+        return plan, "fast_path", None
+    # Repeated questions are answered from the plan cache without calling Bedrock
+    cache_key = plan_cache_key(query, data_analysis, BEDROCK_MODEL_ID)
+    return plan_cache.get(cache_key), "cache", cache_key
+
+def finish_plan(plan: dict, plan_source: str) -> dict:
+    """Fill in plan defaults and the filters the visualization applies"""
+    with usage_lock:
+        plan_sources[plan_source] += 1
+    
+    # Debug: Show parsed plan
+    print(f"DEBUG: Parsed AI Plan ({plan_source}): {plan}")
+
+    plan.setdefault("chart_type", "bar")
+    plan.setdefault("x_axis", "Branch Name")
+    plan.setdefault("y_axis", "Row Total")
+    plan.setdefault("aggregation", "sum")
+    plan.setdefault("title", "Anandhaas Revenue Analysis")
+    plan.setdefault("dual_metrics", False)
+    plan.setdefault("y_axis_secondary", None)
+    plan.setdefault("aggregation_secondary", None)
+    plan.setdefault("comparison_type", None)
+
+    plan["filters"] = plan_filters(plan)
+    plan["plan_source"] = plan_source
+    plan["plan_cached"] = plan_source == "cache"
+    return plan
+
+def fallback_plan(query: str, data_analysis: dict, error: Exception) -> dict | None:
+    """A locally produced plan for when Bedrock is too slow or failing (None if there is none)"""
+    if not PLAN_FALLBACK_ENABLED:
+        return None
+    # Another request may have stored the model's plan in the meantime
+    plan = plan_cache.get(plan_cache_key(query, data_analysis, BEDROCK_MODEL_ID))
+    if plan is None:
+        plan, confidence = parse_query(query, data_analysis)
+        if plan is None:
+            return None
+    plan["degraded"] = True
+    plan["degraded_reason"] = "timeout" if isinstance(error, BudgetExceeded) else "error"
+    print(f"DEBUG: Planning {plan['degraded_reason']} ({error}); using a local plan")
+    return plan
 
-        if plan.get("year_filter"):
-            year_val = plan["year_filter"]
-            if isinstance(year_val, list):
-                filters.append(("date_year_in", year_val))
-            else:
-                filters.append(("date_year", year_val))
+def get_ai_plan(query: str, data_analysis: dict, budget: float | None = None, on_attempt=None) -> dict:
+    try:
+        plan, plan_source, cache_key = local_plan(query, data_analysis)
+        if plan is None:
+            started = time.perf_counter()
 
-        plan["filters"] = filters
-        return plan
+            def remember(model_plan):
+                plan_cache.put(cache_key, model_plan, time.perf_counter() - started, query=query)
+
+            try:
+                # A slow Bedrock answer gets a second request racing it; past the budget a local plan is used
+                plan = planner.hedged_call(
+                    request_ai_plan, (query, data_analysis, on_attempt),
+                    budget=PLAN_BUDGET_SECONDS if budget is None else budget,
+                    hedge_after=PLAN_HEDGE_SECONDS, on_late_result=remember,
+                )
+            except Exception as e:
+                plan = fallback_plan(query, data_analysis, e)
+                if plan is None:
+                    raise
+                return finish_plan(plan, "fallback")
+            remember(plan)
+            plan_source = "model"
+        return finish_plan(plan, plan_source)
 
     except Exception as e:
     
         print(f"AI model failed to process query: {str(e)}")
         raise
 
-def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
-    dual_metrics = ai_plan.get("dual_metrics", False) or ai_plan.get("y_axis") == "dual"
-    comparison_type = ai_plan.get("comparison_type", "metric")
-    
-    if dual_metrics:
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(24, 10))
-    else:
-        fig, ax = plt.subplots(figsize=(20, 12))
-    
-    filtered_data = data.copy()
-    filters = ai_plan.get("filters", [])
+def request_ai_plans(queries: list[str], data_analysis: dict) -> list[dict]:
+    """One Bedrock call planning several questions; plans come back in query order"""
+    bedrock = get_bedrock_client()
+    prompt = build_batch_plan_prompt(queries, data_analysis)
+    body = json.dumps(
+        {
+            "messages": [{"role": "user", "content": [{"text": prompt}]}],
+            "inferenceConfig": {"temperature": 0.1, "maxTokens": min(5000, 500 * len(queries))},
+        }
+    )
+    response = invoke_plan_list(bedrock, BEDROCK_MODEL_ID, body)
+    record_usage(response.usage, response.seconds)
+    print(f"DEBUG: AI Response for {len(queries)} queries ({len(prompt)} prompt chars, "
+          f"{response.usage.get('inputTokens')} input tokens): {response.text}")
+    if len(response.plan) != len(queries):
+        raise ValueError(f"Model returned {len(response.plan)} plans for {len(queries)} queries")
+    return response.plan
+
+def get_ai_plans(queries: list[str], data_analysis: dict) -> tuple[list[dict | Exception], int]:
+    """Plans for many questions, with several model questions per Bedrock call, and the Bedrock calls made.
+
+    A question that cannot be planned gets its exception in place of a plan.
+    """
+    model_calls = 0
+    plans: list = [None] * len(queries)
+    sources = [None] * len(queries)
+    # Model questions by plan cache key, so repeats in one batch are planned once
+    pending: dict[str, list[int]] = {}
+    for i, query in enumerate(queries):
+        plans[i], sources[i], cache_key = local_plan(query, data_analysis)
+        if plans[i] is None:
+            pending.setdefault(cache_key, []).append(i)
+
+    keys = list(pending)
+    for start in range(0, len(keys), BATCH_PLAN_SIZE):
+        chunk = keys[start:start + BATCH_PLAN_SIZE]
+        chunk_queries = [queries[pending[key][0]] for key in chunk]
+        started = time.perf_counter()
+        try:
+            planned = None
+            if len(chunk) > 1:
+                model_calls += 1
+                planned = request_ai_plans(chunk_queries, data_analysis)
+        except Exception as e:
+            print(f"Batch planning failed, planning one by one: {e}")
+            planned = None
+        if planned is None:
+            planned = []
+            for query in chunk_queries:
+                model_calls += 1
+                try:
+                    planned.append(request_ai_plan(query, data_analysis))
+                except Exception as e:
+                    print(f"AI model failed to process query: {str(e)}")
+                    planned.append(e)
+        elapsed = (time.perf_counter() - started) / len(chunk)
+        for key, query, plan in zip(chunk, chunk_queries, planned):
+            if not isinstance(plan, Exception):
+                plan_cache.put(key, plan, elapsed, query=query)
+            for n, i in enumerate(pending[key]):
+                # Repeats get their own copy; finish_plan fills plans in place
+                plans[i] = plan if n == 0 or isinstance(plan, Exception) else json.loads(json.dumps(plan))
+                sources[i] = "model" if n == 0 else "cache"
+
+    plans = [plan if isinstance(plan, Exception) else finish_plan(plan, source) for plan, source in zip(plans, sources)]
+    return plans, model_calls
+
+def select_plan_rows(data: pd.DataFrame, filters: list) -> pd.DataFrame:
+    """The rows of ``data`` (raw rows or the rollup cube) that pass every plan filter"""
+    # Filters narrow a packed row selection; the frame is materialized once below
+    index = get_bitmap_index(data)
+    selection = index.all_rows()
 
     for filter_type, filter_value in filters:
-        if filter_type == "date_month":
-            filtered_data = filtered_data[
-                filtered_data["Date"].dt.month == int(filter_value)
-            ]
-        elif filter_type == "date_month_in":
-            month_list = [int(m) for m in filter_value]
-            filtered_data = filtered_data[
-                filtered_data["Date"].dt.month.isin(month_list)
-            ]
+        if filter_type in ("date_month", "date_month_in"):
+            selection &= index.calendar_rows("month", filter_value)
         elif filter_type == "date_specific":
             try:
                 # Handle various date formats and add current year if missing
@@ -392,85 +518,34 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
                     current_year = pd.Timestamp.now().year
                     filter_value = f"{current_year}-{filter_value}"
                 target_date = pd.to_datetime(filter_value).date()
-                filtered_data = filtered_data[
-                    filtered_data["Date"].dt.date == target_date
-                ]
-                print(f"DEBUG: Date filter '{target_date}' resulted in {len(filtered_data)} records")
+                selection &= index.day_rows("Date", target_date)
+                print(f"DEBUG: Date filter '{target_date}' resulted in {index.count(selection)} records")
             except Exception as e:
                 print(f"DEBUG: Date parsing error for '{filter_value}': {e}")
                 continue
         elif filter_type == "date_range":
             start_date = pd.to_datetime(filter_value[0])
             end_date = pd.to_datetime(filter_value[1])
-            filtered_data = filtered_data[
-                (filtered_data["Date"] >= start_date) & 
-                (filtered_data["Date"] <= end_date)
-            ]
-        elif filter_type == "date_year":
-            filtered_data = filtered_data[
-                filtered_data["Date"].dt.year == int(filter_value)
-            ]
-        elif filter_type == "date_year_in":
-            year_list = [int(y) for y in filter_value]
-            filtered_data = filtered_data[
-                filtered_data["Date"].dt.year.isin(year_list)
-            ]
+            selection &= index.date_range_rows("Date", start_date, end_date)
+        elif filter_type in ("date_year", "date_year_in"):
+            selection &= index.calendar_rows("year", filter_value)
         elif filter_type in ["Category", "Item/Service Description", "Branch Name", "Group Name", "Customer/Vendor Name", "SubGroup"]:
             filter_value_str = str(filter_value).lower().strip()
+            lookup = get_dimension_lookup(data[filter_type])
+            # Term resolution runs on the (cached) vocabulary, restricted to values in the selection
+            match = lookup.fuzzy_codes(filter_value_str, index.present_codes(filter_type, selection))
+            selection &= index.value_rows(filter_type, match.codes)
+            matched_rows = index.count(selection)
             
-            # Debug: Show what we're looking for and what's available
-            available_items = filtered_data[filter_type].astype(str).str.lower().unique()
             print(f"DEBUG: Looking for '{filter_value_str}' in {filter_type}")
-            print(f"DEBUG: Available items: {sorted(available_items)}")
-            
-            # First try exact match
-            exact_match = filtered_data[filtered_data[filter_type].astype(str).str.lower().str.strip() == filter_value_str]
-            
-            if not exact_match.empty:
-                filtered_data = exact_match
-                print(f"DEBUG: Found exact match for '{filter_value_str}': {len(exact_match)} records")
+            if match.exact:
+                print(f"DEBUG: Found exact match for '{filter_value_str}': {matched_rows} records")
             else:
-                # Dynamic intelligent matching to avoid substring confusion
-                # Get all unique values in the column to check for conflicts
-                all_values = filtered_data[filter_type].astype(str).str.lower().unique()
-                
-                # Check if there are longer items that contain our search term
-                conflicting_items = [item for item in all_values if filter_value_str in item and item != filter_value_str]
-                print(f"DEBUG: Conflicting items found: {conflicting_items}")
-                
-                if conflicting_items:
-                    # Use word boundary matching to avoid substring matches
-                    pattern = r'\b' + filter_value_str.replace(' ', r'\s+') + r'\b'
-                    mask = filtered_data[filter_type].astype(str).str.contains(pattern, case=False, na=False, regex=True)
-                    
-                    # Additional exclusion for items that are clearly different
-                    for conflicting_item in conflicting_items:
-                        if len(conflicting_item.split()) > len(filter_value_str.split()):
-                            # Exclude longer compound items
-                            mask = mask & ~filtered_data[filter_type].astype(str).str.lower().str.contains(conflicting_item, case=False, na=False)
-                            print(f"DEBUG: Excluding conflicting item: '{conflicting_item}'")
-                else:
-                    # No conflicts, use simple word boundary matching
-                    pattern = r'\b' + filter_value_str.replace(' ', r'\s+') + r'\b'
-                    mask = filtered_data[filter_type].astype(str).str.contains(pattern, case=False, na=False, regex=True)
-                
-                tmp = filtered_data[mask]
-                if tmp.empty:
-                    # Fallback to simple contains if word boundary fails
-                    mask = filtered_data[filter_type].astype(str).str.contains(filter_value_str, case=False, na=False)
-                    tmp = filtered_data[mask]
-                
-                # Debug: Show what items were actually matched
-                matched_items = tmp[filter_type].astype(str).str.lower().unique()
-                print(f"DEBUG: Items matched for '{filter_value_str}': {sorted(matched_items)}")
-                
-                filtered_data = tmp
-                print(f"DEBUG: Filter '{filter_type}={filter_value}' resulted in {len(filtered_data)} records")
-                
-                # Debug: Show total revenue for this filter
-                if len(filtered_data) > 0:
-                    total_revenue = filtered_data['Row Total'].sum()
-                    print(f"DEBUG: Total revenue after filtering: {total_revenue}")
+                print(f"DEBUG: Conflicting items found: {match.conflicting}")
+                for conflicting_item in match.excluded:
+                    print(f"DEBUG: Excluding conflicting item: '{conflicting_item}'")
+                print(f"DEBUG: Items matched for '{filter_value_str}': {sorted(lookup.lowered.iloc[match.codes].unique())}")
+                print(f"DEBUG: Filter '{filter_type}={filter_value}' resulted in {matched_rows} records")
         elif filter_type in ["Category_in", "Item/Service Description_in", "Branch_in", "Group_in", "Customer_in", "SubGroup_in"]:
             col_map = {
                 "Category_in": "Category",
@@ -481,10 +556,169 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
                 "SubGroup_in": "SubGroup",
             }
             col = col_map[filter_type]
-            values = [str(v) for v in filter_value]
-            clean_data = filtered_data
-            tmp = clean_data[clean_data[col].astype(str).isin(values)]
-            filtered_data = tmp
+            codes = get_dimension_lookup(data[col]).codes_for_values(filter_value)
+            selection &= index.value_rows(col, codes)
+
+    filtered_data = index.take(selection)
+    return filtered_data
+
+@dataclass
+class PreparedRows:
+    """Filtered rows (and the main aggregate) computed for a guessed plan"""
+    frame: pd.DataFrame
+    aggregates: dict
+
+def plan_rows_key(plan: dict, cube: pd.DataFrame | None) -> str:
+    """What select_plan_rows computes for ``plan``: the data source and the filters"""
+    filters = [
+        (t, str(v).lower().strip() if t in DIMENSION_FILTERS else v) for t, v in plan.get("filters", [])
+    ]
+    return json.dumps(["cube" if cube_supports_plan(cube, plan) else "raw", filters], default=str)
+
+def prepare_plan_rows(data: pd.DataFrame, plan: dict, cube: pd.DataFrame | None) -> PreparedRows:
+    frame = select_plan_rows(cube if cube_supports_plan(cube, plan) else data, plan["filters"])
+    aggregates = {}
+    x_col, y_col, agg = plan.get("x_axis"), plan.get("y_axis"), plan.get("aggregation")
+    if not plan.get("dual_metrics") and x_col != "Month" and x_col in frame.columns and (y_col == "count" or y_col in frame.columns):
+        aggregates[(x_col, y_col, agg)] = group_size(frame, x_col) if y_col == "count" else group_agg(frame, x_col, y_col, agg)
+    return PreparedRows(frame, aggregates)
+
+def speculate_plan_rows(query: str, data_analysis: dict, data: pd.DataFrame, cube: pd.DataFrame | None):
+    """Start filtering for the plan the keyword parser guesses while the real plan is requested"""
+    if not SPECULATION_ENABLED:
+        return None
+    guess, confidence = parse_query(query, data_analysis)
+    if guess is None or (FAST_PATH_ENABLED and confidence >= FAST_PATH_MIN_CONFIDENCE):
+        # Unparseable, or the fast path answers at once and there is nothing to overlap with
+        return None
+    guess["filters"] = plan_filters(guess)
+    return speculator.submit(plan_rows_key(guess, cube), prepare_plan_rows, data, guess, cube)
+
+class StreamedPlanRows:
+    """Starts filtering for a streamed plan as soon as the fields that select its rows are in
+
+    The prompt has the model write the axes, aggregations and filters first;
+    year_filter is the last of them, so the rows can be prepared while the
+    title and the rest are still being generated. Pass ``attempt`` to
+    get_ai_plan as ``on_attempt``: every Bedrock request (a hedged call makes
+    two) collects its own fields, and the first request to reach year_filter
+    (or a later field, if it leaves year_filter out) starts a speculation from
+    its own fields alone.
+    """
+
+    def __init__(self, data: pd.DataFrame, cube: pd.DataFrame | None, guess=None):
+        self.data = data
+        self.cube = cube
+        self.guess = guess
+        self.speculation = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def attempt(self):
+        """The on_field callback for one Bedrock request"""
+        fields = {}
+
+        def on_field(key: str, value) -> None:
+            fields[key] = value
+            # A model that leaves year_filter out goes straight on to limit or title
+            if key not in ("year_filter", "limit", "title", "dual_metrics", "comparison_type"):
+                return
+            with self._lock:
+                if self.speculation is not None or self._closed:
+                    return
+                plan = dict(fields)
+                plan["filters"] = plan_filters(plan)
+                rows_key = plan_rows_key(plan, self.cube)
+                if self.guess is not None and self.guess.key == rows_key:
+                    # The keyword guess is already preparing these rows
+                    self.speculation = self.guess
+                    return
+                self.speculation = speculator.submit(rows_key, prepare_plan_rows, self.data, plan, self.cube)
+
+        return on_field
+
+    def claim(self, plan: dict):
+        """Rows prepared for the final ``plan`` by the streamed or the guessed speculation, or None"""
+        with self._lock:
+            # A late hedged stream must not start work nobody will claim
+            self._closed = True
+            streamed = self.speculation
+        rows_key = plan_rows_key(plan, self.cube)
+        prepared = None
+        for speculation in (self.guess, streamed):
+            if speculation is None or (speculation is streamed and streamed is self.guess):
+                continue
+            result = speculator.claim(speculation, rows_key)
+            if result is not None:
+                prepared = result
+        return prepared
+
+def chart_top_k(ai_plan: dict, x_col: str, values: int) -> int | None:
+    """How many values to chart before folding the rest into "Other" (None = chart them all)"""
+    limit = ai_plan.get("limit")
+    if CHART_TOP_K <= 0 or x_col not in HIGH_CARDINALITY_AXES or (isinstance(limit, int) and limit > 0):
+        return None
+    # Folding a single value would not make the chart any smaller
+    return CHART_TOP_K if values > CHART_TOP_K + 1 else None
+
+def fold_tail(values: pd.Series, ranked: pd.Index, top_k: int, combine: str | None) -> pd.Series:
+    """``values`` for the first ``top_k`` of ``ranked``, then one "Other" entry combining the rest
+
+    ``combine`` is how the rest add up (see TAIL_COMBINE); without one the rest is left out.
+    """
+    keep = ranked[:top_k]
+    head = values.reindex(keep, fill_value=0)
+    if combine is None:
+        return head
+    tail = values[~values.index.isin(keep)]
+    other = float(tail.agg(combine)) if len(tail) else 0.0
+    return pd.concat([head, pd.Series([other], index=[other_label(len(ranked) - top_k)])])
+
+def tail_combine(y_col: str, agg: str) -> str | None:
+    return "sum" if y_col == "count" else TAIL_COMBINE.get(agg)
+
+def time_series_chart(frame: pd.DataFrame, ai_plan: dict, x_col: str, y_col: str, agg: str) -> tuple[list, ChartSpec]:
+    """A trend line: ``agg`` per day, week or month in date order, at most LINE_MAX_POINTS points"""
+    granularity = "month" if x_col == "Month" else ai_plan.get("granularity") or "day"
+    if granularity not in GRANULARITIES:
+        granularity = "day"
+    series = resample(frame, "Date", y_col, agg, granularity).dropna()
+    # "Top N" of a trend is its last N periods
+    limit = ai_plan.get("limit")
+    if limit and isinstance(limit, int) and limit > 0:
+        series = series.tail(limit)
+    periods = len(series)
+    series = downsample(series, LINE_MAX_POINTS)
+    if len(series) < periods:
+        print(f"DEBUG: Downsampled {periods} {granularity} points to {len(series)}")
+    labels = period_labels(series.index, granularity)
+    values = [float(v) for v in series.values]
+    start = series.index[0] if len(series) else None
+    chart_data = [{"name": label, "value": value} for label, value in zip(labels, values)]
+    spec = ChartSpec(
+        "single", "line", ai_plan.get("title", "Anandhaas Analysis"), x_col, labels, [values], [y_col], [y_col], [agg],
+        x_positions=[(ts - start).days for ts in series.index],
+    )
+    return chart_data, spec
+
+def compute_chart(data: pd.DataFrame, ai_plan: dict, cube: pd.DataFrame | None = None,
+                  prepared: "PreparedRows | None" = None) -> tuple[list, ChartSpec]:
+    """Filter and aggregate for ``ai_plan``: the JSON chart data and the spec to draw it from"""
+    # Item- and customer-level plans (and unsupported aggregations) still scan the raw rows
+    if cube_supports_plan(cube, ai_plan):
+        data = cube
+        ai_plan["data_source"] = "cube"
+    else:
+        ai_plan["data_source"] = "raw"
+    print(f"DEBUG: Answering plan from {ai_plan['data_source']} data ({len(data)} rows)")
+
+    dual_metrics = ai_plan.get("dual_metrics", False) or ai_plan.get("y_axis") == "dual"
+    comparison_type = ai_plan.get("comparison_type", "metric")
+    title = ai_plan.get("title", "Anandhaas Analysis")
+
+    filters = ai_plan.get("filters", [])
+    # Rows prepared on a worker while the plan was being written, when the guess had the same filters
+    filtered_data = prepared.frame if prepared is not None else select_plan_rows(data, filters)
 
     if filtered_data.empty:
         # Debug information for troubleshooting
@@ -493,7 +727,7 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
         
         # Check what data is available for each filter
         debug_info = []
-        temp_data = data.copy()
+        temp_data = data
         
         for filter_type, filter_value in filters:
             if filter_type in ["Category", "Branch Name", "Group Name", "Customer/Vendor Name", "SubGroup"]:
@@ -510,12 +744,14 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
         raise ValueError(f"No data found after applying filters. Check filter values against available data.")
 
     x_col = ai_plan.get("x_axis", "Branch Name")
+    if not dual_metrics and x_col in TIME_AXES and ai_plan.get("chart_type") == "line":
+        return time_series_chart(filtered_data, ai_plan, x_col, ai_plan.get("y_axis", "Row Total"),
+                                 ai_plan.get("aggregation", "sum"))
     
     # Handle month-wise grouping
     if x_col == "Month":
         filtered_data = filtered_data.copy()
-        filtered_data["Month"] = filtered_data["Date"].dt.strftime("%B %Y")
-        filtered_data["MonthSort"] = filtered_data["Date"].dt.to_period("M")
+        filtered_data["MonthSort"], filtered_data["Month"] = month_columns(filtered_data, "Date")
     
     if dual_metrics:
         x_col = ai_plan.get("x_axis", "Branch Name")
@@ -533,121 +769,72 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
             
             # Get top items first
             if y_col_1 == "count":
-                top_items = filtered_data.groupby(x_col).size().sort_values(ascending=False)
+                top_items = group_size(filtered_data, x_col).sort_values(ascending=False)
             else:
-                top_items = filtered_data.groupby(x_col)[y_col_1].agg(agg_1).sort_values(ascending=False)
+                top_items = group_agg(filtered_data, x_col, y_col_1, agg_1).sort_values(ascending=False)
             
             if limit and isinstance(limit, int) and limit > 0:
                 top_items = top_items.head(limit)
-            
-            filtered_data = filtered_data[filtered_data[x_col].isin(top_items.index)]
+            top_k = chart_top_k(ai_plan, x_col, len(top_items))
+            if top_k:
+                print(f"DEBUG: Charting top {top_k} of {len(top_items)} {x_col} values")
+            else:
+                filtered_data = filtered_data[filtered_data[x_col].isin(top_items.index)]
             
             # Create data for each month
             metric1_data = {}
             for month in month_list:
-                month_data = filtered_data[filtered_data["Date"].dt.month == month]
+                month_data = filter_calendar(filtered_data, "Date", "month", month)
                 if y_col_1 == "count":
-                    month_metric = month_data.groupby(x_col).size()
+                    month_metric = group_size(month_data, x_col)
+                else:
+                    month_metric = group_agg(month_data, x_col, y_col_1, agg_1)
+                if top_k:
+                    month_metric = fold_tail(month_metric, top_items.index, top_k, tail_combine(y_col_1, agg_1))
                 else:
-                    month_metric = month_data.groupby(x_col)[y_col_1].agg(agg_1)
-                metric1_data[month_names.get(month, f"Month {month}")] = month_metric.reindex(top_items.index, fill_value=0)
+                    month_metric = month_metric.reindex(top_items.index, fill_value=0)
+                metric1_data[month_names.get(month, f"Month {month}")] = month_metric
             
-            # Create side-by-side bars
-            items = list(top_items.index)
-            x_pos = range(len(items))
-            width = 0.35
+            items = list(next(iter(metric1_data.values())).index)
             months = list(metric1_data.keys())
-            colors = ['#1e40af', '#059669', '#d97706', '#dc2626']
-            
-            for i, month in enumerate(months):
-                values = [metric1_data[month].get(item, 0) for item in items]
-                bars = ax1.bar([x + width*i for x in x_pos], values, width, 
-                              label=month, color=colors[i % len(colors)], alpha=0.95, edgecolor='white', linewidth=1.5)
-                
-                for bar in bars:
-                    height = bar.get_height()
-                    label = f'₹{height:,.0f}' if y_col_1 == 'Row Total' else f'{height:.0f}'
-                    ax1.text(bar.get_x() + bar.get_width()/2., height + height*0.01, 
-                            label, ha='center', va='bottom', fontweight='bold', fontsize=8)
-            
-            ax1.set_xticks([x + width/2 for x in x_pos])
-            ax1.set_xticklabels(items, rotation=45, ha='right', fontsize=10)
-            ax1.set_xlabel(x_col, fontsize=12, fontweight="bold")
-            ax1.set_ylabel(f"{y_col_1} ({agg_1})", fontsize=12, fontweight="bold")
-            ax1.set_title(f"{' vs '.join(months)} {y_col_1} Comparison", fontsize=14, fontweight="bold")
-            ax1.legend()
-            
-            # Second chart shows percentage comparison
-            total_by_item = {item: sum(metric1_data[month].get(item, 0) for month in months) for item in items}
-            percentages = {}
-            for month in months:
-                percentages[month] = [(metric1_data[month].get(item, 0) / total_by_item[item] * 100) if total_by_item[item] > 0 else 0 for item in items]
-            
-            for i, month in enumerate(months):
-                bars = ax2.bar([x + width*i for x in x_pos], percentages[month], width, 
-                              label=month, color=colors[i % len(colors)], alpha=0.95)
-                
-                for j, bar in enumerate(bars):
-                    height = bar.get_height()
-                    ax2.text(bar.get_x() + bar.get_width()/2., height + 1, f'{height:.1f}%',
-                            ha='center', va='bottom', fontweight='bold', fontsize=8)
-            
-            ax2.set_xticks([x + width/2 for x in x_pos])
-            ax2.set_xticklabels(items, rotation=45, ha='right', fontsize=10)
-            ax2.set_xlabel(x_col, fontsize=12, fontweight="bold")
-            ax2.set_ylabel("Percentage Share", fontsize=12, fontweight="bold")
-            ax2.set_title("Percentage Share Comparison", fontsize=14, fontweight="bold")
-            ax2.legend()
-            
             chart_data = []
             for item in items:
                 item_data = {"name": str(item)}
                 for month in months:
                     item_data[month.lower()] = float(metric1_data[month].get(item, 0))
                 chart_data.append(item_data)
+            spec = ChartSpec(
+                "monthly", ai_plan.get("chart_type", "bar"), title, x_col, items,
+                [[float(metric1_data[month].get(item, 0)) for item in items] for month in months],
+                months, [y_col_1], [agg_1],
+            )
         
         else:
             # Regular dual metrics (two different metrics)
             if y_col_1 == "count":
-                metric1_data = filtered_data.groupby(x_col).size().sort_values(ascending=False)
+                metric1_data = group_size(filtered_data, x_col).sort_values(ascending=False)
             else:
-                metric1_data = filtered_data.groupby(x_col)[y_col_1].agg(agg_1).sort_values(ascending=False)
+                metric1_data = group_agg(filtered_data, x_col, y_col_1, agg_1).sort_values(ascending=False)
             
             if limit and isinstance(limit, int) and limit > 0:
                 metric1_data = metric1_data.head(limit)
             
             if y_col_2 == "count":
-                metric2_data = filtered_data.groupby(x_col).size().reindex(metric1_data.index, fill_value=0)
+                metric2_data = group_size(filtered_data, x_col)
             else:
-                metric2_data = filtered_data.groupby(x_col)[y_col_2].agg(agg_2).reindex(metric1_data.index, fill_value=0)
-            
-            # First metric chart
-            bars1 = ax1.bar(range(len(metric1_data)), metric1_data.values, color='#1e40af', alpha=0.95, edgecolor='white', linewidth=1.5)
-            ax1.set_xticks(range(len(metric1_data)))
-            ax1.set_xticklabels(metric1_data.index, rotation=0 if len(metric1_data) <= 5 else 45, ha='center' if len(metric1_data) <= 5 else 'right', fontsize=11)
-            ax1.set_xlabel(x_col, fontsize=12, fontweight="bold")
-            ax1.set_ylabel(f"{y_col_1} ({agg_1})", fontsize=12, fontweight="bold")
-            ax1.set_title(f"{y_col_1} Analysis", fontsize=14, fontweight="bold")
-            
-            for i, bar in enumerate(bars1):
-                height = bar.get_height()
-                label = f'₹{height:,.0f}' if y_col_1 == 'Row Total' else f'{height:.0f}'
-                ax1.text(bar.get_x() + bar.get_width()/2., height + height*0.01, label,
-                        ha='center', va='bottom', fontweight='bold', fontsize=9)
-            
-            # Second metric chart
-            bars2 = ax2.bar(range(len(metric2_data)), metric2_data.values, color='#059669', alpha=0.95, edgecolor='white', linewidth=1.5)
-            ax2.set_xticks(range(len(metric2_data)))
-            ax2.set_xticklabels(metric2_data.index, rotation=0 if len(metric2_data) <= 5 else 45, ha='center' if len(metric2_data) <= 5 else 'right', fontsize=11)
-            ax2.set_xlabel(x_col, fontsize=12, fontweight="bold")
-            ax2.set_ylabel(f"{y_col_2} ({agg_2})", fontsize=12, fontweight="bold")
-            ax2.set_title(f"{y_col_2} Analysis", fontsize=14, fontweight="bold")
-            
-            for i, bar in enumerate(bars2):
-                height = bar.get_height()
-                label = f'₹{height:,.0f}' if y_col_2 == 'Row Total' else f'{height:.0f}'
-                ax2.text(bar.get_x() + bar.get_width()/2., height + height*0.01, label,
-                        ha='center', va='bottom', fontweight='bold', fontsize=9)
+                metric2_data = group_agg(filtered_data, x_col, y_col_2, agg_2)
+            top_k = chart_top_k(ai_plan, x_col, len(metric1_data))
+            if top_k:
+                print(f"DEBUG: Charting top {top_k} of {len(metric1_data)} {x_col} values")
+                # Both panels get an "Other" bar only if both metrics can be combined
+                combine_1, combine_2 = tail_combine(y_col_1, agg_1), tail_combine(y_col_2, agg_2)
+                if combine_1 is None or combine_2 is None:
+                    combine_1 = combine_2 = None
+                ranked = metric1_data.index
+                metric1_data = fold_tail(metric1_data, ranked, top_k, combine_1)
+                metric2_data = fold_tail(metric2_data, ranked, top_k, combine_2)
+            else:
+                metric2_data = metric2_data.reindex(metric1_data.index, fill_value=0)
             
             chart_data = []
             for item in metric1_data.index:
@@ -658,29 +845,37 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
                     "metric1_name": y_col_1,
                     "metric2_name": y_col_2
                 })
+            spec = ChartSpec(
+                "dual", ai_plan.get("chart_type", "bar"), title, x_col, list(metric1_data.index),
+                [[float(v) for v in metric1_data.values], [float(v) for v in metric2_data.values]],
+                [y_col_1, y_col_2], [y_col_1, y_col_2], [agg_1, agg_2],
+            )
         
     else:
         y_col = ai_plan.get("y_axis", "Row Total")
         agg_method = ai_plan.get("aggregation", "sum")
 
-        if y_col == "count":
+        reused = prepared.aggregates.get((x_col, y_col, agg_method)) if prepared is not None else None
+        if reused is not None:
+            grouped_data = reused.sort_values(ascending=False)
+        elif y_col == "count":
             if x_col == "Month":
-                grouped_data = filtered_data.groupby(["MonthSort", "Month"]).size().reset_index(name="count")
+                grouped_data = group_size(filtered_data, ["MonthSort", "Month"]).reset_index(name="count")
                 grouped_data = grouped_data.set_index("Month")["count"].sort_index()
             else:
-                grouped_data = filtered_data[x_col].value_counts().sort_values(ascending=False)
+                grouped_data = group_size(filtered_data, x_col).sort_values(ascending=False)
         elif y_col == "Quantity" and "Quantity" in filtered_data.columns:
             if x_col == "Month":
-                grouped_data = filtered_data.groupby(["MonthSort", "Month"])["Quantity"].agg(agg_method).reset_index()
+                grouped_data = group_agg(filtered_data, ["MonthSort", "Month"], "Quantity", agg_method).reset_index()
                 grouped_data = grouped_data.set_index("Month")["Quantity"].sort_index()
             else:
-                grouped_data = filtered_data.groupby(x_col)["Quantity"].agg(agg_method).sort_values(ascending=False)
+                grouped_data = group_agg(filtered_data, x_col, "Quantity", agg_method).sort_values(ascending=False)
         else:
             if x_col == "Month":
-                grouped_data = filtered_data.groupby(["MonthSort", "Month"])[y_col].agg(agg_method).reset_index()
+                grouped_data = group_agg(filtered_data, ["MonthSort", "Month"], y_col, agg_method).reset_index()
                 grouped_data = grouped_data.set_index("Month")[y_col].sort_index()
             else:
-                grouped_data = filtered_data.groupby(x_col)[y_col].agg(agg_method).sort_values(ascending=False)
+                grouped_data = group_agg(filtered_data, x_col, y_col, agg_method).sort_values(ascending=False)
 
         # Apply limit if specified
         limit = ai_plan.get("limit")
@@ -689,89 +884,25 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
             print(f"Applied limit: showing top {limit} results")
 
         chart_type = ai_plan.get("chart_type", "bar")
-
         if chart_type == "pie":
             grouped_data = grouped_data.sort_values(ascending=False)
-            professional_colors = ['#1e40af', '#059669', '#d97706', '#dc2626', '#7c3aed', '#0891b2', '#65a30d', '#ea580c']
-            colors = [professional_colors[i % len(professional_colors)] for i in range(len(grouped_data))]
-            
-            wedges, texts, autotexts = ax.pie(
-                grouped_data.values,
-                labels=None,
-                autopct=lambda pct: f'{pct:.1f}%' if pct > 3 else '',
-                colors=colors,
-                startangle=90,
-                pctdistance=0.85,
-                explode=[0.05 if i == 0 else 0 for i in range(len(grouped_data))]
-            )
-            
-            for autotext in autotexts:
-                autotext.set_color("white")
-                autotext.set_fontweight("bold")
-                autotext.set_fontsize(10)
-            
-            ax.legend(wedges, [f'{name}: ₹{value:,.0f}' if y_col == 'Row Total' else f'{name}: {value:.0f}' 
-                              for name, value in grouped_data.items()], 
-                     title=x_col, loc="center left", bbox_to_anchor=(1, 0, 0.5, 1), fontsize=10)
-        elif chart_type == "line":
-            ax.plot(
-                range(len(grouped_data)),
-                grouped_data.values,
-                marker="o",
-                linewidth=3,
-                markersize=8,
-            )
-            ax.set_xticks(range(len(grouped_data)))
-            ax.set_xticklabels(grouped_data.index, rotation=0 if len(grouped_data) <= 5 else 45, ha='center' if len(grouped_data) <= 5 else 'right', fontsize=11)
-            ax.set_xlabel(x_col, fontsize=12, fontweight="bold")
-            ax.set_ylabel(f"{y_col} {'(Lakhs)' if y_col == 'Row Total' else ''}", fontsize=12, fontweight="bold")
-            if y_col == "Row Total":
-                ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'{x/100000:.0f}'))
-            ax.grid(True, alpha=0.3)
-        else:
-            professional_colors = ['#1e40af', '#059669', '#d97706', '#dc2626', '#7c3aed', '#0891b2', '#65a30d', '#ea580c']
-            bar_colors = [professional_colors[i % len(professional_colors)] for i in range(len(grouped_data))]
-            bars = ax.bar(
-                range(len(grouped_data)),
-                grouped_data.values,
-                color=bar_colors,
-                alpha=0.95,
-                edgecolor='white',
-                linewidth=1.5
-            )
-            ax.set_xticks(range(len(grouped_data)))
-            ax.set_xticklabels(grouped_data.index, rotation=0 if len(grouped_data) <= 5 else 45, ha='center' if len(grouped_data) <= 5 else 'right', fontsize=11)
-            ax.set_xlabel(x_col, fontsize=12, fontweight="bold")
-            ax.set_ylabel(f"{y_col} {'(Lakhs)' if y_col == 'Row Total' else ''}", fontsize=12, fontweight="bold")
-            if y_col == "Row Total":
-                ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'{x/100000:.0f}'))
-            for i, bar in enumerate(bars):
-                height = bar.get_height()
-                if y_col == "Row Total":
-                    label = f"₹{height:,.0f}"
-                else:
-                    label = f"{height:.0f}"
-                ax.text(
-                    bar.get_x() + bar.get_width() / 2.0,
-                    height + height*0.01,
-                    label,
-                    ha="center",
-                    va="bottom",
-                    fontweight="bold",
-                    fontsize=9
-                )
-        
+        top_k = chart_top_k(ai_plan, x_col, len(grouped_data))
+        if top_k:
+            print(f"DEBUG: Charting top {top_k} of {len(grouped_data)} {x_col} values")
+            grouped_data = fold_tail(grouped_data, grouped_data.index, top_k, tail_combine(y_col, agg_method))
+
         chart_data = [{"name": str(k), "value": float(v)} for k, v in grouped_data.items()]
-    
-    if not dual_metrics:
-        ax.set_title(ai_plan.get("title", "Anandhaas Analysis"), fontsize=16, fontweight="bold", pad=20)
-    else:
-        fig.suptitle(ai_plan.get("title", "Anandhaas Analysis"), fontsize=16, fontweight="bold")
-    
-    plt.tight_layout()
-    if dual_metrics:
-        plt.subplots_adjust(top=0.9)
-    return chart_data, fig
+        spec = ChartSpec(
+            "single", chart_type, title, x_col, list(grouped_data.index),
+            [[float(v) for v in grouped_data.values]], [y_col], [y_col], [agg_method],
+        )
+    return chart_data, spec
+
+def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict, cube: pd.DataFrame | None = None,
+                                    prepared: "PreparedRows | None" = None):
+    """Chart data and the drawn figure in one call"""
+    chart_data, spec = compute_chart(data, ai_plan, cube=cube, prepared=prepared)
+    return chart_data, draw_chart(spec)
 
 def generate_simple_response(ai_plan: dict) -> str:
     chart_desc_map = {"bar": "comparison chart", "pie": "distribution chart", "line": "trend chart"}
@@ -856,70 +987,121 @@ def text_to_speech(text: str, language: str = "hi-IN") -> bytes | None:
     except Exception:
         return None
 
-def generate_pdf_report(fig, title, insights):
-    with io.BytesIO() as pdf_buffer:
-        with PdfPages(pdf_buffer) as pdf:
-            # Save only the chart - no separate insights page
-            pdf.savefig(fig, bbox_inches="tight", dpi=150)
-        pdf_buffer.seek(0)
-        return pdf_buffer.read()
-
-
 @app.route("/api/dashboard-data", methods=["GET"])
 def get_dashboard_data():
-    global anandhaas_data
-    if anandhaas_data is None:
-        anandhaas_data = load_anandhaas_data()
-
-    if anandhaas_data is None:
+    snapshot = dataset_loader.current(timeout=DATA_WAIT_SECONDS)
+    if snapshot is None:
         return jsonify({"error": "Data not available"}), 404
 
-    analysis = analyze_anandhaas_structure(anandhaas_data)
-    if analysis.get("date_range"):
-        analysis["date_range"]["start"] = analysis["date_range"]["start"].isoformat()
-        analysis["date_range"]["end"] = analysis["date_range"]["end"].isoformat()
-    return jsonify(analysis)
+    # Serialized once per dataset version; polls with a matching ETag get a 304
+    cached = _dashboard_payload.get(snapshot.version)
+    if cached is None:
+        analysis = dict(snapshot.analysis or analyze_anandhaas_structure(snapshot.data))
+        if analysis.get("date_range"):
+            analysis["date_range"] = {
+                "start": analysis["date_range"]["start"].isoformat(),
+                "end": analysis["date_range"]["end"].isoformat(),
+            }
+        _dashboard_payload.clear()
+        cached = _dashboard_payload[snapshot.version] = json_payload(analysis)
+    return conditional_json_response(*cached)
+
+@app.route("/api/ready", methods=["GET"])
+def readiness():
+    """Readiness probe: which dataset version is being served"""
+    status = dataset_loader.status()
+    return jsonify(status), 200 if status["ready"] else 503
+
+@app.route("/api/plan-cache", methods=["GET"])
+def plan_cache_stats():
+    """Plan cache hit/miss counters, the model time the hits saved and where plans came from"""
+    with usage_lock:
+        sources = dict(plan_sources)
+        usage = dict(model_usage)
+    planned = sum(sources.values())
+    stats = plan_cache.stats()
+    stats["plan_sources"] = sources
+    # Share of questions answered without calling Bedrock
+    stats["local_rate"] = (sources["fast_path"] + sources["cache"]) / planned if planned else None
+    stats["fast_path_rate"] = sources["fast_path"] / planned if planned else None
+    calls = usage["calls"]
+    # Streams cut short after the plan never see the usage metadata at the end
+    reported = calls - usage["stopped_early"]
+    stats["model_usage"] = {
+        **usage,
+        "seconds": round(usage["seconds"], 3),
+        "avg_input_tokens": usage["input_tokens"] / reported if reported else None,
+        "avg_seconds": usage["seconds"] / calls if calls else None,
+    }
+    stats["speculation"] = speculator.stats()
+    stats["reports"] = report_store.stats()
+    stats["render_pool"] = render_pool.stats() if render_pool is not None else None
+    stats["render_cache"] = render_cache.stats() if render_cache is not None else None
+    stats["planning"] = {
+        **planner.stats(),
+        "budget_seconds": PLAN_BUDGET_SECONDS,
+        "hedge_after_seconds": PLAN_HEDGE_SECONDS,
+        "degraded_rate": sources["fallback"] / planned if planned else None,
+    }
+    return jsonify(stats)
 
 @app.route("/api/query", methods=["POST"])
 def process_query():
-    global anandhaas_data
     try:
         payload = request.get_json(silent=True) or {}
         query = payload.get("query", "").strip()
         if not query:
             return jsonify({"error": "Query is required"}), 400
 
-        if anandhaas_data is None:
-            anandhaas_data = load_anandhaas_data()
-        if anandhaas_data is None:
+        # One snapshot for the whole request, even if a refresh swaps in a new one meanwhile
+        snapshot = dataset_loader.current(timeout=DATA_WAIT_SECONDS)
+        if snapshot is None:
             return jsonify({"error": "Data not available. Ensure anandhaas_data.csv exists."}), 404
+        force_raw = FORCE_RAW_SCAN or bool(payload.get("force_raw"))
 
         detected_lang = detect_language(query)
         english_query = translate_tamil_to_english(query) if detected_lang == "tamil" else query
 
-        data_analysis = analyze_anandhaas_structure(anandhaas_data)
-        ai_plan = get_ai_plan(english_query, data_analysis)
-        chart_data, fig = create_anandhaas_visualization(anandhaas_data, ai_plan)
+        data_analysis = snapshot.analysis or analyze_anandhaas_structure(snapshot.data)
+        cube = None if force_raw else snapshot.cube
+        speculation = speculate_plan_rows(english_query, data_analysis, snapshot.data, cube)
+        streamed_rows = StreamedPlanRows(snapshot.data, cube, speculation) if SPECULATION_ENABLED else None
+        budget = payload.get("plan_budget_seconds")
+        budget = min(float(budget), 60.0) if isinstance(budget, (int, float)) and budget > 0 else None
+        ai_plan = get_ai_plan(english_query, data_analysis, budget=budget,
+                              on_attempt=streamed_rows.attempt if streamed_rows else None)
+        # Points per day, week or month on a trend line over Date
+        if payload.get("granularity") in GRANULARITIES:
+            ai_plan["granularity"] = payload["granularity"]
+        prepared = streamed_rows.claim(ai_plan) if streamed_rows else None
+        speculated = streamed_rows is not None and (speculation or streamed_rows.speculation) is not None
+        chart_data, spec = compute_chart(snapshot.data, ai_plan, cube=cube, prepared=prepared)
         response_text = generate_simple_response(ai_plan)
 
-        try:
-            chart_title = ai_plan.get("title", "Anandhaas Revenue Analysis")
-            pdf_bytes = generate_pdf_report(fig, chart_title, response_text)
-            pdf_b64 = base64.b64encode(pdf_bytes).decode("utf-8")
-         
-            global last_pdf_data
-            last_pdf_data = {
-                'data': pdf_bytes,
-                'title': chart_title,
-                'insights': response_text,
-                'filename': f"{chart_title.replace(' ', '_')}_report.pdf"
-            }
-            print(f"PDF stored: {chart_title}, size: {len(pdf_bytes)} bytes")
-        except Exception as e:
-            print(f"PDF generation error: {e}")
-            pdf_b64 = None
-
-        plt.close(fig)
+        # The chart is only drawn when its PDF/PNG is first downloaded (or sent to Slack)
+        chart_title = ai_plan.get("title", "Anandhaas Revenue Analysis")
+        report = Report(
+            spec, chart_title, response_text, ai_plan.get("title", "report").replace(" ", "_"), snapshot.version,
+            cache_key=render_key(ai_plan, spec, snapshot.version, RENDER_VERSION),
+        )
+        report_id = report_store.add(report)
+        global last_pdf_data
+        last_pdf_data = {
+            'data': None,
+            'report_id': report_id,
+            'title': chart_title,
+            'insights': response_text,
+            'filename': f"{chart_title.replace(' ', '_')}_report.pdf"
+        }
+        pdf_b64 = None
+        if not LAZY_RENDERING or payload.get("inline_pdf"):
+            try:
+                pdf_bytes = report_store.render(report, INLINE_PROFILE)
+                pdf_b64 = base64.b64encode(pdf_bytes).decode("utf-8")
+                last_pdf_data['data'] = pdf_bytes
+                print(f"PDF stored: {chart_title}, size: {len(pdf_bytes)} bytes")
+            except Exception as e:
+                print(f"PDF generation error: {e}")
 
         return jsonify({
             "original_query": query,
@@ -931,7 +1113,18 @@ def process_query():
             "y_axis": ai_plan.get("y_axis", "Row Total"),
             "insights": response_text,
             "pdf_base64": pdf_b64,
-            "pdf_filename": f"{ai_plan.get('title','report').replace(' ', '_')}.pdf",
+            "pdf_filename": f"{report.filename}.pdf",
+            "report_id": report_id,
+            "pdf_url": f"/api/report/{report_id}.pdf",
+            "png_url": f"/api/report/{report_id}.png",
+            "svg_url": f"/api/report/{report_id}.svg",
+            "thumbnail_url": f"/api/report/{report_id}.png?profile=thumbnail",
+            "data_source": ai_plan.get("data_source"),
+            "dataset_version": snapshot.version,
+            "plan_cached": ai_plan.get("plan_cached", False),
+            "plan_source": ai_plan.get("plan_source"),
+            "speculation": ("hit" if prepared is not None else "miss") if speculated else None,
+            "degraded": ai_plan.get("degraded", False),
         })
 
     except Exception as e:
@@ -939,6 +1132,157 @@ def process_query():
         traceback.print_exc()
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
+@app.route("/api/query/batch", methods=["POST"])
+def process_query_batch():
+    """Plan and answer a list of questions together, with one combined PDF"""
+    try:
+        payload = request.get_json(silent=True) or {}
+        queries = payload.get("queries")
+        if not isinstance(queries, list) or not queries:
+            return jsonify({"error": "queries must be a non-empty list"}), 400
+        queries = [str(q).strip() for q in queries]
+        if not all(queries):
+            return jsonify({"error": "Every query must be non-empty"}), 400
+        if len(queries) > BATCH_MAX_QUERIES:
+            return jsonify({"error": f"At most {BATCH_MAX_QUERIES} queries per batch"}), 400
+
+        snapshot = dataset_loader.current(timeout=DATA_WAIT_SECONDS)
+        if snapshot is None:
+            return jsonify({"error": "Data not available. Ensure anandhaas_data.csv exists."}), 404
+        force_raw = FORCE_RAW_SCAN or bool(payload.get("force_raw"))
+        cube = None if force_raw else snapshot.cube
+
+        english_queries = list(batch_executor.map(
+            lambda q: translate_tamil_to_english(q) if detect_language(q) == "tamil" else q, queries
+        ))
+        data_analysis = snapshot.analysis or analyze_anandhaas_structure(snapshot.data)
+        plans, model_calls = get_ai_plans(english_queries, data_analysis)
+
+        # One filter pass per distinct (data source, filters), all running at once on the shared indexes
+        passes = {}
+        for plan in plans:
+            if not isinstance(plan, Exception):
+                key = plan_rows_key(plan, cube)
+                if key not in passes:
+                    passes[key] = batch_executor.submit(prepare_plan_rows, snapshot.data, plan, cube)
+
+        results = []
+        pages = []
+        specs = []
+        page_keys = []
+        for query, english_query, plan in zip(queries, english_queries, plans):
+            result = {"original_query": query, "english_query": english_query}
+            try:
+                if isinstance(plan, Exception):
+                    raise plan
+                prepared = passes[plan_rows_key(plan, cube)].result()
+                chart_data, spec = compute_chart(snapshot.data, plan, cube=cube, prepared=prepared)
+            except Exception as e:
+                result["error"] = str(e)
+                results.append(result)
+                continue
+            response_text = generate_simple_response(plan)
+            chart_title = plan.get("title", "Anandhaas Revenue Analysis")
+            cache_key = render_key(plan, spec, snapshot.version, RENDER_VERSION)
+            pages.append((chart_title, response_text))
+            specs.append(spec)
+            page_keys.append(cache_key)
+            report_id = report_store.add(Report(
+                spec, chart_title, response_text, plan.get("title", "report").replace(" ", "_"), snapshot.version,
+                cache_key=cache_key,
+            ))
+            result.update({
+                "chart_type": plan.get("chart_type", "bar"),
+                "title": plan.get("title", "Analysis"),
+                "data": chart_data,
+                "x_axis": plan.get("x_axis", "Branch Name"),
+                "y_axis": plan.get("y_axis", "Row Total"),
+                "insights": response_text,
+                "data_source": plan.get("data_source"),
+                "plan_cached": plan.get("plan_cached", False),
+                "plan_source": plan.get("plan_source"),
+                "report_id": report_id,
+            })
+            results.append(result)
+
+        pdf_b64 = None
+        pack_title = str(payload.get("title") or "Anandhaas Report Pack")
+        pdf_filename = pack_title.replace(" ", "_") + ".pdf"
+        pdf_bytes = None
+        # The same charts in the same order make the same pack
+        pack_key = hashlib.sha256("\n".join(page_keys).encode("utf-8")).hexdigest()
+        pack_suffix = profile_suffix(BATCH_PROFILE)
+        if specs and render_cache is not None:
+            pdf_bytes = render_cache.get(pack_key, pack_suffix)
+        if specs and pdf_bytes is None:
+            try:
+                # One page per chart, drawn one figure at a time
+                if render_pool is not None:
+                    pdf_bytes = render_pool.render_pages(specs, BATCH_PROFILE)
+                else:
+                    pdf_bytes = render_pages(specs, BATCH_PROFILE)
+                if render_cache is not None:
+                    render_cache.put(pack_key, pack_suffix, pdf_bytes)
+            except Exception as e:
+                print(f"PDF generation error: {e}")
+        if pdf_bytes:
+            pdf_b64 = base64.b64encode(pdf_bytes).decode("utf-8")
+            global last_pdf_data
+            last_pdf_data = {
+                'data': pdf_bytes,
+                'title': pack_title,
+                'insights': "\n".join(f"{title}: {insights}" for title, insights in pages),
+                'filename': pdf_filename,
+            }
+            print(f"PDF stored: {len(pages)} charts, size: {len(pdf_bytes)} bytes")
+
+        return jsonify({
+            "results": results,
+            "pdf_base64": pdf_b64,
+            "pdf_filename": pdf_filename,
+            "dataset_version": snapshot.version,
+            "model_calls": model_calls,
+            "filter_passes": len(passes),
+        })
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": f"Server error: {str(e)}"}), 500
+
+@app.route("/api/report/<report_id>.<fmt>", methods=["GET"])
+def get_report(report_id, fmt):
+    """PDF, PNG or SVG of an answered chart, rendered on first request
+
+    ?profile= picks a render profile of that format (e.g. .png?profile=thumbnail,
+    .pdf?profile=print); ?download=1 sends it as an attachment.
+    """
+    if fmt not in FORMATS:
+        return jsonify({"error": f"Unsupported format: {fmt}"}), 404
+    profile = request.args.get("profile") or fmt
+    if profile not in PROFILES or PROFILES[profile].fmt != fmt:
+        return jsonify({"error": f"No {fmt} render profile named {profile}"}), 400
+    report = report_store.get(report_id)
+    if report is None:
+        return jsonify({"error": "Report not found or expired"}), 404
+    try:
+        body = report_store.render(report, profile)
+    except RenderQueueFull as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": f"Render error: {str(e)}"}), 500
+    # A report id always renders the same chart, so browsers may keep it
+    return send_file(
+        io.BytesIO(body),
+        mimetype=FORMATS[fmt],
+        as_attachment=request.args.get("download") == "1",
+        download_name=f"{report.filename}.{fmt}",
+        etag=f"{report_id}.{profile_suffix(profile)}",
+        max_age=3600,
+    )
+
 @app.route("/api/transcribe", methods=["POST"])
 def transcribe():
     temp_file_path = None
@@ -1038,11 +1382,20 @@ def send_pdf_to_slack(pdf_bytes, filename, title, initial_comment, channel_key="
     except Exception as e:
         return {"success": False, "message": f"Error sending to Slack: {str(e)}"}
 
+def last_pdf_bytes(current: dict) -> bytes | None:
+    """The last answer's PDF, rendered with the Slack profile if it was not inlined"""
+    if not current.get('data') and current.get('report_id'):
+        report = report_store.get(current['report_id'])
+        if report is not None:
+            current['data'] = report_store.render(report, SLACK_PROFILE)
+    return current.get('data')
+
 @app.route("/api/send-to-slack", methods=["POST", "GET"])
 def send_to_slack_api():
     try:
-        global last_pdf_data
-        if not last_pdf_data.get('data'):
+        current = last_pdf_data
+        pdf_bytes = last_pdf_bytes(current)
+        if not pdf_bytes:
             return jsonify({"success": False, "message": "No PDF available. Generate a chart first."}), 400
         
         # Get channel selection from request
@@ -1052,10 +1405,10 @@ def send_to_slack_api():
             channel_key = data.get("channel", "test_channel_1")
         
         result = send_pdf_to_slack(
-            pdf_bytes=last_pdf_data['data'],
-            filename=last_pdf_data['filename'],
-            title=last_pdf_data['title'],
-            initial_comment=last_pdf_data['insights'],
+            pdf_bytes=pdf_bytes,
+            filename=current['filename'],
+            title=current['title'],
+            initial_comment=current['insights'],
             channel_key=channel_key
         )
         return jsonify(result)
@@ -1077,7 +1430,7 @@ def get_slack_channels():
 def get_last_pdf_info():
     """Get info about the last generated PDF like Streamlit session_state"""
     global last_pdf_data
-    if last_pdf_data.get('data'):
+    if last_pdf_data.get('data') or last_pdf_data.get('report_id'):
         return jsonify({
             "available": True,
             "filename": last_pdf_data['filename'],
@@ -1087,5 +1440,11 @@ def get_last_pdf_info():
         return jsonify({"available": False})
 
 if __name__ == "__main__":
+    # Start loading right away in the serving process (not the debug reloader's parent)
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        dataset_loader.start()
+        warm_up_in_background(BEDROCK_MODEL_ID)
+        if render_pool is not None:
+            render_pool.start()
     # app.run(debug=True, port=5000)
     app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
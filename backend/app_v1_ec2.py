@@ -1,9 +1,6 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import pandas as pd
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
 import json
 import boto3
 import io
@@ -12,10 +9,20 @@ import requests
 import tempfile
 import base64
 from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.ticker import FuncFormatter
 from dotenv import load_dotenv
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
 import os
+from columnar import encode_dimensions, get_dimension_lookup, present_codes, code_mask
+from http_cache import conditional_json_response, json_payload
+from chart_render import new_figure
+from bedrock_client import get_bedrock_client, warm_up_in_background
+from entity_index import PROMPT_PRUNING, prompt_vocabulary
+from plan_prompt import PRUNED_NOTE
+from plan_stream import invoke_plan
+from date_index import filter_calendar, filter_date_range, filter_day, month_columns
+from csv_ingest import load_csv_dataset
 
 
 load_dotenv()  
@@ -41,37 +48,30 @@ else:
     print("API Key is None or empty")
 
 anandhaas_data = None  
+# Summary of anandhaas_data and the serialized dashboard body, computed once per load
+anandhaas_analysis = None
+dashboard_payload = None
 last_pdf_data = {"data": None, "title": "", "insights": "", "filename": ""}  
 
 from typing import Optional
 
 def load_anandhaas_data(csv_path: str = "anandhaas_data.csv") -> Optional[pd.DataFrame] :
     try:
-        df = pd.read_csv(csv_path)
         required_cols = ["Branch Name", "Posting Date", "Group Name", "Category", "Row Total"]
         optional_cols = ["Customer/Vendor Name", "SubGroup", "Quantity"]
         
-        missing_cols = [c for c in required_cols if c not in df.columns]
-        if missing_cols:
-            print(f"Missing required columns: {missing_cols}")
+        # Streams the CSV in typed chunks sorted by date (optional columns included if they exist),
+        # or memory-maps the cached copy if the CSV is unchanged
+        df = load_csv_dataset(csv_path, required_cols, optional_cols, date_col="Posting Date")
+        if df is None:
             return None
         
-        # Include optional columns if they exist
-        available_cols = required_cols.copy()
-        for col in optional_cols:
-            if col in df.columns:
-                available_cols.append(col)
-        
-        df = df[available_cols].copy()
-        df["Posting Date"] = pd.to_datetime(df["Posting Date"], errors="coerce")
-        df["Row Total"] = pd.to_numeric(df["Row Total"], errors="coerce")
-        
         # Handle Quantity column if present
         if "Quantity" in df.columns:
-            df["Quantity"] = pd.to_numeric(df["Quantity"], errors="coerce")
             df["Quantity"] = df["Quantity"].fillna(1)  # Default quantity to 1 if missing
         
         df = df.dropna(subset=["Posting Date", "Row Total"])
+        df = encode_dimensions(df)
         print(f"Loaded Anandhaas data with {len(df)} records and columns: {list(df.columns)}")
         return df
     except Exception as e:
@@ -121,22 +121,30 @@ def analyze_anandhaas_structure(data: pd.DataFrame) -> dict:
     
     return analysis
 
+def get_anandhaas_analysis() -> dict:
+    """analyze_anandhaas_structure() of the loaded data, computed once"""
+    global anandhaas_analysis
+    if anandhaas_analysis is None:
+        anandhaas_analysis = analyze_anandhaas_structure(anandhaas_data)
+    return anandhaas_analysis
+
 def get_ai_plan(query: str, data_analysis: dict) -> dict:
-    branches = data_analysis.get("branches", [])
-    categories = data_analysis.get("categories", [])
-    groups = data_analysis.get("groups", [])
-    customers = data_analysis.get("customers", [])
-    subgroups = data_analysis.get("subgroups", [])
+    vocabulary = prompt_vocabulary(query, data_analysis)
+    branches = vocabulary["branches"]
+    categories = vocabulary["categories"]
+    groups = vocabulary["groups"]
+    customers = vocabulary["customers"]
+    subgroups = vocabulary["subgroups"]
 
     try:
-        bedrock = boto3.client("bedrock-runtime", region_name="us-east-1")
+        bedrock = get_bedrock_client()
 
         prompt = f"""
 Analyze this business query about restaurant sales and create a visualization plan.
 
 Query: "{query}"
 
-Available Data:
+Available Data:{PRUNED_NOTE if PROMPT_PRUNING else ""}
 - Branches: {branches}
 - Categories: {categories}
 - Groups: {groups}
@@ -216,18 +224,8 @@ Rules:
                 "inferenceConfig": {"temperature": 0.1},
             }
         )
-        response = bedrock.invoke_model(modelId=BEDROCK_MODEL_ID, body=body)
-        raw = response["body"].read()
-        result = json.loads(raw)
-        ai_text = result["output"]["message"]["content"][0]["text"].strip()
-
-        if "{" in ai_text and "}" in ai_text:
-            start = ai_text.find("{")
-            end = ai_text.rfind("}") + 1
-            json_str = ai_text[start:end]
-            plan = json.loads(json_str)
-        else:
-            raise ValueError("Model did not return JSON")
+        # Streamed: the plan is parsed as it arrives and text after the JSON is not waited for
+        plan = invoke_plan(bedrock, BEDROCK_MODEL_ID, body).plan
 
         plan.setdefault("chart_type", "bar")
         plan.setdefault("x_axis", "Branch Name")
@@ -301,23 +299,20 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
     dual_metrics = ai_plan.get("dual_metrics", False) or ai_plan.get("y_axis") == "dual"
     
     if dual_metrics:
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(24, 10))
+        fig = new_figure((24, 10))
+        ax1, ax2 = fig.subplots(1, 2)
     else:
-        fig, ax = plt.subplots(figsize=(20, 12))
+        fig = new_figure((20, 12))
+        ax = fig.subplots()
     
     filtered_data = data.copy()
     filters = ai_plan.get("filters", [])
 
     for filter_type, filter_value in filters:
         if filter_type == "date_month":
-            filtered_data = filtered_data[
-                filtered_data["Posting Date"].dt.month == int(filter_value)
-            ]
+            filtered_data = filter_calendar(filtered_data, "Posting Date", "month", filter_value)
         elif filter_type == "date_month_in":
-            month_list = [int(m) for m in filter_value]
-            filtered_data = filtered_data[
-                filtered_data["Posting Date"].dt.month.isin(month_list)
-            ]
+            filtered_data = filter_calendar(filtered_data, "Posting Date", "month", filter_value)
         elif filter_type == "date_specific":
             try:
                 # Handle various date formats and add current year if missing
@@ -325,9 +320,7 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
                     current_year = pd.Timestamp.now().year
                     filter_value = f"{current_year}-{filter_value}"
                 target_date = pd.to_datetime(filter_value).date()
-                filtered_data = filtered_data[
-                    filtered_data["Posting Date"].dt.date == target_date
-                ]
+                filtered_data = filter_day(filtered_data, "Posting Date", target_date)
                 print(f"DEBUG: Date filter '{target_date}' resulted in {len(filtered_data)} records")
             except Exception as e:
                 print(f"DEBUG: Date parsing error for '{filter_value}': {e}")
@@ -335,47 +328,40 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
         elif filter_type == "date_range":
             start_date = pd.to_datetime(filter_value[0])
             end_date = pd.to_datetime(filter_value[1])
-            filtered_data = filtered_data[
-                (filtered_data["Posting Date"] >= start_date) & 
-                (filtered_data["Posting Date"] <= end_date)
-            ]
+            filtered_data = filter_date_range(filtered_data, "Posting Date", start_date, end_date)
         elif filter_type == "date_year":
-            filtered_data = filtered_data[
-                filtered_data["Posting Date"].dt.year == int(filter_value)
-            ]
+            filtered_data = filter_calendar(filtered_data, "Posting Date", "year", filter_value)
         elif filter_type == "date_year_in":
-            year_list = [int(y) for y in filter_value]
-            filtered_data = filtered_data[
-                filtered_data["Posting Date"].dt.year.isin(year_list)
-            ]
+            filtered_data = filter_calendar(filtered_data, "Posting Date", "year", filter_value)
         elif filter_type in ["Category", "Branch Name", "Group Name", "Customer/Vendor Name", "SubGroup"]:
-            clean_data = filtered_data.dropna(subset=[filter_type])
             filter_value_str = str(filter_value).lower().strip()
+            column = filtered_data[filter_type]
+            lookup = get_dimension_lookup(column)
+            # Lowercased values present in the current selection, indexed by category code
+            vocab = lookup.lowered.iloc[present_codes(column)]
             
             # First try exact match
-            exact_match = clean_data[clean_data[filter_type].astype(str).str.lower().str.strip() == filter_value_str]
+            exact_codes = vocab.index[(vocab == filter_value_str).to_numpy()]
             
-            if not exact_match.empty:
-                filtered_data = exact_match
+            if len(exact_codes):
+                filtered_data = filtered_data[code_mask(column, exact_codes)]
             else:
                 # For partial matching, use word boundaries to avoid substring issues
                 # Special handling for "roast" vs "rava roast"
                 if filter_value_str == "roast":
                     # Match "roast" but exclude items that contain "rava roast"
-                    mask = (clean_data[filter_type].astype(str).str.lower().str.contains(r'\broast\b', case=False, na=False, regex=True) & 
-                           ~clean_data[filter_type].astype(str).str.lower().str.contains('rava roast', case=False, na=False))
+                    matched = (vocab.str.contains(r'\broast\b', case=False, na=False, regex=True) & 
+                               ~vocab.str.contains('rava roast', case=False, na=False))
                 else:
                     # Use word boundary matching for other terms
                     pattern = r'\b' + filter_value_str.replace(' ', r'\s+') + r'\b'
-                    mask = clean_data[filter_type].astype(str).str.contains(pattern, case=False, na=False, regex=True)
+                    matched = vocab.str.contains(pattern, case=False, na=False, regex=True)
                 
-                tmp = clean_data[mask]
-                if tmp.empty:
+                if not matched.any():
                     # Fallback to simple contains if word boundary fails
-                    mask = clean_data[filter_type].astype(str).str.contains(filter_value_str, case=False, na=False)
-                    tmp = clean_data[mask]
+                    matched = vocab.str.contains(filter_value_str, case=False, na=False)
                 
-                filtered_data = tmp
+                filtered_data = filtered_data[code_mask(column, vocab.index[matched.to_numpy()])]
                 print(f"DEBUG: Filter '{filter_type}={filter_value}' resulted in {len(filtered_data)} records")
         elif filter_type in ["Category_in", "Branch_in", "Group_in", "Customer_in", "SubGroup_in"]:
             col_map = {
@@ -386,10 +372,8 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
                 "SubGroup_in": "SubGroup",
             }
             col = col_map[filter_type]
-            values = [str(v) for v in filter_value]
-            clean_data = filtered_data.dropna(subset=[col])
-            tmp = clean_data[clean_data[col].astype(str).isin(values)]
-            filtered_data = tmp
+            codes = get_dimension_lookup(filtered_data[col]).codes_for_values(filter_value)
+            filtered_data = filtered_data[code_mask(filtered_data[col], codes)]
 
     if filtered_data.empty:
         # Debug information for troubleshooting
@@ -398,7 +382,7 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
         
         # Check what data is available for each filter
         debug_info = []
-        temp_data = data.copy()
+        temp_data = data
         
         for filter_type, filter_value in filters:
             if filter_type in ["Category", "Branch Name", "Group Name", "Customer/Vendor Name", "SubGroup"]:
@@ -419,8 +403,7 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
     # Handle month-wise grouping
     if x_col == "Month":
         filtered_data = filtered_data.copy()
-        filtered_data["Month"] = filtered_data["Posting Date"].dt.strftime("%B %Y")
-        filtered_data["MonthSort"] = filtered_data["Posting Date"].dt.to_period("M")
+        filtered_data["MonthSort"], filtered_data["Month"] = month_columns(filtered_data, "Posting Date")
     
     if dual_metrics:
         if x_col == "Month":
@@ -433,12 +416,12 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
                 count_data = filtered_data.groupby(["MonthSort", "Month"]).size().reset_index(name="count")
                 count_data = count_data.set_index("Month")["count"].sort_index()
         else:
-            revenue_data = filtered_data.groupby(x_col)["Row Total"].sum().sort_values(ascending=False)
+            revenue_data = filtered_data.groupby(x_col, observed=True)["Row Total"].sum().sort_values(ascending=False)
             # Use quantity for count if available, otherwise use record count
             if "Quantity" in filtered_data.columns:
-                count_data = filtered_data.groupby(x_col)["Quantity"].sum().sort_values(ascending=False)
+                count_data = filtered_data.groupby(x_col, observed=True)["Quantity"].sum().sort_values(ascending=False)
             else:
-                count_data = filtered_data[x_col].value_counts().sort_values(ascending=False)
+                count_data = filtered_data.groupby(x_col, observed=True).size().sort_values(ascending=False)
         
         # Revenue chart 
         bars1 = ax1.bar(range(len(revenue_data)), revenue_data.values, color='#1e40af', alpha=0.95, edgecolor='white', linewidth=1.5)
@@ -449,7 +432,7 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
         ax1.set_title("Revenue Analysis", fontsize=14, fontweight="bold")
         
         # Format Y-axis to show values in lakhs
-        ax1.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'{x/100000:.0f}'))
+        ax1.yaxis.set_major_formatter(FuncFormatter(lambda x, p: f'{x/100000:.0f}'))
         
         for i, bar in enumerate(bars1):
             height = bar.get_height()
@@ -465,7 +448,7 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
         ax2.set_title("Transaction Count", fontsize=14, fontweight="bold")
         
         # Format Y-axis for count 
-        ax2.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'{x/1000:.0f}k' if x >= 1000 else f'{x:.0f}'))
+        ax2.yaxis.set_major_formatter(FuncFormatter(lambda x, p: f'{x/1000:.0f}k' if x >= 1000 else f'{x:.0f}'))
         
         for i, bar in enumerate(bars2):
             height = bar.get_height()
@@ -494,19 +477,19 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
                 grouped_data = filtered_data.groupby(["MonthSort", "Month"]).size().reset_index(name="count")
                 grouped_data = grouped_data.set_index("Month")["count"].sort_index()
             else:
-                grouped_data = filtered_data[x_col].value_counts().sort_values(ascending=False)
+                grouped_data = filtered_data.groupby(x_col, observed=True).size().sort_values(ascending=False)
         elif y_col == "Quantity" and "Quantity" in filtered_data.columns:
             if x_col == "Month":
                 grouped_data = filtered_data.groupby(["MonthSort", "Month"])["Quantity"].agg(agg_method).reset_index()
                 grouped_data = grouped_data.set_index("Month")["Quantity"].sort_index()
             else:
-                grouped_data = filtered_data.groupby(x_col)["Quantity"].agg(agg_method).sort_values(ascending=False)
+                grouped_data = filtered_data.groupby(x_col, observed=True)["Quantity"].agg(agg_method).sort_values(ascending=False)
         else:
             if x_col == "Month":
                 grouped_data = filtered_data.groupby(["MonthSort", "Month"])[y_col].agg(agg_method).reset_index()
                 grouped_data = grouped_data.set_index("Month")[y_col].sort_index()
             else:
-                grouped_data = filtered_data.groupby(x_col)[y_col].agg(agg_method).sort_values(ascending=False)
+                grouped_data = filtered_data.groupby(x_col, observed=True)[y_col].agg(agg_method).sort_values(ascending=False)
 
         chart_type = ai_plan.get("chart_type", "bar")
 
@@ -546,7 +529,7 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
             ax.set_xlabel(x_col, fontsize=12, fontweight="bold")
             ax.set_ylabel(f"{y_col} {'(Lakhs)' if y_col == 'Row Total' else ''}", fontsize=12, fontweight="bold")
             if y_col == "Row Total":
-                ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'{x/100000:.0f}'))
+                ax.yaxis.set_major_formatter(FuncFormatter(lambda x, p: f'{x/100000:.0f}'))
             ax.grid(True, alpha=0.3)
         else:
             professional_colors = ['#1e40af', '#059669', '#d97706', '#dc2626', '#7c3aed', '#0891b2', '#65a30d', '#ea580c']
@@ -564,7 +547,7 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
             ax.set_xlabel(x_col, fontsize=12, fontweight="bold")
             ax.set_ylabel(f"{y_col} {'(Lakhs)' if y_col == 'Row Total' else ''}", fontsize=12, fontweight="bold")
             if y_col == "Row Total":
-                ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'{x/100000:.0f}'))
+                ax.yaxis.set_major_formatter(FuncFormatter(lambda x, p: f'{x/100000:.0f}'))
             for i, bar in enumerate(bars):
                 height = bar.get_height()
                 if y_col == "Row Total":
@@ -588,9 +571,9 @@ def create_anandhaas_visualization(data: pd.DataFrame, ai_plan: dict):
     else:
         fig.suptitle(ai_plan.get("title", "Anandhaas Analysis"), fontsize=16, fontweight="bold")
     
-    plt.tight_layout()
+    fig.tight_layout()
     if dual_metrics:
-        plt.subplots_adjust(top=0.9)
+        fig.subplots_adjust(top=0.9)
     return chart_data, fig
 
 def generate_simple_response(ai_plan: dict) -> str:
@@ -680,7 +663,8 @@ def generate_pdf_report(fig, title, insights):
     with io.BytesIO() as pdf_buffer:
         with PdfPages(pdf_buffer) as pdf:
             pdf.savefig(fig, bbox_inches="tight", dpi=150)
-            fig_text, ax_text = plt.subplots(figsize=(6, 4))
+            fig_text = new_figure((6, 4))
+            ax_text = fig_text.subplots()
             ax_text.text(0.05, 0.95, title, fontsize=12, fontweight="bold", transform=ax_text.transAxes)
             ax_text.text(0.05, 0.85, "Key Insights:", fontsize=10, fontweight="bold", transform=ax_text.transAxes)
             insight_lines = insights.replace(". ", ".\n").split("\n")
@@ -691,7 +675,6 @@ def generate_pdf_report(fig, title, insights):
                     y_pos -= 0.08
             ax_text.axis("off")
             pdf.savefig(fig_text, bbox_inches="tight", dpi=150)
-            plt.close(fig_text)
         pdf_buffer.seek(0)
         return pdf_buffer.read()
 
@@ -705,11 +688,17 @@ def get_dashboard_data():
     if anandhaas_data is None:
         return jsonify({"error": "Data not available"}), 404
 
-    analysis = analyze_anandhaas_structure(anandhaas_data)
-    if analysis.get("date_range"):
-        analysis["date_range"]["start"] = analysis["date_range"]["start"].isoformat()
-        analysis["date_range"]["end"] = analysis["date_range"]["end"].isoformat()
-    return jsonify(analysis)
+    # The data never changes after loading: serialize once, answer repeat polls with 304
+    global dashboard_payload
+    if dashboard_payload is None:
+        analysis = dict(get_anandhaas_analysis())
+        if analysis.get("date_range"):
+            analysis["date_range"] = {
+                "start": analysis["date_range"]["start"].isoformat(),
+                "end": analysis["date_range"]["end"].isoformat(),
+            }
+        dashboard_payload = json_payload(analysis)
+    return conditional_json_response(*dashboard_payload)
 
 @app.route("/api/query", methods=["POST"])
 def process_query():
@@ -728,7 +717,7 @@ def process_query():
         detected_lang = detect_language(query)
         english_query = translate_tamil_to_english(query) if detected_lang == "tamil" else query
 
-        data_analysis = analyze_anandhaas_structure(anandhaas_data)
+        data_analysis = get_anandhaas_analysis()
         ai_plan = get_ai_plan(english_query, data_analysis)
         chart_data, fig = create_anandhaas_visualization(anandhaas_data, ai_plan)
         response_text = generate_simple_response(ai_plan)
@@ -750,7 +739,6 @@ def process_query():
             print(f"PDF generation error: {e}")
             pdf_b64 = None
 
-        plt.close(fig)
 
         return jsonify({
             "original_query": query,
@@ -908,5 +896,8 @@ def get_last_pdf_info():
         return jsonify({"available": False})
 
 if __name__ == "__main__":
+    # Open the Bedrock connection before the first question (not in the debug reloader's parent)
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        warm_up_in_background(BEDROCK_MODEL_ID)
     # app.run(debug=True, port=5000)
     app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,81 @@
+"""Process-wide Bedrock runtime client.
+
+boto3 clients are thread-safe once built, but building one resolves
+credentials, loads the service model and opens a new connection pool; doing
+that per request also means a fresh TLS handshake per question. Every planner
+call shares one client instead, with a sized keep-alive pool, explicit
+timeouts and adaptive retries (client-side rate limiting on throttles).
+"""
+import json
+import os
+import threading
+import time
+
+import boto3
+from botocore.config import Config
+
+BEDROCK_REGION = os.getenv("ANANDHAAS_BEDROCK_REGION", "us-east-1")
+# Override to point at a local stand-in (see bench_bedrock_client.py)
+BEDROCK_ENDPOINT_URL = os.getenv("ANANDHAAS_BEDROCK_ENDPOINT_URL") or None
+BEDROCK_POOL_SIZE = int(os.getenv("ANANDHAAS_BEDROCK_POOL_SIZE", "16"))
+BEDROCK_CONNECT_TIMEOUT = float(os.getenv("ANANDHAAS_BEDROCK_CONNECT_TIMEOUT", "3"))
+BEDROCK_READ_TIMEOUT = float(os.getenv("ANANDHAAS_BEDROCK_READ_TIMEOUT", "30"))
+BEDROCK_MAX_ATTEMPTS = int(os.getenv("ANANDHAAS_BEDROCK_MAX_ATTEMPTS", "3"))
+BEDROCK_WARMUP = os.getenv("ANANDHAAS_BEDROCK_WARMUP", "1") != "0"
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def bedrock_config(pool_size: int = BEDROCK_POOL_SIZE) -> Config:
+    return Config(
+        region_name=BEDROCK_REGION,
+        max_pool_connections=pool_size,
+        connect_timeout=BEDROCK_CONNECT_TIMEOUT,
+        read_timeout=BEDROCK_READ_TIMEOUT,
+        retries={"mode": "adaptive", "max_attempts": BEDROCK_MAX_ATTEMPTS},
+        tcp_keepalive=True,
+    )
+
+
+def get_bedrock_client():
+    """The shared bedrock-runtime client, built on first use."""
+    global _client
+    client = _client
+    if client is not None:
+        return client
+    with _client_lock:
+        if _client is None:
+            # A private session: boto3's default session is not safe to build clients from concurrently
+            session = boto3.session.Session()
+            _client = session.client("bedrock-runtime", endpoint_url=BEDROCK_ENDPOINT_URL, config=bedrock_config())
+        return _client
+
+
+def warm_up(model_id: str) -> float | None:
+    """Build the client and open a pooled connection with a one-token request.
+
+    Returns the seconds it took, or None if the call failed (the app still
+    starts; the first real query then pays the setup cost).
+    """
+    started = time.perf_counter()
+    try:
+        body = json.dumps({
+            "messages": [{"role": "user", "content": [{"text": "ping"}]}],
+            "inferenceConfig": {"maxTokens": 1},
+        })
+        get_bedrock_client().invoke_model(modelId=model_id, body=body)["body"].read()
+    except Exception as e:
+        print(f"Bedrock warm-up failed: {e}")
+        return None
+    elapsed = time.perf_counter() - started
+    print(f"Bedrock client warmed up in {elapsed * 1000:.0f} ms")
+    return elapsed
+
+
+def warm_up_in_background(model_id: str) -> threading.Thread | None:
+    if not BEDROCK_WARMUP:
+        return None
+    thread = threading.Thread(target=warm_up, args=(model_id,), name="bedrock-warm-up", daemon=True)
+    thread.start()
+    return thread
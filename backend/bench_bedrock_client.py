@@ -0,0 +1,122 @@
+"""Measure planner-call latency with a fresh client per call vs the shared client.
+
+Starts a local stand-in for the bedrock-runtime ``InvokeModel`` API (a
+threaded HTTP server that answers after a fixed delay) and drives it through
+real botocore clients, so the numbers include request signing, connection
+setup and response parsing but not the model itself.
+
+Usage:
+    python bench_bedrock_client.py [calls] [--threads N] [--delay-ms MS]
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MODEL_ID = "amazon.nova-pro-v1:0"
+RESPONSE = json.dumps({
+    "output": {"message": {"role": "assistant", "content": [{"text": '{"chart_type": "bar"}'}]}},
+    "stopReason": "end_turn",
+}).encode("utf-8")
+
+
+class _StandIn(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    delay = 0.0
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out as separate writes; without this, delayed ACKs stall keep-alive requests
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        type(self).connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        time.sleep(self.delay)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+    def log_message(self, *args):
+        pass
+
+
+def _run(calls: int, threads: int, invoke) -> list[float]:
+    body = json.dumps({"messages": [{"role": "user", "content": [{"text": "revenue by branch"}]}]})
+
+    def one(_):
+        started = time.perf_counter()
+        invoke(body)
+        return time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(one, range(calls)))
+
+
+def _report(name: str, latencies: list[float], wall: float, connections: int) -> None:
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(
+        f"{name:<22} p50 {statistics.median(ordered) * 1000:7.2f} ms  p95 {p95 * 1000:7.2f} ms  "
+        f"{len(ordered) / wall:7.1f} calls/s  {connections} connections"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("calls", nargs="?", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--delay-ms", type=float, default=5.0, help="stand-in model latency")
+    args = parser.parse_args()
+
+    _StandIn.delay = args.delay_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f"http://127.0.0.1:{server.server_address[1]}"
+
+    # The stand-in ignores signatures, but botocore still needs credentials to sign with
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+    os.environ["ANANDHAAS_BEDROCK_ENDPOINT_URL"] = endpoint
+    import boto3
+    import bedrock_client
+
+    print(f"{args.calls} calls, {args.threads} threads, stand-in latency {args.delay_ms:g} ms, "
+          f"pool size {bedrock_client.BEDROCK_POOL_SIZE}")
+
+    def fresh_client(body):
+        client = boto3.client("bedrock-runtime", region_name="us-east-1", endpoint_url=endpoint)
+        client.invoke_model(modelId=MODEL_ID, body=body)["body"].read()
+
+    _StandIn.connections = 0
+    started = time.perf_counter()
+    latencies = _run(args.calls, 1, fresh_client)
+    _report("client per call", latencies, time.perf_counter() - started, _StandIn.connections)
+
+    _StandIn.connections = 0
+    warm = bedrock_client.warm_up(MODEL_ID)
+    shared = bedrock_client.get_bedrock_client()
+    started = time.perf_counter()
+    latencies = _run(args.calls, 1, lambda body: shared.invoke_model(modelId=MODEL_ID, body=body)["body"].read())
+    _report("shared client", latencies, time.perf_counter() - started, _StandIn.connections)
+    if warm is not None:
+        print(f"{'':<22} (warm-up took {warm * 1000:.2f} ms before the first call)")
+
+    _StandIn.connections = 0
+    started = time.perf_counter()
+    latencies = _run(args.calls, args.threads,
+                     lambda body: shared.invoke_model(modelId=MODEL_ID, body=body)["body"].read())
+    _report(f"shared, {args.threads} threads", latencies, time.perf_counter() - started, _StandIn.connections)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Render time of item-level bar and pie charts as the number of items grows.
+
+For each size, draws the chart with every item (what an explicit ``limit`` of
+that size asks for) and folded to the top ``--top-k`` items plus one "Other"
+bar, as ``app_v1.compute_chart`` does for item and customer charts without a
+limit.
+
+Usage:
+    python bench_chart_cardinality.py [--sizes 20,300,1000,3000] [--top-k 20] [--runs 3]
+"""
+import argparse
+import statistics
+import time
+
+from chart_render import ChartSpec, other_label, render_chart
+
+
+def item_spec(chart_type: str, values: int, top_k: int | None) -> ChartSpec:
+    labels = [f"Item {i}" for i in range(values)]
+    series = [float(50000 - 7 * i) for i in range(values)]
+    if top_k and values > top_k + 1:
+        labels = labels[:top_k] + [other_label(values - top_k)]
+        series = series[:top_k] + [sum(series[top_k:])]
+    return ChartSpec("single", chart_type, "Revenue by Item", "Item/Service Description", labels, [series],
+                     ["Row Total"], ["Row Total"], ["sum"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", default="20,300,1000,3000")
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--profile", default="png")
+    args = parser.parse_args()
+
+    # Load fonts and backends before timing
+    render_chart(item_spec("bar", 5, None), args.profile)
+
+    print(f"{args.profile} renders, median of {args.runs} runs")
+    print(f"{'items':>6} {'chart':<5} {'all items':>10} {'top ' + str(args.top_k) + ' + Other':>14}")
+    for values in (int(n) for n in args.sizes.split(",")):
+        for chart_type in ("bar", "pie"):
+            row = []
+            for top_k in (None, args.top_k):
+                spec = item_spec(chart_type, values, top_k)
+                runs = []
+                for _ in range(args.runs):
+                    started = time.perf_counter()
+                    render_chart(spec, args.profile)
+                    runs.append(time.perf_counter() - started)
+                row.append(statistics.median(runs))
+            print(f"{values:>6} {chart_type:<5} {row[0]:9.2f}s {row[1]:13.2f}s")
+
+
+if __name__ == "__main__":
+    main()
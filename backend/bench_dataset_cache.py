@@ -0,0 +1,121 @@
+"""Check: the dataset snapshot against a filesystem-backed fake S3.
+
+Writes a synthetic dataset as parquet files into a fake bucket and loads it
+the way ``app_v1.load_anandhaas_data`` does (list, version key, snapshot or
+download) three times:
+
+- cold: no snapshot, every file is read with ranged GETs and a snapshot is written
+- warm: same listing, so the snapshot is memory-mapped and nothing is downloaded
+  or copied
+- changed: one file is rewritten, its ETag changes, the snapshot is invalidated
+
+Prints the GETs, megabytes and seconds of each load and exits non-zero if the
+warm load downloads anything, copies the measures, returns different data,
+or the changed file is not picked up.
+
+Usage: python bench_dataset_cache.py [rows] [files]
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from bench_filters import make_dataset
+from columnar import encode_dimensions
+from dataset_cache import dataset_version, read_snapshot, snapshot_path, write_snapshot
+from date_index import add_calendar_columns
+from fake_s3 import FakeS3Client
+from s3_dataset import DATASET_COLUMNS, list_parquet_objects, load_parquet_dataset
+
+BUCKET = "anandhaas"
+PREFIX = "output/"
+
+
+def put_part(client: FakeS3Client, index: int, part) -> None:
+    buffer = io.BytesIO()
+    # Plain strings, as the Spark job writes them, in row groups of 100k rows
+    pq.write_table(pa.Table.from_pandas(part.astype({c: str for c in part.columns if part[c].dtype == "category"}),
+                                        preserve_index=False), buffer, row_group_size=100_000)
+    client.put_object(Bucket=BUCKET, Key=f"{PREFIX}part-{index:05d}.parquet", Body=buffer.getvalue())
+
+
+def load(client: FakeS3Client, cache_dir: str):
+    objects = list_parquet_objects(client, BUCKET, PREFIX)
+    version = dataset_version(objects, bucket=BUCKET, since=None, columns=DATASET_COLUMNS)
+    df = read_snapshot(cache_dir, version)
+    if df is None:
+        df = load_parquet_dataset(client, BUCKET, PREFIX, columns=DATASET_COLUMNS, objects=objects)
+        df = add_calendar_columns(encode_dimensions(df), "Date")
+        write_snapshot(cache_dir, version, df)
+    return version, df
+
+
+def measured(label: str, client: FakeS3Client, cache_dir: str):
+    client.calls.clear()
+    client.bytes_sent = 0
+    started = time.perf_counter()
+    version, df = load(client, cache_dir)
+    seconds = time.perf_counter() - started
+    gets = client.calls["get_object"]
+    print(f"{label:>8}: version {version}, {len(df)} rows, {gets} GETs, "
+          f"{client.bytes_sent / 1e6:.1f} MB, {seconds:.2f}s")
+    return version, df, gets
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    files = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    failures = []
+
+    with tempfile.TemporaryDirectory() as bucket_root, tempfile.TemporaryDirectory() as cache_dir:
+        client = FakeS3Client(bucket_root)
+        data = make_dataset(rows)[["Date", "Branch Name", "Group Name", "Category", "SubGroup",
+                                   "Item/Service Description", "Customer/Vendor Name", "Row Total"]]
+        # Some missing quantities: NaN must not turn the column into a copy on warm loads
+        data["Quantity"] = np.where(np.arange(rows) % 1000 == 0, np.nan, 1.0)
+        parts = [data.iloc[i::files].reset_index(drop=True) for i in range(files)]
+        for index, part in enumerate(parts):
+            put_part(client, index, part)
+
+        cold_version, cold, cold_gets = measured("cold", client, cache_dir)
+        if cold_gets == 0:
+            failures.append("cold load downloaded nothing")
+
+        warm_version, warm, warm_gets = measured("warm", client, cache_dir)
+        if warm_gets:
+            failures.append(f"warm load made {warm_gets} GETs")
+        if warm_version != cold_version or not warm.equals(cold):
+            failures.append("warm load returned different data")
+        copied = [c for c in ("Row Total", "Quantity") if warm[c].to_numpy().flags.writeable]
+        if copied:
+            failures.append(f"warm load copied {', '.join(copied)} instead of mapping the snapshot")
+        del warm
+
+        changed = parts[0].copy()
+        changed["Row Total"] = changed["Row Total"] * 2
+        put_part(client, 0, changed)
+        new_version, new, new_gets = measured("changed", client, cache_dir)
+        if new_version == cold_version:
+            failures.append("ETag change kept the old version key")
+        if new_gets == 0:
+            failures.append("changed dataset was not downloaded again")
+        expected = cold["Row Total"].sum() + parts[0]["Row Total"].sum()
+        if abs(new["Row Total"].sum() - expected) > 1e-6 * abs(expected):
+            failures.append("changed dataset does not have the new values")
+        if os.path.exists(snapshot_path(cache_dir, cold_version)):
+            failures.append("old snapshot was not removed")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
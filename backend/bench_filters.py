@@ -0,0 +1,113 @@
+"""Benchmark: sequential per-filter masks vs. the bitmap index.
+
+Builds a synthetic dataset (10M rows by default), then times a few typical
+filter combinations both ways:
+
+- ``sequential``: one boolean mask and one DataFrame copy per filter (the old path)
+- ``bitmap``: AND/OR of packed bitsets, materialized once
+
+Usage: python bench_filters.py [rows]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from bitmap_index import BitmapIndex
+from columnar import code_mask, encode_dimensions, get_dimension_lookup
+from date_index import add_calendar_columns, filter_calendar, filter_date_range
+
+
+def make_dataset(rows: int, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+
+    def pick(prefix: str, count: int, skew: float = 1.2) -> pd.Categorical:
+        weights = 1.0 / np.arange(1, count + 1) ** skew
+        codes = rng.choice(count, size=rows, p=weights / weights.sum())
+        return pd.Categorical.from_codes(codes, categories=[f"{prefix} {i}" for i in range(count)])
+
+    df = pd.DataFrame({
+        "Date": pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 900, rows), unit="D"),
+        "Branch Name": pick("branch", 12),
+        "Group Name": pick("group", 20),
+        "Category": pick("category", 60),
+        "SubGroup": pick("subgroup", 4, skew=0.5),
+        "Item/Service Description": pick("item", 300),
+        "Customer/Vendor Name": pick("customer", 2000),
+        "Row Total": rng.gamma(2.0, 150.0, rows),
+    })
+    return add_calendar_columns(encode_dimensions(df), "Date")
+
+
+def sequential(df: pd.DataFrame, filters: list) -> pd.DataFrame:
+    for kind, col, value in filters:
+        if kind == "in":
+            codes = get_dimension_lookup(df[col]).codes_for_values(value)
+            df = df[code_mask(df[col], codes)]
+        elif kind == "range":
+            df = filter_date_range(df, "Date", *value)
+        else:
+            df = filter_calendar(df, "Date", kind, value)
+    return df
+
+
+def bitmap(index: BitmapIndex, df: pd.DataFrame, filters: list) -> pd.DataFrame:
+    selection = index.all_rows()
+    for kind, col, value in filters:
+        if kind == "in":
+            selection &= index.value_rows(col, get_dimension_lookup(df[col]).codes_for_values(value))
+        elif kind == "range":
+            selection &= index.date_range_rows("Date", *value)
+        else:
+            selection &= index.calendar_rows(kind, value)
+    return index.take(selection)
+
+
+def best_of(fn, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(rows: int) -> None:
+    start = time.perf_counter()
+    df = make_dataset(rows)
+    print(f"Synthetic dataset: {rows} rows in {time.perf_counter() - start:.1f}s")
+    start = time.perf_counter()
+    index = BitmapIndex(df)
+    print(f"Bitmap index: {index.nbytes / 1e6:.1f} MB, built in {time.perf_counter() - start:.1f}s")
+
+    cases = {
+        "branch": [("in", "Branch Name", ["branch 0", "branch 3"])],
+        "branch+category+year": [
+            ("in", "Branch Name", ["branch 1"]),
+            ("in", "Category", ["category 2", "category 5"]),
+            ("year", None, 2024),
+        ],
+        "month+group+item": [
+            ("month", None, [2, 3]),
+            ("in", "Group Name", ["group 0"]),
+            ("in", "Item/Service Description", ["item 10", "item 40", "item 200"]),
+        ],
+        "range+customer+subgroup": [
+            ("range", None, ("2024-01-01", "2024-06-30")),
+            ("in", "Customer/Vendor Name", ["customer 5", "customer 500"]),
+            ("in", "SubGroup", ["subgroup 1"]),
+        ],
+    }
+    print(f"{'case':<26}{'rows':>10}{'sequential':>14}{'bitmap':>12}{'speedup':>10}")
+    for name, filters in cases.items():
+        expected = sequential(df, filters)
+        actual = bitmap(index, df, filters)
+        assert len(expected) == len(actual) and expected.index.equals(actual.index), name
+        seq = best_of(lambda: sequential(df, filters))
+        bit = best_of(lambda: bitmap(index, df, filters))
+        print(f"{name:<26}{len(actual):>10}{seq * 1000:>12.1f}ms{bit * 1000:>10.1f}ms{seq / bit:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000)
@@ -0,0 +1,116 @@
+"""Planning latency against a slow, heavy-tailed stand-in: plain vs hedged and budgeted.
+
+The stand-in from ``bench_bedrock_client`` answers after a random delay: most
+calls take a lognormal time around ``--median-ms``, and ``--slow-rate`` of them
+stall for ``--slow-ms`` (throttling, a cold model host). Each planning call
+goes through the shared botocore client and ``plan_stream.invoke_plan``,
+either directly or through ``hedging.Hedger`` with the given hedge delay and
+budget. A call that runs out of budget counts as degraded, which is where
+``app_v1.py`` would answer with its local plan.
+
+Usage:
+    python bench_hedged_planning.py [calls] [--threads 8] [--hedge-ms 1500] [--budget-ms 3000]
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+from bench_bedrock_client import MODEL_ID, _StandIn
+
+
+class _SlowStandIn(_StandIn):
+    median = 0.6
+    slow_rate = 0.05
+    slow = 6.0
+    rng = random.Random(7)
+    rng_lock = threading.Lock()
+
+    def do_POST(self):
+        with self.rng_lock:
+            stalled = self.rng.random() < self.slow_rate
+            delay = self.slow if stalled else self.median * self.rng.lognormvariate(0.0, 0.4)
+        self.delay = delay
+        super().do_POST()
+
+
+def _percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def _report(name: str, latencies: list[float], degraded: int, requests: int, calls: int) -> None:
+    ordered = sorted(latencies)
+    print(
+        f"{name:<8} p50 {_percentile(ordered, 0.5) * 1000:6.0f} ms  p95 {_percentile(ordered, 0.95) * 1000:6.0f} ms  "
+        f"p99 {_percentile(ordered, 0.99) * 1000:6.0f} ms  max {ordered[-1] * 1000:6.0f} ms  "
+        f"degraded {degraded}/{calls}  {requests / calls:.2f} requests per call"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("calls", nargs="?", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--median-ms", type=float, default=600.0, help="typical stand-in latency")
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="share of calls that stall")
+    parser.add_argument("--slow-ms", type=float, default=6000.0, help="latency of a stalled call")
+    parser.add_argument("--hedge-ms", type=float, default=1500.0)
+    parser.add_argument("--budget-ms", type=float, default=3000.0)
+    args = parser.parse_args()
+
+    _SlowStandIn.median = args.median_ms / 1000
+    _SlowStandIn.slow_rate = args.slow_rate
+    _SlowStandIn.slow = args.slow_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowStandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # The stand-in ignores signatures, but botocore still needs credentials to sign with
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+    os.environ["ANANDHAAS_BEDROCK_ENDPOINT_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    from bedrock_client import get_bedrock_client
+    from hedging import BudgetExceeded, Hedger
+    from plan_stream import invoke_plan
+
+    client = get_bedrock_client()
+    body = json.dumps({"messages": [{"role": "user", "content": [{"text": "revenue by branch"}]}]})
+    print(f"{args.calls} calls, {args.threads} threads, stand-in ~{args.median_ms:g} ms with "
+          f"{args.slow_rate:.0%} stalling for {args.slow_ms:g} ms; hedge after {args.hedge_ms:g} ms, "
+          f"budget {args.budget_ms:g} ms")
+
+    def plan():
+        return invoke_plan(client, MODEL_ID, body, streaming=False).plan
+
+    hedger = Hedger(workers=2 * args.threads)
+    modes = {
+        "plain": plan,
+        "hedged": lambda: hedger.hedged_call(plan, budget=args.budget_ms / 1000, hedge_after=args.hedge_ms / 1000),
+    }
+    for name, call in modes.items():
+        _SlowStandIn.rng.seed(7)
+        degraded = [0]
+        before = hedger.stats()
+
+        def one(_):
+            started = time.perf_counter()
+            try:
+                call()
+            except BudgetExceeded:
+                degraded[0] += 1
+            return time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            latencies = list(pool.map(one, range(args.calls)))
+        requests = args.calls + hedger.stats()["hedged"] - before["hedged"]
+        _report(name, latencies, degraded[0], requests, args.calls)
+    stats = hedger.stats()
+    print(f"hedges sent {stats['hedged']}, won {stats['hedge_wins']}, timed out {stats['timeouts']}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
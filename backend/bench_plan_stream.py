@@ -0,0 +1,119 @@
+"""Time to first usable plan: buffered ``invoke_model`` vs the streamed path.
+
+A mock Bedrock client generates a plan token by token at a fixed rate (after a
+fixed time to first token), optionally followed by the explanation models
+tend to add after the JSON. Both paths go through ``plan_stream.invoke_plan``.
+
+Usage:
+    python bench_plan_stream.py [--ttft-ms 400] [--token-ms 15] [--runs 5]
+"""
+import argparse
+import io
+import json
+import re
+import statistics
+import time
+
+from plan_stream import invoke_plan
+
+PLAN = {
+    "chart_type": "bar", "x_axis": "Branch Name", "y_axis": "Row Total", "y_axis_secondary": None,
+    "aggregation": "sum", "aggregation_secondary": None, "category_filters": None, "item_filters": ["rava roast"],
+    "branch_filters": ["VV", "SPM"], "group_filters": None, "customer_filters": None, "subgroup_filters": None,
+    "month_filter": 3, "date_filter": None, "year_filter": 2024, "limit": 10,
+    "title": "Rava Roast Revenue Analysis for VV and SPM", "dual_metrics": False, "comparison_type": None,
+}
+TRAILER = (
+    "\n\nExplanation: the query asks for rava roast item sales, so item_filters is used rather than "
+    "category_filters. Both branches are kept as filters, March 2024 becomes month_filter and "
+    "year_filter, and the top 10 limit is taken from the query."
+)
+
+
+def _tokens(text: str) -> list[str]:
+    # Roughly model-sized pieces: words, punctuation and whitespace runs
+    return re.findall(r"\s+|\w+|[^\w\s]", text)
+
+
+class MockBedrock:
+    """Just enough of the bedrock-runtime client for invoke_plan."""
+
+    def __init__(self, text: str, ttft: float, per_token: float):
+        self.pieces = _tokens(text)
+        self.text = text
+        self.ttft = ttft
+        self.per_token = per_token
+
+    def invoke_model(self, modelId, body):
+        time.sleep(self.ttft + self.per_token * len(self.pieces))
+        result = {
+            "output": {"message": {"role": "assistant", "content": [{"text": self.text}]}},
+            "usage": {"inputTokens": 2000, "outputTokens": len(self.pieces)},
+        }
+        return {"body": io.BytesIO(json.dumps(result).encode("utf-8"))}
+
+    def invoke_model_with_response_stream(self, modelId, body):
+        return {"body": _MockStream(self)}
+
+
+class _MockStream:
+    def __init__(self, client: MockBedrock):
+        self.client = client
+
+    def __iter__(self):
+        def event(message):
+            return {"chunk": {"bytes": json.dumps(message).encode("utf-8")}}
+
+        yield event({"messageStart": {"role": "assistant"}})
+        # Sleep to absolute deadlines so per-sleep overshoot does not add up over hundreds of tokens
+        started = time.perf_counter() + self.client.ttft
+        for i, piece in enumerate(self.client.pieces, 1):
+            time.sleep(max(0.0, started + i * self.client.per_token - time.perf_counter()))
+            yield event({"contentBlockDelta": {"delta": {"text": piece}, "contentBlockIndex": 0}})
+        yield event({"contentBlockStop": {"contentBlockIndex": 0}})
+        yield event({"messageStop": {"stopReason": "end_turn"}})
+        yield event({"metadata": {"usage": {"inputTokens": 2000, "outputTokens": len(self.client.pieces)}}})
+
+    def close(self):
+        pass
+
+
+def measure(client: MockBedrock, streaming: bool, runs: int) -> tuple[float, float]:
+    """(median seconds to the full plan, median seconds to the first field)."""
+    plans, firsts = [], []
+    for _ in range(runs):
+        started = time.perf_counter()
+        first = []
+
+        def on_field(key, value):
+            if not first:
+                first.append(time.perf_counter() - started)
+
+        response = invoke_plan(client, "mock", "{}", on_field=on_field, streaming=streaming)
+        assert response.plan == PLAN, response.plan
+        plans.append(response.seconds)
+        firsts.append(first[0])
+    return statistics.median(plans), statistics.median(firsts)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--ttft-ms", type=float, default=400.0, help="time to first token")
+    parser.add_argument("--token-ms", type=float, default=15.0, help="time per output token")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    plan_text = json.dumps(PLAN, indent=2)
+    for name, text in (("plan only", plan_text), ("plan + explanation", "```json\n" + plan_text + "\n```" + TRAILER)):
+        client = MockBedrock(text, args.ttft_ms / 1000, args.token_ms / 1000)
+        buffered, _ = measure(client, False, args.runs)
+        streamed, first_field = measure(client, True, args.runs)
+        print(
+            f"{name:<20} {len(client.pieces):4d} tokens  buffered {buffered * 1000:6.0f} ms  "
+            f"streamed {streamed * 1000:6.0f} ms ({(1 - streamed / buffered):.0%} sooner)  "
+            f"first field {first_field * 1000:6.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
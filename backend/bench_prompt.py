@@ -0,0 +1,123 @@
+"""Compare the planning prompt with full and with query-pruned vocabulary lists.
+
+For every question in the fast-path corpus, builds the ``app_v1.py`` prompt
+both ways and reports its size, plus whether the pruned lists still contain
+the filter values the reference plan uses. With ``--invoke`` each prompt is
+also sent to Bedrock (or to ``ANANDHAAS_BEDROCK_ENDPOINT_URL``) and the input
+tokens the model reports and the end-to-end latency are compared.
+
+Usage:
+    python bench_prompt.py [--vocab dashboard.json] [--invoke] [--corpus FILE]
+
+Without ``--vocab`` the vocabulary is the prompt vocabulary padded with a
+synthetic menu (a few thousand items and customers) of production size.
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+from eval_fast_path import PROMPT_VOCABULARY, _FILTER_COLUMNS, _as_list, load_corpus
+from plan_prompt import build_plan_prompt
+
+_DISHES = [
+    "Rava Roast", "Masala Dosa", "Plain Dosa", "Ghee Roast", "Onion Uthappam", "Idly", "Mini Idly", "Vada",
+    "Pongal", "Poori", "Chappathi", "Parotta", "Veg Biriyani", "Mushroom Biriyani", "Paneer Biriyani",
+    "Filter Coffee", "Tea", "Badam Milk", "Lemon Juice", "Curd Rice", "Sambar Rice", "Meals", "Gobi 65",
+    "Paneer Butter Masala", "Kesari", "Rasmalai", "Gulab Jamun", "Paper Roast", "Onion Rava Roast", "Podi Dosa",
+]
+_VARIANTS = ["", "Parcel", "Mini", "Special", "Family", "Combo", "Ghee", "Butter", "Cheese", "Spicy"]
+_SIZES = ["", "Half", "Full", "Large", "Small"]
+
+
+def synthetic_vocabulary(base: dict) -> dict:
+    vocabulary = {k: list(v) for k, v in base.items()}
+    for variant in _VARIANTS:
+        for dish in _DISHES:
+            for size in _SIZES:
+                name = " ".join(p for p in (variant, dish, size) if p)
+                if name not in vocabulary["items"]:
+                    vocabulary["items"].append(name)
+    vocabulary["categories"] += [d.lower() for d in _DISHES if d.lower() not in vocabulary["categories"]]
+    vocabulary["customers"] += [f"Walk-in Customer {i}" for i in range(1, 400)]
+    vocabulary["subgroups"] += [f"Counter {i}" for i in range(1, 25)]
+    return vocabulary
+
+
+def recall(plan: dict, prompt_vocabulary: dict) -> tuple[int, int]:
+    """(filter values the pruned lists cover, filter values in the reference plan)."""
+    found = total = 0
+    for field, column in _FILTER_COLUMNS.items():
+        listed = [str(v).lower() for v in prompt_vocabulary.get(column) or []]
+        for value in _as_list(plan.get(field)):
+            total += 1
+            term = str(value).lower()
+            found += any(term == v or term in v for v in listed)
+    return found, total
+
+
+def invoke(prompt: str) -> tuple[int | None, float]:
+    from bedrock_client import get_bedrock_client
+
+    body = json.dumps({
+        "messages": [{"role": "user", "content": [{"text": prompt}]}],
+        "inferenceConfig": {"temperature": 0.1},
+    })
+    started = time.perf_counter()
+    response = get_bedrock_client().invoke_model(modelId="amazon.nova-pro-v1:0", body=body)
+    result = json.loads(response["body"].read())
+    return (result.get("usage") or {}).get("inputTokens"), time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--corpus", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "fast_path_corpus.jsonl"))
+    parser.add_argument("--vocab", help="saved /api/dashboard-data response")
+    parser.add_argument("--invoke", action="store_true", help="send both prompts to the model")
+    args = parser.parse_args()
+
+    entries = load_corpus(args.corpus)
+    if args.vocab:
+        with open(args.vocab, encoding="utf-8") as f:
+            vocabulary = json.load(f)
+    else:
+        vocabulary = synthetic_vocabulary(PROMPT_VOCABULARY)
+    print(", ".join(f"{len(vocabulary.get(c) or [])} {c}" for c in _FILTER_COLUMNS.values()))
+
+    from entity_index import prompt_vocabulary
+
+    sizes = {"full": [], "pruned": []}
+    tokens = {"full": [], "pruned": []}
+    seconds = {"full": [], "pruned": []}
+    found = total = 0
+    started = time.perf_counter()
+    for query, plan in entries:
+        pruned_lists = prompt_vocabulary(query, vocabulary, prune=True)
+        hit, n = recall(plan, pruned_lists)
+        found, total = found + hit, total + n
+        if hit < n:
+            print(f"MISSED {query!r}: {plan}")
+        for name, prune in (("full", False), ("pruned", True)):
+            prompt = build_plan_prompt(query, vocabulary, prune=prune)
+            sizes[name].append(len(prompt))
+            if args.invoke:
+                input_tokens, elapsed = invoke(prompt)
+                tokens[name].append(input_tokens or 0)
+                seconds[name].append(elapsed)
+    build_ms = (time.perf_counter() - started) * 1000 / len(entries)
+
+    for name in ("full", "pruned"):
+        line = f"{name:<7} prompt {statistics.mean(sizes[name]):8.0f} chars (~{statistics.mean(sizes[name]) / 4:6.0f} tokens)"
+        if args.invoke:
+            line += (
+                f"  {statistics.mean(tokens[name]):7.0f} input tokens"
+                f"  p50 {statistics.median(seconds[name]):.2f} s  mean {statistics.mean(seconds[name]):.2f} s"
+            )
+        print(line)
+    print(f"pruned lists kept {found}/{total} filter values of the reference plans; "
+          f"building both prompts took {build_ms:.2f} ms per query")
+
+
+if __name__ == "__main__":
+    main()
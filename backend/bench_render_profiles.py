@@ -0,0 +1,73 @@
+"""Render time and output size for every chart render profile.
+
+Draws a set of typical charts (a branch bar chart, an item pie, a monthly
+line, a two-metric comparison, a month-vs-month comparison and a 60-item bar
+chart) with each profile in ``chart_render.PROFILES`` and reports the median
+time per chart and the mean file size.
+
+Usage:
+    python bench_render_profiles.py [--runs 3] [--profiles pdf,slack,...]
+"""
+import argparse
+import statistics
+import time
+
+from chart_render import PROFILES, ChartSpec, render_chart
+
+BRANCHES = ["VV", "SPM", "RSP", "GNP", "KNR", "TNR", "PLM", "SBP", "KVP", "RMN", "ASN", "MTP"]
+MONTHS = ["Jan 2024", "Feb 2024", "Mar 2024", "Apr 2024", "May 2024", "Jun 2024", "Jul 2024", "Aug 2024",
+          "Sep 2024", "Oct 2024", "Nov 2024", "Dec 2024"]
+
+
+def sample_specs() -> list[ChartSpec]:
+    items = [f"Item {i}" for i in range(60)]
+    return [
+        ChartSpec("single", "bar", "Revenue by Branch", "Branch Name", BRANCHES,
+                  [[2.5e6 - i * 1.3e5 for i in range(len(BRANCHES))]], ["Row Total"], ["Row Total"], ["sum"]),
+        ChartSpec("single", "pie", "Top Items", "Item/Service Description", items[:10],
+                  [[900.0 - 70 * i for i in range(10)]], ["Quantity"], ["Quantity"], ["sum"]),
+        ChartSpec("single", "line", "Monthly Revenue", "Month", MONTHS,
+                  [[1.8e6 + 2e5 * (i % 4) for i in range(12)]], ["Row Total"], ["Row Total"], ["sum"]),
+        ChartSpec("dual", "bar", "Revenue and Quantity by Branch", "Branch Name", BRANCHES[:8],
+                  [[1.2e6 - i * 9e4 for i in range(8)], [5400.0 - i * 300 for i in range(8)]],
+                  ["Row Total", "Quantity"], ["Row Total", "Quantity"], ["sum", "sum"]),
+        ChartSpec("monthly", "bar", "February vs March", "Category", ["dosa", "roast", "coffee", "idly", "vada"],
+                  [[4.1e5, 3.2e5, 2.2e5, 1.9e5, 1.1e5], [4.4e5, 3.0e5, 2.5e5, 1.7e5, 1.2e5]],
+                  ["February", "March"], ["Row Total"], ["sum"]),
+        ChartSpec("single", "bar", "Items by Quantity", "Item/Service Description", items,
+                  [[float(3000 - 45 * i) for i in range(60)]], ["Quantity"], ["Quantity"], ["sum"]),
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--profiles", default=",".join(PROFILES))
+    args = parser.parse_args()
+
+    specs = sample_specs()
+    # Load fonts and backends before timing
+    for name in PROFILES:
+        render_chart(specs[0], name)
+
+    print(f"{len(specs)} charts, median of {args.runs} runs")
+    print(f"{'profile':<10} {'format':<6} {'dpi':>4} {'scale':>5} {'tight':>5} {'ms/chart':>9} {'KB/chart':>9}")
+    for name in args.profiles.split(","):
+        profile = PROFILES[name]
+        seconds, sizes = [], []
+        for spec in specs:
+            runs = []
+            for _ in range(args.runs):
+                started = time.perf_counter()
+                body = render_chart(spec, name)
+                runs.append(time.perf_counter() - started)
+            seconds.append(statistics.median(runs))
+            sizes.append(len(body))
+        print(
+            f"{name:<10} {profile.fmt:<6} {profile.dpi:>4g} {profile.scale:>5g} {str(profile.tight):>5} "
+            f"{statistics.mean(seconds) * 1000:9.0f} {statistics.mean(sizes) / 1024:9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
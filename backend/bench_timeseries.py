@@ -0,0 +1,64 @@
+"""JSON size and render time of long daily trend lines, with and without LTTB.
+
+Builds a synthetic daily revenue series (trend, weekly pattern, noise and a
+few one-day spikes) over several years and, for each target point count,
+reports the time to downsample, the size of the ``chart_data`` JSON, the
+time to render the line chart, and whether every spike survived.
+
+Usage:
+    python bench_timeseries.py [--years 10] [--targets 0,1000,500,200] [--profile png]
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from chart_render import ChartSpec, render_chart
+from timeseries import downsample, period_labels
+
+
+def daily_revenue(years: int) -> pd.Series:
+    days = pd.date_range("2015-01-01", periods=365 * years, freq="D")
+    rng = np.random.default_rng(7)
+    t = np.arange(len(days))
+    values = 30000 + 8 * t + 6000 * (days.dayofweek >= 5) + rng.normal(0, 2500, len(days))
+    # Festival days: the points a downsampled line must not lose
+    values[t % 97 == 50] *= 3
+    return pd.Series(values, index=days)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--targets", default="0,1000,500,200")
+    parser.add_argument("--profile", default="png")
+    args = parser.parse_args()
+
+    series = daily_revenue(args.years)
+    spikes = set(series.index[np.arange(len(series)) % 97 == 50])
+    # Load fonts and backends before timing
+    render_chart(ChartSpec("single", "line", "Warm-up", "Date", ["a", "b"], [[1.0, 2.0]], ["Row Total"],
+                           ["Row Total"], ["sum"]), args.profile)
+
+    print(f"{len(series)} daily points, {len(spikes)} spikes")
+    print(f"{'points':>7} {'LTTB ms':>8} {'JSON KB':>8} {'render s':>9} {'spikes kept':>12}")
+    for target in (int(t) for t in args.targets.split(",")):
+        started = time.perf_counter()
+        shown = downsample(series, target) if target else series
+        lttb_ms = (time.perf_counter() - started) * 1000
+        labels = period_labels(shown.index, "day")
+        values = [float(v) for v in shown.values]
+        payload = json.dumps([{"name": label, "value": value} for label, value in zip(labels, values)])
+        spec = ChartSpec("single", "line", "Daily Revenue", "Date", labels, [values], ["Row Total"], ["Row Total"],
+                         ["sum"], x_positions=[(ts - shown.index[0]).days for ts in shown.index])
+        started = time.perf_counter()
+        render_chart(spec, args.profile)
+        render_s = time.perf_counter() - started
+        kept = len(spikes & set(shown.index))
+        print(f"{len(shown):>7} {lttb_ms:8.1f} {len(payload) / 1024:8.1f} {render_s:9.2f} {kept:>6}/{len(spikes)}")
+
+
+if __name__ == "__main__":
+    main()
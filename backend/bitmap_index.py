@@ -0,0 +1,187 @@
+"""Bitmap inverted index over the dimension and calendar columns.
+
+For every distinct value of an indexed column the index records which rows
+hold it: rare values as sorted int32 row positions, common ones as packed
+bitsets (one bit per row), whichever is smaller -- the same container split
+roaring bitmaps make. A plan's filters are each resolved to a packed row
+selection and combined with bitwise AND/OR, and the frame is materialized
+once, after the last filter, instead of once per filter.
+"""
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from columnar import DIMENSION_COLUMNS
+from date_index import MONTH_COL, YEAR_COL, calendar_values, date_range_bounds, day_bounds, has_calendar_columns
+
+CALENDAR_INDEX_COLUMNS = {"month": MONTH_COL, "year": YEAR_COL}
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+_MAX_CACHED_INDEXES = 8
+_index_cache: dict[int, "BitmapIndex"] = {}
+# Request, speculation, batch and hedge threads all look indexes up
+_index_cache_lock = threading.Lock()
+
+
+class BitmapIndex:
+    """Per-value row sets for one frame; selections are packed ``uint8`` bitsets."""
+
+    def __init__(self, frame: pd.DataFrame, columns: list[str] | None = None):
+        self._frame = weakref.ref(frame)
+        self.rows = len(frame)
+        self.nbytes = 0
+        self._codes: dict[str, np.ndarray] = {}
+        self._keys: dict[str, dict[int, int]] = {}
+        self._containers: dict[str, list[np.ndarray]] = {}
+        self._present: dict[str, np.ndarray] = {}
+        columns = columns or DIMENSION_COLUMNS + (list(CALENDAR_INDEX_COLUMNS.values()) if has_calendar_columns(frame) else [])
+        for col in columns:
+            if col in frame.columns:
+                self._add_column(frame, col)
+
+    @property
+    def frame(self) -> pd.DataFrame | None:
+        return self._frame()
+
+    def _add_column(self, frame: pd.DataFrame, col: str) -> None:
+        series = frame[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy()
+            cardinality = len(series.cat.categories)
+            keys = None
+            # Kept (a view, not a copy) to find the values present in a selection
+            self._codes[col] = codes
+        else:
+            # Small integer columns (calendar parts); -1 marks a missing date
+            uniques, codes = np.unique(series.to_numpy(), return_inverse=True)
+            keys = {int(v): i for i, v in enumerate(uniques) if v >= 0}
+            codes = np.where(series.to_numpy() >= 0, codes, -1)
+            cardinality = len(uniques)
+        codes = codes.astype(np.int32)
+
+        # Stable sort groups the row positions of each code, already in row order
+        order = np.argsort(codes, kind="stable").astype(np.int32)
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(codes + 1, minlength=cardinality + 1))])
+        containers = []
+        for code in range(cardinality):
+            positions = order[bounds[code + 1]:bounds[code + 2]]
+            # Positions cost 32 bits per row holding the value, a bitset 1 bit per frame row
+            if len(positions) * 32 > self.rows:
+                bits = np.zeros(self.rows, dtype=bool)
+                bits[positions] = True
+                container = np.packbits(bits)
+            else:
+                container = positions.copy()
+            containers.append(container)
+            self.nbytes += container.nbytes
+        self._containers[col] = containers
+        self._present[col] = np.flatnonzero(np.diff(bounds[1:]))
+        if keys is not None:
+            self._keys[col] = keys
+
+    @property
+    def columns(self) -> list[str]:
+        return list(self._containers)
+
+    def all_rows(self) -> np.ndarray:
+        return self.range_rows(0, self.rows)
+
+    def range_rows(self, lo: int, hi: int) -> np.ndarray:
+        """Selection of the row positions ``[lo, hi)``."""
+        bits = np.zeros(self.rows, dtype=bool)
+        bits[lo:hi] = True
+        return np.packbits(bits)
+
+    def date_range_rows(self, date_col: str, start, end) -> np.ndarray:
+        """Selection of rows with ``start <= date <= end``."""
+        frame = self.frame
+        if not has_calendar_columns(frame):
+            dates = frame[date_col]
+            return self.mask_rows((dates >= pd.Timestamp(start)) & (dates <= pd.Timestamp(end)))
+        return self.range_rows(*date_range_bounds(frame, date_col, start, end))
+
+    def day_rows(self, date_col: str, day) -> np.ndarray:
+        """Selection of rows falling on calendar day ``day``."""
+        frame = self.frame
+        if not has_calendar_columns(frame):
+            return self.mask_rows(frame[date_col].dt.normalize() == pd.Timestamp(day).normalize())
+        return self.range_rows(*day_bounds(frame, date_col, day))
+
+    def mask_rows(self, mask) -> np.ndarray:
+        """Selection from a boolean row mask."""
+        return np.packbits(np.asarray(mask, dtype=bool))
+
+    def value_rows(self, col: str, codes) -> np.ndarray:
+        """Selection of rows whose ``col`` code is one of ``codes`` (OR of the value bitmaps)."""
+        containers = self._containers[col]
+        selection = np.zeros((self.rows + 7) // 8, dtype=np.uint8)
+        sparse = []
+        for code in np.unique(np.asarray(codes, dtype=np.int64)):
+            if code < 0 or code >= len(containers):
+                continue
+            container = containers[code]
+            if container.dtype == np.uint8:
+                selection |= container
+            else:
+                sparse.append(container)
+        if sparse:
+            bits = np.zeros(self.rows, dtype=bool)
+            for positions in sparse:
+                bits[positions] = True
+            selection |= np.packbits(bits)
+        return selection
+
+    def calendar_rows(self, part: str, values, date_col: str = "Date") -> np.ndarray:
+        """Selection of rows whose ``part`` ("month" or "year") is one of ``values``."""
+        col = CALENDAR_INDEX_COLUMNS[part]
+        keys = self._keys.get(col)
+        if keys is None:
+            component = getattr(self.frame[date_col].dt, part)
+            return self.mask_rows(component.isin(calendar_values(values)).to_numpy())
+        return self.value_rows(col, [keys[v] for v in calendar_values(values) if v in keys])
+
+    def to_mask(self, selection: np.ndarray) -> np.ndarray:
+        return np.unpackbits(selection, count=self.rows).view(bool)
+
+    def count(self, selection: np.ndarray) -> int:
+        return int(_POPCOUNT[selection].sum(dtype=np.int64))
+
+    def present_codes(self, col: str, selection: np.ndarray) -> np.ndarray:
+        """Codes of ``col`` that occur in the selected rows (NaN excluded)."""
+        if self.count(selection) == self.rows:
+            return self._present[col]
+        codes = self._codes[col][self.to_mask(selection)]
+        return np.flatnonzero(np.bincount(codes[codes >= 0], minlength=len(self._containers[col])))
+
+    def take(self, selection: np.ndarray) -> pd.DataFrame:
+        """Materialize the selected rows of the indexed frame in one step."""
+        frame = self.frame
+        positions = np.flatnonzero(self.to_mask(selection))
+        if len(positions) == 0 or positions[-1] - positions[0] + 1 == len(positions):
+            # Contiguous (e.g. a pure date range on the sorted frame): a slice, no copy
+            start = int(positions[0]) if len(positions) else 0
+            return frame.iloc[start:start + len(positions)]
+        return frame.take(positions)
+
+
+def get_bitmap_index(frame: pd.DataFrame) -> BitmapIndex:
+    """Return the cached bitmap index for ``frame``, building it on first use.
+
+    The build runs under the cache lock, so threads asking for a new frame at
+    once build its index once.
+    """
+    with _index_cache_lock:
+        index = _index_cache.get(id(frame))
+        if index is not None and index.frame is frame:
+            return index
+        for key, cached in list(_index_cache.items()):
+            if cached.frame is None:
+                _index_cache.pop(key, None)
+        while len(_index_cache) >= _MAX_CACHED_INDEXES:
+            _index_cache.pop(next(iter(_index_cache)), None)
+        index = BitmapIndex(frame)
+        _index_cache[id(frame)] = index
+    print(f"Built bitmap index: {len(index.columns)} columns over {index.rows} rows ({index.nbytes / 1e6:.1f} MB)")
+    return index
@@ -0,0 +1,313 @@
+"""Draw a chart from its computed series, separately from the data work.
+
+``app_v1.compute_chart`` filters and aggregates and returns a ``ChartSpec``:
+the labels and values to plot plus the few plan fields that affect drawing,
+all plain Python objects. ``draw_chart`` turns a spec into a matplotlib figure
+and ``render_chart`` into file bytes, so a chart can be rendered later (or
+elsewhere) without the dataset.
+
+``render_chart`` takes a render profile name: the output format plus DPI,
+figure scale, whether to crop to the drawn area (``bbox_inches="tight"``,
+one more layout pass) and how the PDF/SVG backend embeds fonts.
+``bench_render_profiles.py`` measures time and size for each.
+
+Figures are plain ``matplotlib.figure.Figure`` objects on their own Agg canvas,
+never registered with pyplot, so request threads can draw at the same time
+and a figure is freed with its last reference even if drawing fails. Font
+embedding settings are process-wide rcParams, so PDF and SVG output is
+written one file at a time.
+"""
+import io
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from matplotlib import rc_context
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.container import BarContainer
+from matplotlib.figure import Figure
+from matplotlib.ticker import FuncFormatter
+
+PROFESSIONAL_COLORS = ['#1e40af', '#059669', '#d97706', '#dc2626', '#7c3aed', '#0891b2', '#65a30d', '#ea580c']
+MONTH_COLORS = ['#1e40af', '#059669', '#d97706', '#dc2626']
+FORMATS = {"pdf": "application/pdf", "png": "image/png", "svg": "image/svg+xml"}
+# Part of every render cache key; bump it when the drawing code changes
+RENDER_VERSION = "3"
+# With more bars than this, only the tallest get a value label
+MAX_VALUE_LABELS = 30
+# With more bars than this, only every n-th gets a tick label
+MAX_TICK_LABELS = 40
+# Line charts with more points than this are drawn without markers
+MAX_LINE_MARKERS = 60
+# A pie keeps its largest wedges and draws the rest as one "Other" wedge of their total
+MAX_PIE_WEDGES = 25
+_RC_LOCK = threading.Lock()
+
+
+@dataclass
+class RenderProfile:
+    fmt: str
+    dpi: float
+    # Figure size relative to the full 20x12 (24x10 for two panels) inch layout
+    scale: float = 1.0
+    # Crop to the drawn area; costs one more layout pass
+    tight: bool = True
+    # rcParams for the backend that writes the file
+    rc: dict = field(default_factory=dict)
+
+
+PROFILES = {
+    # The original report PDF and PNG
+    "pdf": RenderProfile("pdf", 150, rc={"pdf.fonttype": 3, "pdf.compression": 6}),
+    "png": RenderProfile("png", 100),
+    # Small preview for the chat history (400x240 px)
+    "thumbnail": RenderProfile("png", 40, scale=0.5, tight=False),
+    # Text stays text for the browser to draw, instead of one path per glyph
+    "svg": RenderProfile("svg", 72, rc={"svg.fonttype": "none"}),
+    # Compact vector PDF: Type 3 fonts carry only the glyphs used, maximum compression, no crop
+    # pass. Embedding subsetted TrueType (type 42) instead took about twice as long to save 3 KB.
+    "slack": RenderProfile("pdf", 72, tight=False, rc={"pdf.fonttype": 3, "pdf.compression": 9}),
+    # Full resolution for printing, with TrueType fonts
+    "print": RenderProfile("pdf", 300, rc={"pdf.fonttype": 42, "pdf.compression": 6}),
+}
+
+
+def get_profile(name: str) -> RenderProfile:
+    if name not in PROFILES:
+        raise ValueError(f"Unknown render profile: {name}")
+    return PROFILES[name]
+
+
+def profile_suffix(name: str) -> str:
+    """File suffix for a profile's output: "pdf" or "png" for those profiles, else e.g. "slack.pdf"."""
+    fmt = get_profile(name).fmt
+    return fmt if name == fmt else f"{name}.{fmt}"
+
+
+@dataclass
+class ChartSpec:
+    # "single" (one metric), "dual" (two metrics side by side) or "monthly" (months side by side)
+    kind: str
+    chart_type: str
+    title: str
+    x_col: str
+    labels: list
+    # One list of values per series, in label order: the metric, the two metrics, or one per month
+    series: list[list[float]]
+    series_names: list[str]
+    # The y column and aggregation of each metric (one, or two for "dual")
+    metrics: list[str] = field(default_factory=list)
+    aggregations: list[str] = field(default_factory=list)
+    # x position of each label on a time axis (days since the first), when the points are not evenly spaced
+    x_positions: list[float] | None = None
+
+
+def other_label(count: int) -> str:
+    """Label of the bar or wedge that stands for ``count`` smaller values"""
+    return f"Other ({count:,} more)"
+
+
+def _value_label(value: float, y_col: str) -> str:
+    return f'₹{value:,.0f}' if y_col == 'Row Total' else f'{value:.0f}'
+
+
+def _edge_width(count: int) -> float:
+    """White gaps between bars, until the bars get too thin to see through them"""
+    return 1.5 if count <= MAX_TICK_LABELS else 0
+
+
+def _label_size(count: int, fontsize: float) -> float:
+    """Smaller text as there are more bars to label"""
+    if count <= 12:
+        return fontsize
+    return fontsize - 1 if count <= 24 else fontsize - 2
+
+
+def _label_bars(ax, bars: BarContainer, text, fontsize: float) -> None:
+    """``text(value)`` above each bar, or above the ``MAX_VALUE_LABELS`` tallest when there are more."""
+    values = list(bars.datavalues)
+    if len(values) > MAX_VALUE_LABELS:
+        tallest = sorted(sorted(range(len(values)), key=values.__getitem__, reverse=True)[:MAX_VALUE_LABELS])
+        bars = BarContainer([bars.patches[i] for i in tallest], datavalues=[values[i] for i in tallest],
+                            orientation="vertical")
+        values = list(bars.datavalues)
+    # Past a dozen bars the labels are wider than the bars, so they run upwards (with room above the tallest)
+    upright = len(values) <= 12
+    ax.bar_label(bars, labels=[text(v) for v in values], padding=2, fontweight='bold',
+                 fontsize=_label_size(len(values), fontsize), rotation=0 if upright else 90)
+    if not upright:
+        ax.margins(y=0.12)
+
+
+def _set_category_ticks(ax, labels: list, offset: float = 0.0, fontsize: float = 11, upright_max: int = 5,
+                        positions: list[float] | None = None) -> None:
+    """Tick labels under the bars, for every n-th bar when there are more than ``MAX_TICK_LABELS``."""
+    step = max(1, -(-len(labels) // MAX_TICK_LABELS))
+    shown = range(0, len(labels), step)
+    upright = len(labels) <= upright_max
+    ax.set_xticks([(positions[i] if positions else i) + offset for i in shown])
+    ax.set_xticklabels([labels[i] for i in shown], rotation=0 if upright else 45, ha='center' if upright else 'right',
+                       fontsize=fontsize if len(shown) <= 20 else fontsize - 2)
+
+
+def _draw_monthly(spec: ChartSpec, ax1, ax2) -> None:
+    y_col_1, agg_1 = spec.metrics[0], spec.aggregations[0]
+    items = spec.labels
+    x_pos = range(len(items))
+    width = 0.35
+    months = spec.series_names
+
+    for i, (month, values) in enumerate(zip(months, spec.series)):
+        bars = ax1.bar([x + width*i for x in x_pos], values, width,
+                       label=month, color=MONTH_COLORS[i % len(MONTH_COLORS)], alpha=0.95, edgecolor='white', linewidth=1.5)
+        _label_bars(ax1, bars, lambda v: _value_label(v, y_col_1), 8)
+
+    _set_category_ticks(ax1, items, offset=width/2, fontsize=10, upright_max=0)
+    ax1.set_xlabel(spec.x_col, fontsize=12, fontweight="bold")
+    ax1.set_ylabel(f"{y_col_1} ({agg_1})", fontsize=12, fontweight="bold")
+    ax1.set_title(f"{' vs '.join(months)} {y_col_1} Comparison", fontsize=14, fontweight="bold")
+    ax1.legend()
+
+    # Second chart shows percentage comparison
+    totals = [sum(values[j] for values in spec.series) for j in range(len(items))]
+    for i, (month, values) in enumerate(zip(months, spec.series)):
+        percentages = [(values[j] / totals[j] * 100) if totals[j] > 0 else 0 for j in range(len(items))]
+        bars = ax2.bar([x + width*i for x in x_pos], percentages, width,
+                       label=month, color=MONTH_COLORS[i % len(MONTH_COLORS)], alpha=0.95)
+        _label_bars(ax2, bars, lambda v: f'{v:.1f}%', 8)
+
+    _set_category_ticks(ax2, items, offset=width/2, fontsize=10, upright_max=0)
+    ax2.set_xlabel(spec.x_col, fontsize=12, fontweight="bold")
+    ax2.set_ylabel("Percentage Share", fontsize=12, fontweight="bold")
+    ax2.set_title("Percentage Share Comparison", fontsize=14, fontweight="bold")
+    ax2.legend()
+
+
+def _draw_dual(spec: ChartSpec, ax1, ax2) -> None:
+    for ax, values, y_col, agg, color in zip(
+        (ax1, ax2), spec.series, spec.metrics, spec.aggregations, ('#1e40af', '#059669')
+    ):
+        bars = ax.bar(range(len(values)), values, color=color, alpha=0.95, edgecolor='white',
+                      linewidth=_edge_width(len(values)))
+        _set_category_ticks(ax, spec.labels)
+        ax.set_xlabel(spec.x_col, fontsize=12, fontweight="bold")
+        ax.set_ylabel(f"{y_col} ({agg})", fontsize=12, fontweight="bold")
+        ax.set_title(f"{y_col} Analysis", fontsize=14, fontweight="bold")
+        _label_bars(ax, bars, lambda v, y_col=y_col: _value_label(v, y_col), 9)
+
+
+def _draw_single(spec: ChartSpec, ax) -> None:
+    labels, values = spec.labels, spec.series[0]
+    x_col, y_col = spec.x_col, spec.metrics[0]
+
+    if spec.chart_type == "pie":
+        # Wedges come largest first
+        if len(values) > MAX_PIE_WEDGES:
+            kept = MAX_PIE_WEDGES - 1
+            labels = list(labels[:kept]) + [other_label(len(values) - kept)]
+            values = list(values[:kept]) + [sum(values[kept:])]
+        colors = [PROFESSIONAL_COLORS[i % len(PROFESSIONAL_COLORS)] for i in range(len(values))]
+        wedges, texts, autotexts = ax.pie(
+            values,
+            labels=None,
+            autopct=lambda pct: f'{pct:.1f}%' if pct > 3 else '',
+            colors=colors,
+            startangle=90,
+            pctdistance=0.85,
+            explode=[0.05 if i == 0 else 0 for i in range(len(values))]
+        )
+        for autotext in autotexts:
+            autotext.set_color("white")
+            autotext.set_fontweight("bold")
+            autotext.set_fontsize(10)
+        ax.legend(wedges, [f'{name}: {_value_label(value, y_col)}' for name, value in zip(labels, values)],
+                  title=x_col, loc="center left", bbox_to_anchor=(1, 0, 0.5, 1), fontsize=10 if len(values) <= 20 else 8)
+        return
+
+    if spec.chart_type == "line":
+        few = len(values) <= MAX_LINE_MARKERS
+        ax.plot(spec.x_positions or range(len(values)), values, marker="o" if few else None,
+                linewidth=3 if few else 1.5, markersize=8)
+    else:
+        bar_colors = [PROFESSIONAL_COLORS[i % len(PROFESSIONAL_COLORS)] for i in range(len(values))]
+        bars = ax.bar(range(len(values)), values, color=bar_colors, alpha=0.95, edgecolor='white',
+                      linewidth=_edge_width(len(values)))
+    _set_category_ticks(ax, labels, positions=spec.x_positions)
+    ax.set_xlabel(x_col, fontsize=12, fontweight="bold")
+    ax.set_ylabel(f"{y_col} {'(Lakhs)' if y_col == 'Row Total' else ''}", fontsize=12, fontweight="bold")
+    if y_col == "Row Total":
+        ax.yaxis.set_major_formatter(FuncFormatter(lambda x, p: f'{x/100000:g}'))
+    if spec.chart_type == "line":
+        ax.grid(True, alpha=0.3)
+        return
+    _label_bars(ax, bars, lambda v: _value_label(v, y_col), 9)
+
+
+def new_figure(figsize: tuple[float, float]) -> Figure:
+    """A figure with its own Agg canvas, outside pyplot's figure registry."""
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def draw_chart(spec: ChartSpec, scale: float = 1.0) -> Figure:
+    """The matplotlib figure for ``spec``."""
+    if spec.kind == "single":
+        fig = new_figure((20 * scale, 12 * scale))
+        ax = fig.subplots()
+        _draw_single(spec, ax)
+        ax.set_title(spec.title, fontsize=16, fontweight="bold", pad=20)
+        fig.tight_layout()
+        return fig
+
+    fig = new_figure((24 * scale, 10 * scale))
+    ax1, ax2 = fig.subplots(1, 2)
+    if spec.kind == "monthly":
+        _draw_monthly(spec, ax1, ax2)
+    else:
+        _draw_dual(spec, ax1, ax2)
+    fig.suptitle(spec.title, fontsize=16, fontweight="bold")
+    fig.tight_layout()
+    fig.subplots_adjust(top=0.9)
+    return fig
+
+
+def _save_options(profile: RenderProfile) -> dict:
+    return {"dpi": profile.dpi, "bbox_inches": "tight" if profile.tight else None}
+
+
+@contextmanager
+def _profile_rc(profile: RenderProfile):
+    """The profile's rcParams while its file is written (a PDF gets its fonts when it is closed)."""
+    if not profile.rc:
+        yield
+        return
+    with _RC_LOCK, rc_context(profile.rc):
+        yield
+
+
+def render_pages(specs: list[ChartSpec], profile: str = "pdf") -> bytes:
+    """One PDF with a page per spec, drawing one figure at a time."""
+    settings = get_profile(profile)
+    if settings.fmt != "pdf":
+        raise ValueError(f"Render profile {profile} does not produce a PDF")
+    with io.BytesIO() as buffer:
+        with _profile_rc(settings), PdfPages(buffer) as pdf:
+            for spec in specs:
+                pdf.savefig(draw_chart(spec, settings.scale), **_save_options(settings))
+        return buffer.getvalue()
+
+
+def render_chart(spec: ChartSpec, profile: str = "pdf") -> bytes:
+    """``spec`` rendered with the named profile."""
+    settings = get_profile(profile)
+    fig = draw_chart(spec, settings.scale)
+    with io.BytesIO() as buffer:
+        with _profile_rc(settings):
+            if settings.fmt == "pdf":
+                with PdfPages(buffer) as pdf:
+                    pdf.savefig(fig, **_save_options(settings))
+            else:
+                fig.savefig(buffer, format=settings.fmt, **_save_options(settings))
+        return buffer.getvalue()
@@ -0,0 +1,188 @@
+"""Dictionary-encoded dimension columns for the Anandhaas sales data.
+
+The text dimensions are stored as pandas categoricals so every row holds a
+small integer code. String work (lowercasing, exact/regex matching) is done
+once per distinct value on the lowercased vocabulary, and rows are then
+selected by looking their codes up in a boolean table. Fuzzy search terms
+are resolved against the vocabulary once per (column, term) and cached, so a
+repeated filter costs a few array operations over the distinct values.
+"""
+import re
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+DIMENSION_COLUMNS = [
+    "Branch Name",
+    "Group Name",
+    "Category",
+    "Item/Service Description",
+    "Customer/Vendor Name",
+    "SubGroup",
+]
+
+_MAX_CACHED_LOOKUPS = 64
+_MAX_CACHED_TERMS = 256
+_lookup_cache: dict[int, "DimensionLookup"] = {}
+# Request, speculation, batch and hedge threads share the caches
+_lookup_cache_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1024)
+def _compile(pattern: str) -> re.Pattern:
+    return re.compile(pattern, flags=re.IGNORECASE)
+
+
+@dataclass
+class FuzzyMatch:
+    """Codes a fuzzy term resolved to, plus what the resolution did (for debug output)."""
+    codes: np.ndarray
+    exact: bool = False
+    conflicting: list[str] = field(default_factory=list)
+    excluded: list[str] = field(default_factory=list)
+
+
+class _TermTable:
+    """Everything about one search term that only depends on the vocabulary."""
+
+    def __init__(self, lookup: "DimensionLookup", term: str):
+        lowered = lookup.lowered.tolist()
+        self.exact = lookup.exact_codes(term)
+        # Word boundary matching avoids substring matches
+        word = _compile(r'\b' + term.replace(' ', r'\s+') + r'\b')
+        self.word = np.array([word.search(v) is not None for v in lowered], dtype=bool)
+        # Fallback when no value matches on word boundaries (the term is a regex, as before)
+        contains = _compile(term)
+        self.contains = np.array([contains.search(v) is not None for v in lowered], dtype=bool)
+        # Longer values containing the term, with the codes spelling them and what they exclude
+        self.conflicts: list[tuple[str, np.ndarray, np.ndarray | None]] = []
+        for value in sorted({v for v in lowered if term in v and v != term}):
+            excludes = None
+            if len(value.split()) > len(term.split()):
+                pattern = _compile(value)
+                excludes = np.array([pattern.search(v) is not None for v in lowered], dtype=bool)
+            self.conflicts.append((value, lookup.exact_codes(value), excludes))
+
+
+class DimensionLookup:
+    """Pre-normalized vocabulary of one categorical column, indexed by code."""
+
+    def __init__(self, dtype: pd.CategoricalDtype):
+        self.dtype = dtype
+        self.values = pd.Series(dtype.categories.astype(str), dtype=object)
+        # Position in this Series == category code
+        self.lowered = self.values.str.lower().str.strip()
+        self._codes_by_lowered: dict[str, list[int]] = {}
+        self._term_tables: dict[str, _TermTable] = {}
+        self._term_tables_lock = threading.Lock()
+        for code, value in enumerate(self.lowered):
+            self._codes_by_lowered.setdefault(value, []).append(code)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def exact_codes(self, term: str) -> np.ndarray:
+        """Codes whose lowercased, stripped value equals ``term``."""
+        return np.asarray(self._codes_by_lowered.get(term, []), dtype=np.int64)
+
+    def fuzzy_codes(self, term: str, present: np.ndarray | None = None) -> FuzzyMatch:
+        """Resolve a fuzzy filter term to codes among the ``present`` codes (all codes if None).
+
+        An exact match wins. Otherwise values matching the term on word
+        boundaries are kept, minus values that match a longer multi-word value
+        containing the term; if nothing is left, any value containing the term
+        matches.
+        """
+        with self._term_tables_lock:
+            table = self._term_tables.get(term)
+            if table is None:
+                while len(self._term_tables) >= _MAX_CACHED_TERMS:
+                    self._term_tables.pop(next(iter(self._term_tables)), None)
+                table = self._term_tables[term] = _TermTable(self, term)
+
+        allowed = np.zeros(len(self), dtype=bool)
+        allowed[np.arange(len(self)) if present is None else present] = True
+        exact = table.exact[allowed[table.exact]]
+        if len(exact):
+            return FuzzyMatch(exact, exact=True)
+
+        matched = table.word & allowed
+        conflicting, excluded = [], []
+        for value, value_codes, excludes in table.conflicts:
+            if not allowed[value_codes].any():
+                continue
+            conflicting.append(value)
+            if excludes is not None:
+                matched &= ~excludes
+                excluded.append(value)
+        if not matched.any():
+            matched = table.contains & allowed
+        return FuzzyMatch(np.flatnonzero(matched), conflicting=conflicting, excluded=excluded)
+
+    def codes_for_values(self, values) -> np.ndarray:
+        """Codes whose original value is one of ``values`` (case-sensitive)."""
+        return np.flatnonzero(self.values.isin([str(v) for v in values]).to_numpy())
+
+
+def get_dimension_lookup(series: pd.Series) -> DimensionLookup:
+    """Return the cached lookup table for a categorical column (or any slice of it)."""
+    dtype = series.dtype
+    with _lookup_cache_lock:
+        lookup = _lookup_cache.get(id(dtype))
+        if lookup is None or lookup.dtype is not dtype:
+            while len(_lookup_cache) >= _MAX_CACHED_LOOKUPS:
+                _lookup_cache.pop(next(iter(_lookup_cache)), None)
+            lookup = DimensionLookup(dtype)
+            _lookup_cache[id(dtype)] = lookup
+        return lookup
+
+
+def present_codes(series: pd.Series) -> np.ndarray:
+    """Codes that actually occur in ``series`` (NaN excluded)."""
+    codes = series.cat.codes.to_numpy()
+    counts = np.bincount(codes[codes >= 0], minlength=len(series.cat.categories))
+    return np.flatnonzero(counts)
+
+
+def code_mask(series: pd.Series, codes) -> np.ndarray:
+    """Boolean row mask for rows whose code is in ``codes``."""
+    # One extra trailing slot so NaN (code -1) always maps to False
+    table = np.zeros(len(series.cat.categories) + 1, dtype=bool)
+    table[np.asarray(codes, dtype=np.int64)] = True
+    return table[series.cat.codes.to_numpy()]
+
+
+def encode_dimensions(df: pd.DataFrame, columns: list[str] | None = None) -> pd.DataFrame:
+    """Convert the dimension columns to categoricals and build their lookup tables."""
+    columns = [c for c in (columns or DIMENSION_COLUMNS) if c in df.columns]
+    before = {}
+    for col in columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            continue
+        before[col] = int(df[col].memory_usage(index=False, deep=True))
+        df[col] = df[col].astype("category")
+    for col in columns:
+        get_dimension_lookup(df[col])
+    if before:
+        print_memory_report(df, before)
+    return df
+
+
+def print_memory_report(df: pd.DataFrame, before: dict[str, int]) -> None:
+    """Print per-column memory before and after dictionary encoding."""
+    total_before = total_after = 0
+    print("Dictionary encoding memory report:")
+    for col, old_bytes in before.items():
+        new_bytes = int(df[col].memory_usage(index=False, deep=True))
+        total_before += old_bytes
+        total_after += new_bytes
+        print(
+            f"  {col}: {old_bytes / 1e6:.1f} MB -> {new_bytes / 1e6:.1f} MB "
+            f"({len(df[col].cat.categories)} distinct values)"
+        )
+    saved = total_before - total_after
+    pct = (saved / total_before * 100) if total_before else 0.0
+    print(f"  Total: {total_before / 1e6:.1f} MB -> {total_after / 1e6:.1f} MB (saved {pct:.0f}%)")
@@ -0,0 +1,148 @@
+"""Chunked, typed CSV ingest with a columnar cache.
+
+The CSV export is streamed in fixed-size chunks with ``usecols`` and explicit
+dtypes: text for dimensions and the date, float64 for the measures. A file
+with text in a measure column is read again with the measures as text and one
+``to_numeric`` pass per chunk, so no chunk's dtype depends on what pandas
+infers from it. Dimension columns are dictionary-encoded chunk by chunk
+against a growing vocabulary, so only one chunk of Python strings is alive at
+a time. The prepared frame is written as an Arrow snapshot keyed by the CSV's
+size and mtime; later starts memory-map that instead of parsing the CSV. Each
+CSV and column set gets its own cache subdirectory, so backends loading
+different columns of the same file do not delete each other's snapshots. The
+cached frame is already sorted by date with its calendar columns.
+"""
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:  # pandas < 2.2
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+
+from columnar import DIMENSION_COLUMNS
+from date_index import add_calendar_columns
+from dataset_cache import DEFAULT_CACHE_DIR, dataset_version, read_snapshot, write_snapshot
+
+CSV_CHUNK_ROWS = int(os.getenv("ANANDHAAS_CSV_CHUNK_ROWS", "250000"))
+# strftime format of the date column; guessed from the first chunk when unset
+CSV_DATE_FORMAT = os.getenv("ANANDHAAS_CSV_DATE_FORMAT") or None
+CSV_CACHE_DIR = os.path.join(os.getenv("ANANDHAAS_CACHE_DIR", DEFAULT_CACHE_DIR), "csv")
+
+
+class _Vocabulary:
+    """Global value -> code mapping for one dimension, grown chunk by chunk."""
+
+    def __init__(self):
+        self.code_of: dict[str, int] = {}
+        self.values: list[str] = []
+
+    def encode(self, series: pd.Series) -> np.ndarray:
+        local_codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        mapping = np.empty(len(uniques) + 1, dtype=np.int32)
+        mapping[-1] = -1  # NaN sentinel (-1) indexes the last slot
+        for i, value in enumerate(uniques):
+            code = self.code_of.get(value)
+            if code is None:
+                code = self.code_of[value] = len(self.values)
+                self.values.append(value)
+            mapping[i] = code
+        return mapping[local_codes]
+
+    def to_categorical(self, codes: np.ndarray) -> pd.Categorical:
+        # Sorted categories, matching what astype("category") would produce
+        order = np.argsort(np.asarray(self.values, dtype=object), kind="stable")
+        remap = np.empty(len(order) + 1, dtype=np.int32)
+        remap[order] = np.arange(len(order), dtype=np.int32)
+        remap[-1] = -1
+        categories = [self.values[i] for i in order]
+        return pd.Categorical.from_codes(remap[codes], categories=categories)
+
+
+def _parse_dates(values: pd.Series, date_format: str | None) -> pd.Series:
+    if date_format is None:
+        return pd.to_datetime(values, errors="coerce")
+    return pd.to_datetime(values, format=date_format, errors="coerce")
+
+
+def ingest_csv(csv_path: str, columns: list[str], date_col: str, numeric_cols: list[str],
+               chunksize: int = CSV_CHUNK_ROWS, date_format: str | None = CSV_DATE_FORMAT) -> pd.DataFrame:
+    """Stream ``csv_path`` into a typed frame with categorical dimensions."""
+    try:
+        return _ingest(csv_path, columns, date_col, numeric_cols, chunksize, date_format, "float64")
+    except ValueError as e:
+        # Text in a measure column; read all of them as text so every chunk parses the same way
+        print(f"Measures in {csv_path} are not all numbers ({e}); reading them as text")
+        return _ingest(csv_path, columns, date_col, numeric_cols, chunksize, date_format, str)
+
+
+def _ingest(csv_path: str, columns: list[str], date_col: str, numeric_cols: list[str], chunksize: int,
+            date_format: str | None, measure_dtype) -> pd.DataFrame:
+    dims = [c for c in columns if c in DIMENSION_COLUMNS]
+    numerics = [c for c in columns if c in numeric_cols]
+    others = [c for c in columns if c not in dims and c not in numerics and c != date_col]
+    dtypes = {c: str for c in dims + [date_col]}
+    dtypes.update({c: measure_dtype for c in numerics})
+    vocabularies = {c: _Vocabulary() for c in dims}
+    parts: dict[str, list[np.ndarray]] = {c: [] for c in columns}
+
+    rows = 0
+    reader = pd.read_csv(csv_path, usecols=columns, dtype=dtypes, chunksize=chunksize)
+    for chunk in reader:
+        if date_format is None:
+            sample = chunk[date_col].dropna()
+            if not sample.empty:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    date_format = guess_datetime_format(sample.iloc[0])
+        parts[date_col].append(_parse_dates(chunk[date_col], date_format).to_numpy())
+        for col in numerics:
+            values = chunk[col] if measure_dtype == "float64" else pd.to_numeric(chunk[col], errors="coerce")
+            parts[col].append(values.to_numpy(dtype="float64"))
+        for col in dims:
+            parts[col].append(vocabularies[col].encode(chunk[col]))
+        for col in others:
+            parts[col].append(chunk[col].to_numpy())
+        rows += len(chunk)
+        del chunk
+
+    data = {}
+    for col in columns:
+        if not parts[col]:
+            data[col] = np.array([], dtype="datetime64[ns]" if col == date_col else "float64")
+            continue
+        merged = np.concatenate(parts[col])
+        parts[col] = []
+        data[col] = vocabularies[col].to_categorical(merged) if col in vocabularies else merged
+    print(f"Ingested {rows} CSV rows in chunks of {chunksize} (date format: {date_format or 'inferred'})")
+    return pd.DataFrame(data, columns=columns)
+
+
+def load_csv_dataset(csv_path: str, required: list[str], optional: list[str] | None = None,
+                     date_col: str = "Posting Date", numeric_cols: list[str] | None = None,
+                     cache_dir: str = CSV_CACHE_DIR) -> pd.DataFrame | None:
+    """Typed frame for ``csv_path``, from the columnar cache when the CSV is unchanged."""
+    header = pd.read_csv(csv_path, nrows=0).columns
+    missing_cols = [c for c in required if c not in header]
+    if missing_cols:
+        print(f"Missing required columns: {missing_cols}")
+        return None
+    columns = required + [c for c in (optional or []) if c in header]
+    numeric_cols = numeric_cols or ["Row Total", "Quantity"]
+
+    stat = os.stat(csv_path)
+    source = {"Key": os.path.abspath(csv_path), "Size": stat.st_size, "LastModified": stat.st_mtime_ns}
+    version = dataset_version([source], columns=columns, date_col=date_col, date_format=CSV_DATE_FORMAT)
+    # write_snapshot prunes its directory; only older versions of this CSV and column set may go
+    cache_dir = os.path.join(cache_dir, dataset_version([], csv=source["Key"], columns=columns, date_col=date_col))
+    df = read_snapshot(cache_dir, version)
+    if df is not None:
+        return df
+
+    df = ingest_csv(csv_path, columns, date_col, numeric_cols)
+    df = add_calendar_columns(df, date_col)
+    write_snapshot(cache_dir, version, df)
+    return df
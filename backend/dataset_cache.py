@@ -0,0 +1,93 @@
+"""Local on-disk snapshot of the prepared dataset.
+
+The prepared DataFrame (parsed dates, numeric measures, categorical
+dimensions) is written as an uncompressed Arrow IPC (Feather v2) file named
+after a version key derived from the source objects' ETag/LastModified/size.
+On startup the file is memory-mapped, so a warm restart only has to list the
+source prefix to revalidate it instead of downloading and re-parsing the data.
+
+Columns without nulls (numbers, dates, dictionary codes) come back as
+read-only views of the mapped file; only columns with nulls are copied into
+memory, because pandas marks missing values in the array itself. NaN measures
+are therefore written as NaN rather than as Arrow nulls.
+"""
+import glob
+import hashlib
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+SNAPSHOT_PREFIX = "dataset-"
+SNAPSHOT_SUFFIX = ".arrow"
+
+
+def dataset_version(objects: list[dict], **params) -> str:
+    """Stable version key for a set of source objects plus load parameters."""
+    entries = [
+        {
+            "key": obj["Key"],
+            "etag": str(obj.get("ETag", "")).strip('"'),
+            "last_modified": str(obj.get("LastModified", "")),
+            "size": obj.get("Size"),
+        }
+        for obj in sorted(objects, key=lambda o: o["Key"])
+    ]
+    payload = json.dumps({"objects": entries, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def snapshot_path(cache_dir: str, version: str) -> str:
+    return os.path.join(cache_dir, f"{SNAPSHOT_PREFIX}{version}{SNAPSHOT_SUFFIX}")
+
+
+def read_snapshot(cache_dir: str, version: str) -> pd.DataFrame | None:
+    """Memory-map the snapshot for ``version``; None if it is missing or unreadable."""
+    path = snapshot_path(cache_dir, version)
+    if not os.path.exists(path):
+        return None
+    try:
+        source = pa.memory_map(path, "r")
+        table = pa.ipc.open_file(source).read_all()
+        copied = [name for name, column in zip(table.column_names, table.columns) if column.null_count]
+        # split_blocks keeps one block per column, so null-free columns stay views of the map
+        df = table.to_pandas(split_blocks=True)
+        print(f"Loaded cached dataset snapshot {version} ({len(df)} records) from {path}; "
+              f"{len(copied)}/{table.num_columns} columns copied" + (f" ({', '.join(copied)})" if copied else ""))
+        return df
+    except Exception as e:
+        print(f"Ignoring unreadable dataset snapshot {path}: {e}")
+        return None
+
+
+def write_snapshot(cache_dir: str, version: str, df: pd.DataFrame) -> str | None:
+    """Atomically write ``df`` as the snapshot for ``version`` and drop older snapshots."""
+    path = snapshot_path(cache_dir, version)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        for i, field in enumerate(table.schema):
+            if table.column(i).null_count and pa.types.is_floating(field.type) and df[field.name].dtype.kind == "f":
+                # from_pandas turns NaN into nulls, which would make the column a copy on every load
+                table = table.set_column(i, field, pa.array(df[field.name].to_numpy(), type=field.type, from_pandas=False))
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Could not write dataset snapshot {path}: {e}")
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        return None
+
+    for old in glob.glob(os.path.join(cache_dir, f"{SNAPSHOT_PREFIX}*{SNAPSHOT_SUFFIX}")):
+        if old != path:
+            try:
+                os.unlink(old)
+            except OSError:
+                pass
+    print(f"Wrote dataset snapshot {version} ({os.path.getsize(path) / 1e6:.1f} MB) to {path}")
+    return path
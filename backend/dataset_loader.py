@@ -0,0 +1,99 @@
+"""Background dataset loading with atomic snapshot swaps.
+
+A ``DatasetSnapshot`` bundles one dataset version with every structure
+derived from it. Request handlers read ``loader.current()`` once and use that
+snapshot for the whole request; a refresh builds the next snapshot off to the
+side and replaces the reference in a single assignment, so in-flight queries
+never see a half-built dataset.
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class DatasetSnapshot:
+    version: str
+    data: pd.DataFrame
+    cube: pd.DataFrame | None = None
+    analysis: dict | None = None
+    loaded_at: float = field(default_factory=time.time)
+
+
+class DatasetLoader:
+    """Loads the first snapshot once (single-flight) and polls for new versions."""
+
+    def __init__(self, build_snapshot: Callable[[], DatasetSnapshot | None],
+                 source_version: Callable[[], str], refresh_seconds: float = 300.0):
+        self.build_snapshot = build_snapshot
+        self.source_version = source_version
+        self.refresh_seconds = refresh_seconds
+        self._snapshot: DatasetSnapshot | None = None
+        self._first_attempt = threading.Event()
+        self._start_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.last_check: float | None = None
+        self.last_error: str | None = None
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="dataset-loader", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def current(self, timeout: float | None = None) -> DatasetSnapshot | None:
+        """The snapshot being served, waiting for the first load if it is still running."""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        self.start()
+        self._first_attempt.wait(timeout)
+        return self._snapshot
+
+    def refresh(self, force: bool = False) -> bool:
+        """Build and swap in a new snapshot if the source version changed."""
+        with self._refresh_lock:
+            self.last_check = time.time()
+            try:
+                current = self._snapshot
+                if current is not None and not force and self.source_version() == current.version:
+                    return False
+                snapshot = self.build_snapshot()
+                if snapshot is None:
+                    self.last_error = "Dataset could not be loaded"
+                    return False
+                self._snapshot = snapshot
+                self.last_error = None
+                print(f"Serving dataset version {snapshot.version} ({len(snapshot.data)} records)")
+                return True
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Dataset refresh failed: {e}")
+                return False
+
+    def status(self) -> dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "ready": snapshot is not None,
+            "dataset_version": snapshot.version if snapshot else None,
+            "records": len(snapshot.data) if snapshot else 0,
+            "loaded_at": snapshot.loaded_at if snapshot else None,
+            "last_check": self.last_check,
+            "last_error": self.last_error,
+            "refresh_seconds": self.refresh_seconds,
+        }
+
+    def _run(self) -> None:
+        self.refresh()
+        self._first_attempt.set()
+        while self.refresh_seconds > 0 and not self._stop.wait(self.refresh_seconds):
+            self.refresh()
@@ -0,0 +1,104 @@
+"""Sorted date index and precomputed calendar columns.
+
+At ingest the frame is sorted by its date column and gets small integer
+columns for year, month, day of week and month period (``year * 12 + month
+- 1``). Boolean selections keep the sort order, so every filtered frame is
+still sorted: date ranges and single days become ``searchsorted`` slices and
+month/year filters become integer comparisons.
+"""
+import calendar
+
+import numpy as np
+import pandas as pd
+
+YEAR_COL = "_year"
+MONTH_COL = "_month"
+DOW_COL = "_dow"
+PERIOD_COL = "_period"
+CALENDAR_COLUMNS = [YEAR_COL, MONTH_COL, DOW_COL, PERIOD_COL]
+
+
+def add_calendar_columns(df: pd.DataFrame, date_col: str) -> pd.DataFrame:
+    """Sort ``df`` by ``date_col`` (NaT last) and add the integer calendar columns."""
+    if not df[date_col].is_monotonic_increasing:
+        df = df.sort_values(date_col, kind="stable", na_position="last").reset_index(drop=True)
+    dates = df[date_col]
+    valid = dates.notna().to_numpy()
+    # -1 marks rows without a date so they never match a calendar filter
+    year = np.where(valid, dates.dt.year.fillna(0).to_numpy(dtype=np.int64), -1)
+    month = np.where(valid, dates.dt.month.fillna(0).to_numpy(dtype=np.int64), -1)
+    dow = np.where(valid, dates.dt.dayofweek.fillna(0).to_numpy(dtype=np.int64), -1)
+    df[YEAR_COL] = year.astype(np.int16)
+    df[MONTH_COL] = month.astype(np.int8)
+    df[DOW_COL] = dow.astype(np.int8)
+    df[PERIOD_COL] = np.where(valid, year * 12 + month - 1, -1).astype(np.int32)
+    return df
+
+
+def has_calendar_columns(frame: pd.DataFrame) -> bool:
+    return PERIOD_COL in frame.columns
+
+
+def _bound(frame: pd.DataFrame, date_col: str, value, side: str) -> int:
+    dates = frame[date_col].to_numpy()
+    return int(np.searchsorted(dates, np.datetime64(pd.Timestamp(value)), side=side))
+
+
+def date_range_bounds(frame: pd.DataFrame, date_col: str, start, end) -> tuple[int, int]:
+    """Row positions ``[lo, hi)`` holding ``start <= date <= end`` in a date-sorted frame."""
+    return _bound(frame, date_col, start, "left"), _bound(frame, date_col, end, "right")
+
+
+def day_bounds(frame: pd.DataFrame, date_col: str, day) -> tuple[int, int]:
+    """Row positions ``[lo, hi)`` falling on calendar day ``day`` in a date-sorted frame."""
+    start = pd.Timestamp(day).normalize()
+    return _bound(frame, date_col, start, "left"), _bound(frame, date_col, start + pd.Timedelta(days=1), "left")
+
+
+def filter_date_range(frame: pd.DataFrame, date_col: str, start, end) -> pd.DataFrame:
+    """Rows with ``start <= date <= end``."""
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    if not has_calendar_columns(frame):
+        return frame[(frame[date_col] >= start) & (frame[date_col] <= end)]
+    lo, hi = date_range_bounds(frame, date_col, start, end)
+    return frame.iloc[lo:hi]
+
+
+def filter_day(frame: pd.DataFrame, date_col: str, day) -> pd.DataFrame:
+    """Rows falling on calendar day ``day`` (any time of day)."""
+    if not has_calendar_columns(frame):
+        return frame[frame[date_col].dt.normalize() == pd.Timestamp(day).normalize()]
+    lo, hi = day_bounds(frame, date_col, day)
+    return frame.iloc[lo:hi]
+
+
+def calendar_values(values) -> list[int]:
+    """Normalize a month/year filter value (scalar or list) to ints."""
+    return [int(v) for v in (values if isinstance(values, (list, tuple, set)) else [values])]
+
+
+def filter_calendar(frame: pd.DataFrame, date_col: str, part: str, values) -> pd.DataFrame:
+    """Rows whose ``part`` ("month" or "year") is one of ``values``."""
+    values = calendar_values(values)
+    if not has_calendar_columns(frame):
+        component = frame[date_col].dt.month if part == "month" else frame[date_col].dt.year
+        return frame[component.isin(values)]
+    column = frame[MONTH_COL if part == "month" else YEAR_COL].to_numpy()
+    if len(values) == 1:
+        return frame[column == values[0]]
+    return frame[np.isin(column, values)]
+
+
+def month_columns(frame: pd.DataFrame, date_col: str) -> tuple[pd.Series, pd.Series]:
+    """(sort key, "%B %Y" label) per row for month-wise grouping."""
+    if not has_calendar_columns(frame):
+        return frame[date_col].dt.to_period("M"), frame[date_col].dt.strftime("%B %Y")
+    periods = frame[PERIOD_COL].to_numpy()
+    # Format each distinct month once instead of once per row
+    distinct, inverse = np.unique(periods, return_inverse=True)
+    names = np.array(
+        [f"{calendar.month_name[p % 12 + 1]} {p // 12}" if p >= 0 else np.nan for p in distinct],
+        dtype=object,
+    )
+    labels = names[inverse] if len(distinct) else np.array([], dtype=object)
+    return pd.Series(periods, index=frame.index), pd.Series(labels, index=frame.index)
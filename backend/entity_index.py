@@ -0,0 +1,145 @@
+"""Find which dimension values a question probably mentions.
+
+The planning prompt used to inline every branch, category and group (and the
+first 50 items), which made each prompt large and still cut items off at an
+arbitrary point. ``EntityIndex`` is a token inverted index over every value of
+every dimension: a query's tokens (plural-folded, with close spellings
+resolved against the vocabulary) pull out the values that contain them, ranked
+so that values named in full come first, then values sharing the rarest
+words. Only those candidates go into the prompt; dimensions small enough to
+list cheaply are always listed in full.
+"""
+import difflib
+import math
+import os
+import re
+from functools import lru_cache
+
+from fast_plan import AGGREGATION_WORDS, AXIS_WORDS, LIMIT_WORDS, METRIC_WORDS, MONTHS, PIE_WORDS, STOPWORDS
+
+VOCABULARY_COLUMNS = ("branches", "groups", "categories", "items", "customers", "subgroups")
+# ANANDHAAS_PROMPT_PRUNING=0 restores the full lists (items/customers truncated as before)
+PROMPT_PRUNING = os.getenv("ANANDHAAS_PROMPT_PRUNING", "1").lower() not in ("0", "false", "no")
+PROMPT_CANDIDATES = int(os.getenv("ANANDHAAS_PROMPT_CANDIDATES", "15"))
+PROMPT_FULL_LIST_MAX = int(os.getenv("ANANDHAAS_PROMPT_FULL_LIST_MAX", "12"))
+_TOKEN = re.compile(r"[a-z0-9]+")
+_MAX_INDEXES = 4
+
+
+def _fold(token: str) -> str:
+    """Cheap plural folding so "roasts"/"roast" and "varieties"/"variety" meet."""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+# Words that describe the chart rather than a value; they never pull candidates on their own
+_QUERY_WORDS = {
+    _fold(w) for w in (
+        set(STOPWORDS) | set(METRIC_WORDS) | set(AGGREGATION_WORDS) | set(AXIS_WORDS) | set(MONTHS)
+        | PIE_WORDS | LIMIT_WORDS | {"trend", "daily", "monthly", "weekly", "yearly", "last", "this", "today", "yesterday"}
+    )
+}
+
+
+def value_tokens(text: str) -> tuple[str, ...]:
+    return tuple(_fold(t) for t in _TOKEN.findall(str(text).lower()))
+
+
+class EntityIndex:
+    """Token -> value postings over the dimension lists of a data analysis."""
+
+    def __init__(self, data_analysis: dict, columns=VOCABULARY_COLUMNS):
+        self.values: dict[str, list[str]] = {}
+        self._tokens: dict[str, list[tuple[str, ...]]] = {}
+        # token -> {column: [value ids]}
+        self._postings: dict[str, dict[str, list[int]]] = {}
+        for column in columns:
+            values = [str(v) for v in data_analysis.get(column) or []]
+            self.values[column] = values
+            self._tokens[column] = [value_tokens(v) for v in values]
+            for i, tokens in enumerate(self._tokens[column]):
+                for token in set(tokens):
+                    self._postings.setdefault(token, {}).setdefault(column, []).append(i)
+        total = sum(len(v) for v in self.values.values()) or 1
+        self._idf = {t: math.log(1 + total / sum(len(ids) for ids in p.values())) for t, p in self._postings.items()}
+        self._vocabulary = sorted(self._postings)
+        self._lookup = lru_cache(maxsize=4096)(self._resolve)
+
+    def _resolve(self, token: str) -> str | None:
+        """The indexed token a query word refers to, allowing for small misspellings."""
+        if token in self._postings:
+            return token
+        if len(token) < 5 or token.isdigit():
+            return None
+        close = difflib.get_close_matches(token, self._vocabulary, n=1, cutoff=0.85)
+        return close[0] if close else None
+
+    def candidates(self, query: str, limit: int = 15, full_list_max: int = 12) -> dict[str, list[str]]:
+        """Values per column that the query probably mentions, best first.
+
+        Columns with at most ``full_list_max`` values are returned whole.
+        """
+        words = [_fold(t) for t in _TOKEN.findall(query.lower())]
+        resolved = [self._lookup(w) for w in words]
+        phrase = " " + " ".join(t or "?" for t in resolved) + " "
+        seeds = {t for w, t in zip(words, resolved) if t and w not in _QUERY_WORDS}
+        # Numbers ("top 10", "gobi 65") only rank values that another word already found
+        boosts = {t for t in seeds if t.isdigit()}
+        seeds -= boosts
+
+        result = {}
+        for column, values in self.values.items():
+            if len(values) <= full_list_max:
+                result[column] = list(values)
+                continue
+            scores: dict[int, float] = {}
+            for token in seeds:
+                for i in self._postings[token].get(column, ()):
+                    scores[i] = scores.get(i, 0.0) + self._idf[token]
+            for token in boosts:
+                for i in self._postings[token].get(column, ()):
+                    if i in scores:
+                        scores[i] += self._idf[token]
+            ranked = []
+            for i, score in scores.items():
+                tokens = self._tokens[column][i]
+                named = f" {' '.join(tokens)} " in phrase
+                # Named in full first, then by how much of the query it shares, then shorter values
+                ranked.append((not named, -score, len(tokens), i))
+            ranked.sort()
+            result[column] = [values[i] for *_, i in ranked[:limit]]
+        return result
+
+
+_indexes: list[tuple[dict, EntityIndex]] = []
+
+
+def get_entity_index(data_analysis: dict) -> EntityIndex:
+    """The index for ``data_analysis``, built once per analysis dict."""
+    for analysis, index in _indexes:
+        if analysis is data_analysis:
+            return index
+    index = EntityIndex(data_analysis)
+    _indexes.append((data_analysis, index))
+    del _indexes[:-_MAX_INDEXES]
+    print(
+        "Built entity index: "
+        + ", ".join(f"{len(v)} {c}" for c, v in index.values.items() if v)
+        + f", {len(index._postings)} tokens"
+    )
+    return index
+
+
+def prompt_vocabulary(query: str, data_analysis: dict, prune: bool | None = None) -> dict[str, list]:
+    """The dimension values to show the model for ``query``."""
+    if prune is None:
+        prune = PROMPT_PRUNING
+    if not prune:
+        vocabulary = {c: list(data_analysis.get(c) or []) for c in VOCABULARY_COLUMNS}
+        vocabulary["items"] = vocabulary["items"][:50]
+        vocabulary["customers"] = vocabulary["customers"][:20]
+        return vocabulary
+    return get_entity_index(data_analysis).candidates(query, PROMPT_CANDIDATES, PROMPT_FULL_LIST_MAX)
@@ -0,0 +1,149 @@
+"""Compare fast-path plans with model plans and report fast-path coverage.
+
+Reference plans come from a JSONL corpus (``{"query": ..., "plan": ...}`` per
+line, default ``fast_path_corpus.jsonl``) or from the plan cache's SQLite
+file with ``--plans``, which holds the real questions that went to Bedrock
+together with the plan it returned. The bundled corpus is hand-labelled: its
+plans are what the planning prompt asks for, not recorded model output, so
+agreement on it measures the parser against the prompt's rules. Only
+``--plans`` compares with the model itself; run with ``ANANDHAAS_FAST_PATH=0``
+for a while to collect model plans for every question.
+
+Usage:
+    python eval_fast_path.py [--corpus FILE | --plans plans.sqlite] [--vocab dashboard.json] [--today YYYY-MM-DD]
+
+``--vocab`` takes a saved ``/api/dashboard-data`` response; without it the
+vocabulary is PROMPT_VOCABULARY, which never looks at the reference plans.
+Relative dates ("last quarter") in the bundled corpus are labelled for
+CORPUS_TODAY, the default ``--today`` with ``--corpus``.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import date
+
+from fast_plan import parse_query
+from plan_cache import PlanCache
+
+# Branch and group lists from the planning prompt, and the categories and items its rules use as examples
+PROMPT_VOCABULARY = {
+    "branches": ["VV", "SPM", "AVR", "RSP", "LMJ", "BRK", "GPM", "SBC", "GKNM"],
+    "groups": ["Parcel", "Line AC", "Line Non AC"],
+    "categories": ["Roast", "Rava Roast", "Biriyani Varieties", "Coffee", "Chappathi Single", "Dosa", "Masala Dosa"],
+    "items": ["Parcel Rava Roast"],
+    "customers": [],
+    "subgroups": [],
+}
+CORPUS_TODAY = date(2025, 6, 15)
+_FILTER_COLUMNS = {
+    "branch_filters": "branches", "group_filters": "groups", "category_filters": "categories",
+    "item_filters": "items", "customer_filters": "customers", "subgroup_filters": "subgroups",
+}
+COMPARED_FIELDS = [
+    "x_axis", "y_axis", "aggregation", "dual_metrics", "y_axis_secondary", "aggregation_secondary",
+    "comparison_type", "limit", "month_filter", "year_filter", "date_filter", *_FILTER_COLUMNS,
+]
+
+
+def _as_list(value) -> list:
+    if value in (None, "", []):
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def normalized(plan: dict) -> dict:
+    """The plan fields that change the chart, in a comparable form."""
+    out = {}
+    dual = bool(plan.get("dual_metrics")) or plan.get("y_axis") == "dual"
+    for field in COMPARED_FIELDS:
+        value = plan.get(field)
+        if field in _FILTER_COLUMNS:
+            value = sorted(str(v).lower().strip() for v in _as_list(value))
+        elif field in ("month_filter", "year_filter"):
+            value = sorted(int(v) for v in _as_list(value))
+        elif field == "date_filter":
+            value = [str(v) for v in _as_list(value)]
+        elif field == "x_axis" and value == "Posting Date":
+            value = "Date"
+        elif field == "dual_metrics":
+            value = dual
+        elif field in ("y_axis_secondary", "aggregation_secondary", "comparison_type") and not dual:
+            value = None
+        elif field == "limit":
+            value = int(value) if value else None
+        out[field] = value
+    chart = plan.get("chart_type") or "bar"
+    out["chart_type"] = "bar" if chart == "dual_bar" else chart
+    return out
+
+
+def load_corpus(path: str) -> list[tuple[str, dict]]:
+    with open(path, encoding="utf-8") as f:
+        return [(row["query"], row["plan"]) for row in map(json.loads, filter(str.strip, f))]
+
+
+def evaluate(entries: list[tuple[str, dict]], vocabulary: dict, min_confidence: float = 1.0,
+             today: date | None = None) -> dict:
+    accepted = agreed = 0
+    disagreements = []
+    for query, reference in entries:
+        plan, confidence = parse_query(query, vocabulary, today=today)
+        if plan is None or confidence < min_confidence:
+            continue
+        accepted += 1
+        expected, actual = normalized(reference), normalized(plan)
+        diff = {k: (expected[k], actual[k]) for k in expected if expected[k] != actual[k]}
+        if diff:
+            disagreements.append((query, diff))
+        else:
+            agreed += 1
+    return {
+        "queries": len(entries),
+        "fast_path": accepted,
+        "coverage": accepted / len(entries) if entries else 0.0,
+        "agreement": agreed / accepted if accepted else None,
+        "disagreements": disagreements,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--corpus", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "fast_path_corpus.jsonl"))
+    source.add_argument("--plans", help="plan cache SQLite file with recorded model plans")
+    parser.add_argument("--vocab", help="saved /api/dashboard-data response")
+    parser.add_argument("--min-confidence", type=float, default=float(os.getenv("ANANDHAAS_FAST_PATH_MIN_CONFIDENCE", "1.0")))
+    parser.add_argument("--today", help="YYYY-MM-DD used for relative dates (default: today)")
+    args = parser.parse_args()
+
+    entries = PlanCache(args.plans).queries() if args.plans else load_corpus(args.corpus)
+    if not entries:
+        print("No reference plans found")
+        return 1
+    if args.vocab:
+        with open(args.vocab, encoding="utf-8") as f:
+            vocabulary = json.load(f)
+    else:
+        vocabulary = PROMPT_VOCABULARY
+    if args.today:
+        today = date.fromisoformat(args.today)
+    else:
+        today = None if args.plans else CORPUS_TODAY
+    reference = "the recorded model plans" if args.plans else "the hand-labelled plans"
+
+    report = evaluate(entries, vocabulary, args.min_confidence, today)
+    for query, diff in report["disagreements"]:
+        print(f"MISMATCH {query!r}")
+        for field, (expected, actual) in diff.items():
+            print(f"    {field}: reference={expected!r} fast_path={actual!r}")
+    agreement = f"{report['agreement']:.0%}" if report["agreement"] is not None else "n/a"
+    print(
+        f"{report['fast_path']}/{report['queries']} queries answered locally "
+        f"({report['coverage']:.0%} never leave the box); agreement with {reference} on those: {agreement}"
+    )
+    return 0 if not report["disagreements"] else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
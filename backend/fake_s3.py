@@ -0,0 +1,92 @@
+"""A filesystem-backed stand-in for the boto3 S3 client.
+
+Object ``s3://bucket/key`` is the file ``root/bucket/key``. Only the calls the
+dataset loader makes are implemented: the ``list_objects_v2`` paginator,
+``head_object`` and (ranged) ``get_object``, plus ``put_object`` to set up
+data. ``calls`` counts each call by name and ``bytes_sent`` the body bytes
+returned, so a check can assert how much a load downloaded.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+
+
+class _Paginator:
+    def __init__(self, client: "FakeS3Client"):
+        self.client = client
+
+    def paginate(self, Bucket: str, Prefix: str = "", PageSize: int = 1000):
+        keys = self.client._keys(Bucket, Prefix)
+        self.client._count("list_objects_v2", 0)
+        for start in range(0, max(len(keys), 1), PageSize):
+            yield {"Contents": [self.client._describe(Bucket, key) for key in keys[start:start + PageSize]]}
+
+
+class FakeS3Client:
+    def __init__(self, root: str):
+        self.root = root
+        self.calls = Counter()
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+
+    def _path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.root, bucket, *key.split("/"))
+
+    def _count(self, name: str, sent: int) -> None:
+        with self._lock:
+            self.calls[name] += 1
+            self.bytes_sent += sent
+
+    def _keys(self, bucket: str, prefix: str) -> list[str]:
+        base = os.path.join(self.root, bucket)
+        keys = []
+        for directory, _, files in os.walk(base):
+            for name in files:
+                key = os.path.relpath(os.path.join(directory, name), base).replace(os.sep, "/")
+                if key.startswith(prefix):
+                    keys.append(key)
+        return sorted(keys)
+
+    def _describe(self, bucket: str, key: str) -> dict:
+        path = self._path(bucket, key)
+        stat = os.stat(path)
+        with open(path, "rb") as f:
+            etag = hashlib.md5(f.read()).hexdigest()
+        return {
+            "Key": key,
+            "Size": stat.st_size,
+            "ETag": f'"{etag}"',
+            "LastModified": datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+        }
+
+    def get_paginator(self, operation: str) -> _Paginator:
+        if operation != "list_objects_v2":
+            raise NotImplementedError(operation)
+        return _Paginator(self)
+
+    def head_object(self, Bucket: str, Key: str) -> dict:
+        described = self._describe(Bucket, Key)
+        self._count("head_object", 0)
+        return {"ContentLength": described["Size"], "ETag": described["ETag"], "LastModified": described["LastModified"]}
+
+    def get_object(self, Bucket: str, Key: str, Range: str | None = None) -> dict:
+        with open(self._path(Bucket, Key), "rb") as f:
+            if Range:
+                # Only the "bytes=start-end" form the loader sends
+                start, end = (int(part) for part in Range.removeprefix("bytes=").split("-"))
+                f.seek(start)
+                body = f.read(end - start + 1)
+            else:
+                body = f.read()
+        self._count("get_object", len(body))
+        return {"Body": io.BytesIO(body), "ContentLength": len(body)}
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes) -> dict:
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(Body)
+        return {"ETag": f'"{hashlib.md5(Body).hexdigest()}"'}
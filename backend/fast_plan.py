@@ -0,0 +1,413 @@
+"""Deterministic parser for common dashboard questions.
+
+The planning prompt spells out rules the model is expected to follow:
+- branch codes map to branch filters
+- month names map to month numbers
+- "parcel" / "AC hall" map to the service groups
+- "top N" maps to ``limit``
+- "revenue and quantity" maps to dual metrics
+
+``parse_query`` applies the same rules locally and produces the model's plan
+format. A plan is only returned when (nearly) every content word of the query
+was understood; everything else goes to the model.
+"""
+import calendar
+import re
+from datetime import date, timedelta
+
+from plan_cache import normalize_query, vocabulary_hash
+
+MONTHS = {name.lower(): i for i, name in enumerate(calendar.month_name) if name}
+MONTHS.update({name.lower(): i for i, name in enumerate(calendar.month_abbr) if name})
+MONTHS["sept"] = 9
+
+# Service-group phrases from the prompt rules (longest phrases are matched first)
+GROUP_PHRASES = {
+    "line non ac": "Line Non AC",
+    "non ac": "Line Non AC",
+    "dine in ac": "Line AC",
+    "ac hall": "Line AC",
+    "line ac": "Line AC",
+    "dine in": "Line Non AC",
+    "hall": "Line Non AC",
+    "parcel": "Parcel",
+    "takeaway": "Parcel",
+    "take away": "Parcel",
+    "delivery": "Parcel",
+}
+
+METRIC_WORDS = {
+    "revenue": "Row Total", "sales": "Row Total", "amount": "Row Total", "turnover": "Row Total",
+    "income": "Row Total", "earnings": "Row Total", "value": "Row Total",
+    "quantity": "Quantity", "quantities": "Quantity", "qty": "Quantity", "units": "Quantity",
+    "count": "count", "orders": "count", "transactions": "count", "bills": "count",
+}
+AGGREGATION_WORDS = {"average": "mean", "avg": "mean", "mean": "mean", "total": "sum", "sum": "sum"}
+AXIS_WORDS = {
+    "branch": "Branch Name", "branches": "Branch Name",
+    "category": "Category", "categories": "Category",
+    "item": "Item/Service Description", "items": "Item/Service Description",
+    "group": "Group Name", "groups": "Group Name",
+    "customer": "Customer/Vendor Name", "customers": "Customer/Vendor Name",
+    "vendor": "Customer/Vendor Name", "vendors": "Customer/Vendor Name",
+    "subgroup": "SubGroup", "subgroups": "SubGroup",
+    "month": "Month", "months": "Month",
+    "day": "Date", "days": "Date", "date": "Date", "dates": "Date",
+}
+AXIS_MARKERS = {"by", "each", "per", "wise", "across", "every"}
+PIE_WORDS = {"distribution", "breakdown", "share", "split", "proportion"}
+LIMIT_WORDS = {"top", "first", "best", "highest", "lowest", "bottom", "leading"}
+STOPWORDS = {
+    "a", "an", "the", "of", "for", "in", "on", "at", "to", "from", "with", "and", "or", "vs", "versus",
+    "show", "me", "give", "list", "display", "get", "tell", "what", "which", "is", "was", "were", "are",
+    "how", "much", "many", "please", "can", "you", "i", "want", "see", "chart", "graph", "plot", "report",
+    "analysis", "analyse", "analyze", "all", "overall", "our", "my", "data", "compare", "comparison",
+    "between", "performance", "wise", "by", "each", "per", "across", "every", "during", "sold", "made",
+    "did", "do", "we", "have", "has", "number", "numbers", "total", "details", "summary", "year", "s",
+}
+# Filter values the model is told to keep in the user's words, keyed by plan field
+_DIMENSION_FIELDS = {
+    "branch": "branch_filters", "group": "group_filters", "category": "category_filters",
+    "item": "item_filters", "customer": "customer_filters", "subgroup": "subgroup_filters",
+}
+_FILTER_AXES = {
+    "branch_filters": "Branch Name", "group_filters": "Group Name", "category_filters": "Category",
+    "item_filters": "Item/Service Description", "customer_filters": "Customer/Vendor Name",
+    "subgroup_filters": "SubGroup",
+}
+_KIND_KEYWORDS = {
+    "branch": "branch", "branches": "branch", "category": "category", "categories": "category",
+    "item": "item", "items": "item", "group": "group", "customer": "customer", "subgroup": "subgroup",
+}
+_METRIC_LABELS = {"Row Total": "Revenue", "Quantity": "Quantity", "count": "Count"}
+_AXIS_LABELS = {
+    "Branch Name": "Branch", "Group Name": "Group", "Category": "Category", "Item/Service Description": "Item",
+    "Customer/Vendor Name": "Customer", "SubGroup": "SubGroup", "Month": "Month", "Date": "Date",
+}
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_DAY = re.compile(r"^(\d{1,2})(st|nd|rd|th)?$")
+_YEAR = re.compile(r"^20\d\d$")
+
+_phrase_cache: dict[str, dict] = {}
+
+
+def _phrase_table(data_analysis: dict) -> dict[tuple[str, ...], dict[str, str]]:
+    """Token tuple -> {kind: original value} for every vocabulary value and group phrase."""
+    columns = {
+        "branch": "branches", "group": "groups", "category": "categories",
+        "item": "items", "customer": "customers", "subgroup": "subgroups",
+    }
+    key = vocabulary_hash(data_analysis, tuple(columns.values()))
+    table = _phrase_cache.get(key)
+    if table is not None:
+        return table
+    table = {}
+    for kind, col in columns.items():
+        for value in data_analysis.get(col) or []:
+            tokens = tuple(_tokens(str(value)))
+            if tokens:
+                table.setdefault(tokens, {}).setdefault(kind, str(value))
+    groups = {str(g).lower(): str(g) for g in data_analysis.get("groups") or []}
+    for phrase, group in GROUP_PHRASES.items():
+        if not groups or group.lower() in groups:
+            table.setdefault(tuple(phrase.split()), {}).setdefault("group", groups.get(group.lower(), group))
+    if len(_phrase_cache) > 8:
+        _phrase_cache.clear()
+    _phrase_cache[key] = table
+    return table
+
+
+def _tokens(text: str) -> list[str]:
+    text = normalize_query(text)
+    # "month-wise" -> "month wise", but keep ISO dates intact
+    text = re.sub(r"(?<=[a-z])-(?=[a-z])", " ", text)
+    return [t for t in text.replace(",", " ").split() if t not in ("-", "&", "/")]
+
+
+class _Parse:
+    def __init__(self, tokens: list[str]):
+        self.tokens = tokens
+        self.used = [False] * len(tokens)
+
+    def free(self, i: int) -> bool:
+        return 0 <= i < len(self.tokens) and not self.used[i]
+
+    def word(self, i: int) -> str | None:
+        return self.tokens[i] if 0 <= i < len(self.tokens) else None
+
+    def take(self, *positions: int) -> None:
+        for i in positions:
+            self.used[i] = True
+
+
+def _match_phrases(p: _Parse, table: dict, filters: dict[str, list[str]]) -> bool:
+    """Greedy longest-first vocabulary matching; False if a phrase is ambiguous."""
+    longest = max((len(k) for k in table), default=0)
+    i = 0
+    while i < len(p.tokens):
+        match = None
+        for size in range(min(longest, len(p.tokens) - i), 0, -1):
+            span = tuple(p.tokens[i:i + size])
+            if all(p.free(j) for j in range(i, i + size)) and span in table:
+                match = (size, table[span])
+                break
+        if match is None:
+            i += 1
+            continue
+        size, kinds = match
+        following = p.word(i + size)
+        keyword = _KIND_KEYWORDS.get(following)
+        if keyword == "item":
+            # "[anything] item" always filters items, in the user's own words
+            kind = "item"
+            kinds = {**kinds, "item": kinds.get("item", " ".join(p.tokens[i:i + size]))}
+        elif keyword and keyword in kinds:
+            # "VV branch", "roast category": the keyword settles the column
+            kind = keyword
+        elif len(kinds) == 1:
+            kind = next(iter(kinds))
+        elif "category" in kinds:
+            kind = "category"  # the prompt prefers Category over Item
+        elif "branch" in kinds:
+            kind = "branch"
+        else:
+            return False
+        if keyword == kind and not following.endswith("s"):
+            # A plural keyword ("top 10 roast items") also names the x axis, so leave it
+            p.take(i + size)
+        if "item" in kinds and kind != "item" and any(t in ("item", "items") for t in p.tokens):
+            # "item" anywhere in the query forces item filters
+            kind = "item"
+        values = filters.setdefault(_DIMENSION_FIELDS[kind], [])
+        value = kinds[kind]
+        if value not in values:
+            values.append(value)
+        p.take(*range(i, i + size))
+        i += size
+    return True
+
+
+def _match_dates(p: _Parse, plan: dict, today: date) -> None:
+    months, years, dates = [], [], []
+    for i, token in enumerate(p.tokens):
+        if not p.free(i):
+            continue
+        if _ISO_DATE.match(token):
+            dates.append(token)
+            p.take(i)
+        elif token in MONTHS and not (token == "may" and p.word(i + 1) in ("i", "we")):
+            month = MONTHS[token]
+            day = None
+            for j in (i + 1, i - 1):
+                m = _DAY.match(p.word(j) or "")
+                if p.free(j) and m and 1 <= int(m.group(1)) <= 31 and not _YEAR.match(p.word(j)):
+                    day = int(m.group(1))
+                    p.take(j)
+                    break
+            p.take(i)
+            if day is None:
+                months.append(month)
+                continue
+            year = p.word(i + 2) if p.word(i + 1) and _DAY.match(p.word(i + 1)) else p.word(i + 1)
+            if year and _YEAR.match(year):
+                p.take(p.tokens.index(year, i))
+                dates.append(f"{year}-{month:02d}-{day:02d}")
+            else:
+                dates.append(f"{month:02d}-{day:02d}")
+        elif _YEAR.match(token):
+            years.append(int(token))
+            p.take(i)
+
+    relative = {
+        ("today",): [today.isoformat()],
+        ("yesterday",): [(today - timedelta(days=1)).isoformat()],
+    }
+    for i, token in enumerate(p.tokens):
+        if not p.free(i):
+            continue
+        if (token,) in relative:
+            dates.extend(relative[(token,)])
+            p.take(i)
+        elif token in ("this", "current", "last", "previous", "past") and p.free(i + 1):
+            unit = p.word(i + 1)
+            shift = 0 if token in ("this", "current") else 1
+            if unit == "month":
+                first = today.replace(day=1)
+                if shift:
+                    first = (first - timedelta(days=1)).replace(day=1)
+                months.append(first.month)
+                years.append(first.year)
+                p.take(i, i + 1)
+            elif unit == "year":
+                years.append(today.year - shift)
+                p.take(i, i + 1)
+            elif unit == "week":
+                monday = today - timedelta(days=today.weekday() + 7 * shift)
+                end = today if not shift else monday + timedelta(days=6)
+                dates.extend([monday.isoformat(), end.isoformat()])
+                p.take(i, i + 1)
+            elif unit and unit.isdigit() and p.word(i + 2) in ("days", "day") and shift:
+                start = today - timedelta(days=int(unit) - 1)
+                dates.extend([start.isoformat(), today.isoformat()])
+                p.take(i, i + 1, i + 2)
+
+    if months:
+        plan["month_filter"] = months[0] if len(months) == 1 else sorted(set(months))
+    if years:
+        plan["year_filter"] = years[0] if len(set(years)) == 1 else sorted(set(years))
+    if dates:
+        plan["date_filter"] = dates[0] if len(dates) == 1 else [min(dates), max(dates)]
+
+
+def _match_limit(p: _Parse, plan: dict) -> None:
+    for i, token in enumerate(p.tokens):
+        if not token.isdigit() or not p.free(i) or _YEAR.match(token):
+            continue
+        if p.word(i - 1) in LIMIT_WORDS or p.word(i + 1) in LIMIT_WORDS:
+            j = i - 1 if p.word(i - 1) in LIMIT_WORDS else i + 1
+            plan["limit"] = int(token)
+            p.take(i, j)
+            return
+        if p.word(i - 1) == "me" and p.word(i - 2) in ("show", "give") or p.word(i - 1) == "list":
+            plan["limit"] = int(token)
+            p.take(i)
+            return
+
+
+def _match_metrics(p: _Parse, plan: dict, filters: dict) -> None:
+    metrics = []
+    for i, token in enumerate(p.tokens):
+        if not p.free(i) or token not in METRIC_WORDS:
+            continue
+        aggregation = AGGREGATION_WORDS.get(p.word(i - 1))
+        if aggregation and p.free(i - 1):
+            p.take(i - 1)
+        metric = METRIC_WORDS[token]
+        if metric == "count":
+            aggregation = "count"
+        p.take(i)
+        if metric not in [m for m, _ in metrics]:
+            metrics.append((metric, aggregation or "sum"))
+    if not metrics and "how" in p.tokens and "many" in p.tokens:
+        metrics.append(("count", "count"))
+    # "roast count" / "how many dosa": counts of a category or item are quantities
+    if metrics and metrics[0][0] == "count" and len(metrics) == 1 and (
+            filters.get("category_filters") or filters.get("item_filters")):
+        metrics[0] = ("Quantity", "sum")
+    for i, token in enumerate(p.tokens):
+        if p.free(i) and token in AGGREGATION_WORDS and metrics:
+            p.take(i)
+            if AGGREGATION_WORDS[token] == "mean" and metrics[0][1] == "sum":
+                metrics[0] = (metrics[0][0], "mean")
+    if not metrics:
+        metrics.append(("Row Total", "sum"))
+    plan["y_axis"], plan["aggregation"] = metrics[0]
+    if len(metrics) > 1:
+        plan["dual_metrics"] = True
+        plan["y_axis_secondary"], plan["aggregation_secondary"] = metrics[1]
+        plan["comparison_type"] = "metric"
+
+
+def _match_axis(p: _Parse, plan: dict, filters: dict) -> bool:
+    """Pick the x axis; False when the query names more than one."""
+    axes = []
+    for i, token in enumerate(p.tokens):
+        if not p.free(i):
+            continue
+        if token in ("monthly",):
+            axes.append("Month")
+            p.take(i)
+        elif token in ("daily", "trend"):
+            axes.append("Date")
+            p.take(i)
+        elif token in AXIS_WORDS:
+            axes.append(AXIS_WORDS[token])
+            p.take(i)
+    axes = list(dict.fromkeys(axes))
+    if len(axes) > 1:
+        return False
+    if axes:
+        plan["x_axis"] = axes[0]
+        return True
+    multi = [field for field, values in filters.items() if len(values) > 1]
+    if len(multi) == 1:
+        # "VV vs SPM revenue": compare the listed values
+        plan["x_axis"] = _FILTER_AXES[multi[0]]
+        return True
+    return False
+
+
+def _title(plan: dict, filters: dict) -> str:
+    metric = _METRIC_LABELS.get(plan["y_axis"], plan["y_axis"])
+    if plan.get("aggregation") == "mean":
+        metric = f"Average {metric}"
+    if plan.get("y_axis_secondary"):
+        metric = f"{metric} and {_METRIC_LABELS.get(plan['y_axis_secondary'], plan['y_axis_secondary'])}"
+    prefix = []
+    if plan.get("limit"):
+        prefix.append(f"Top {plan['limit']}")
+    for field in ("branch_filters", "group_filters", "category_filters", "item_filters", "subgroup_filters", "customer_filters"):
+        if filters.get(field):
+            # Values kept in the user's words ("roast") are title-cased for display
+            prefix.append(", ".join(v.title() if v.islower() else v for v in filters[field]))
+    title = f"{metric} Analysis by {_AXIS_LABELS.get(plan['x_axis'], plan['x_axis'])}"
+    title = " ".join(prefix + [title])
+    months = plan.get("month_filter")
+    if months:
+        months = months if isinstance(months, list) else [months]
+        title += " - " + ", ".join(calendar.month_name[m] for m in months)
+    if plan.get("year_filter"):
+        years = plan["year_filter"] if isinstance(plan["year_filter"], list) else [plan["year_filter"]]
+        title += (" " if months else " - ") + ", ".join(map(str, years))
+    if plan.get("date_filter"):
+        dates = plan["date_filter"] if isinstance(plan["date_filter"], list) else [plan["date_filter"]]
+        title += " - " + " to ".join(dates)
+    return title
+
+
+def parse_query(query: str, data_analysis: dict, today: date | None = None) -> tuple[dict | None, float]:
+    """(plan, confidence) for ``query``; plan is None when the parser is not sure."""
+    today = today or date.today()
+    tokens = _tokens(query)
+    if not tokens:
+        return None, 0.0
+    p = _Parse(tokens)
+    plan = {
+        "chart_type": "bar", "y_axis_secondary": None, "aggregation_secondary": None,
+        "category_filters": None, "item_filters": None, "branch_filters": None, "group_filters": None,
+        "customer_filters": None, "subgroup_filters": None, "month_filter": None, "date_filter": None,
+        "year_filter": None, "limit": None, "dual_metrics": False, "comparison_type": None,
+    }
+    filters: dict[str, list[str]] = {}
+    _match_dates(p, plan, today)
+    _match_limit(p, plan)
+    if not _match_phrases(p, _phrase_table(data_analysis), filters):
+        return None, 0.0
+    _match_metrics(p, plan, filters)
+    pie = False
+    for i, token in enumerate(tokens):
+        if p.free(i) and token in PIE_WORDS:
+            pie = True
+            p.take(i)
+    if not _match_axis(p, plan, filters):
+        return None, 0.0
+
+    for field, values in filters.items():
+        plan[field] = values
+    if isinstance(plan["month_filter"], list) and len(plan["month_filter"]) == 2 and plan["x_axis"] != "Month" \
+            and any(t in ("vs", "versus", "compare", "comparison") for t in tokens):
+        # "February vs March": side-by-side monthly comparison
+        plan["dual_metrics"] = True
+        plan["comparison_type"] = "monthly"
+    if pie:
+        plan["chart_type"] = "pie"
+    elif plan["x_axis"] == "Date":
+        plan["chart_type"] = "line"
+    elif plan["dual_metrics"]:
+        plan["chart_type"] = "dual_bar"
+    plan["title"] = _title(plan, filters)
+
+    content = [i for i, t in enumerate(tokens) if t not in STOPWORDS or p.used[i]]
+    understood = sum(1 for i in content if p.used[i])
+    confidence = understood / len(content) if content else 0.0
+    return plan, confidence
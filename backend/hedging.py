@@ -0,0 +1,81 @@
+"""Latency-budgeted calls with a hedged second attempt.
+
+``hedged_call`` runs ``fn`` on a worker. If there is no answer after
+``hedge_after`` seconds (or the first attempt has already failed), it starts
+one more identical attempt, and it takes whichever succeeds first. When the
+budget runs out it raises ``BudgetExceeded`` instead of blocking. Attempts
+still running at that point keep going, and ``on_late_result`` receives what
+they return, so a slow answer can still be cached for next time.
+"""
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class BudgetExceeded(TimeoutError):
+    pass
+
+
+class Hedger:
+    def __init__(self, workers: int = 8, name: str = "hedge"):
+        self._executor = ThreadPoolExecutor(max_workers=max(2, workers), thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "hedged": 0, "hedge_wins": 0, "timeouts": 0, "failures": 0, "late_results": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def hedged_call(self, fn, args=(), budget: float = 10.0, hedge_after: float = 0.0, on_late_result=None):
+        """The first successful ``fn(*args)``; raises BudgetExceeded or the last error."""
+        self._count("calls")
+        deadline = time.perf_counter() + budget
+        attempts = [self._executor.submit(fn, *args)]
+        pending = set(attempts)
+        error = None
+        hedge_at = time.perf_counter() + hedge_after if hedge_after > 0 else None
+        while pending or (hedge_at is not None and len(attempts) < 2):
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            if hedge_at is not None and len(attempts) < 2 and (now >= hedge_at or not pending):
+                # Slow (or already failed) first attempt: race a second one against it
+                attempts.append(self._executor.submit(fn, *args))
+                pending.add(attempts[-1])
+                self._count("hedged")
+                continue
+            timeout = deadline - now
+            if hedge_at is not None and len(attempts) < 2:
+                timeout = min(timeout, hedge_at - now)
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                if future is not attempts[0]:
+                    self._count("hedge_wins")
+                for other in pending:
+                    other.cancel()
+                return future.result()
+
+        if pending:
+            self._count("timeouts")
+            for future in pending:
+                if on_late_result is not None and not future.cancel():
+                    future.add_done_callback(lambda f: self._late(f, on_late_result))
+            raise BudgetExceeded(f"no answer within {budget:.1f}s")
+        self._count("failures")
+        raise error
+
+    def _late(self, future, on_late_result) -> None:
+        if future.cancelled() or future.exception() is not None:
+            return
+        self._count("late_results")
+        try:
+            on_late_result(future.result())
+        except Exception as e:
+            print(f"Late result handler failed: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters)
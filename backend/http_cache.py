@@ -0,0 +1,24 @@
+"""Conditional JSON responses for payloads that only change with the dataset.
+
+The payload is serialized once and tagged with a hash of its bytes; clients
+that send the tag back in ``If-None-Match`` get an empty ``304``. ``no-cache``
+makes browsers revalidate on every poll instead of reusing a stale copy.
+"""
+import hashlib
+import json
+
+from flask import current_app, request
+
+
+def json_payload(obj) -> tuple[bytes, str]:
+    """Serialize ``obj`` once; returns the body and its ETag."""
+    body = json.dumps(obj, default=str).encode("utf-8")
+    return body, hashlib.sha256(body).hexdigest()[:32]
+
+
+def conditional_json_response(body: bytes, etag: str):
+    """200 with ``body``, or 304 if the request already holds ``etag``."""
+    response = current_app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
@@ -0,0 +1,187 @@
+"""Persistent cache of LLM visualization plans.
+
+Plans are keyed by the normalized English query plus a hash of the
+vocabulary the prompt is built from, so a new branch or category never gets
+a plan made for an older dataset. Entries live in a small SQLite file and
+the most recently used ones are also kept in an in-memory LRU; both expire
+after a TTL and the file is bounded by evicting the least recently used rows.
+Queries with relative dates ("today", "last week") also key on today's date,
+because the model resolves those to absolute dates.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_RELATIVE_DATE = re.compile(
+    r"\b(today|yesterday|tomorrow|tonight|now|current|this|last|past|previous|recent|ago)\b"
+)
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation that does not change meaning, collapse whitespace."""
+    text = query.lower().strip()
+    text = re.sub(r"[^\w\s/&,.-]", " ", text)
+    text = re.sub(r"(?<!\d)[.,]|[.,](?!\d)", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def vocabulary_hash(data_analysis: dict, columns=("branches", "categories", "groups")) -> str:
+    """Hash of the dimension values a plan's filters can refer to."""
+    vocabulary = {c: sorted(str(v) for v in data_analysis.get(c) or []) for c in columns}
+    return hashlib.sha256(json.dumps(vocabulary, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def plan_cache_key(query: str, data_analysis: dict, model_id: str = "") -> str:
+    normalized = normalize_query(query)
+    parts = [model_id, vocabulary_hash(data_analysis), normalized]
+    if _RELATIVE_DATE.search(normalized):
+        parts.append(time.strftime("%Y-%m-%d"))
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class PlanCache:
+    """SQLite-backed plan store with an in-memory LRU in front of it."""
+
+    def __init__(self, path: str | None, ttl_seconds: float = 86400.0,
+                 max_entries: int = 5000, memory_entries: int = 256):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        # key -> (plan JSON, created_at, seconds the model took to produce it)
+        self._memory: OrderedDict[str, tuple[str, float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "expired": 0, "stores": 0, "evictions": 0}
+        # Model time the stored plans took, summed over every hit
+        self.seconds_saved = 0.0
+        self._miss_seconds = 0.0
+        if path:
+            try:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS plans ("
+                    "key TEXT PRIMARY KEY, plan TEXT NOT NULL, created_at REAL NOT NULL, "
+                    "last_used REAL NOT NULL, model_seconds REAL NOT NULL DEFAULT 0, query TEXT)"
+                )
+                columns = {row[1] for row in self._db.execute("PRAGMA table_info(plans)")}
+                if "query" not in columns:
+                    self._db.execute("ALTER TABLE plans ADD COLUMN query TEXT")
+                self._db.execute("CREATE INDEX IF NOT EXISTS plans_last_used ON plans (last_used)")
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Plan cache disabled on disk ({path}): {e}")
+                self._db = None
+
+    def _fresh(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds <= 0 or now - created_at < self.ttl_seconds
+
+    def get(self, key: str) -> dict | None:
+        """The cached plan for ``key`` (a fresh copy), or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if self._fresh(entry[1], now):
+                    self._memory.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    self.seconds_saved += entry[2]
+                    return json.loads(entry[0])
+                del self._memory[key]
+                self.counters["expired"] += 1
+
+            row = None
+            if self._db is not None:
+                try:
+                    row = self._db.execute("SELECT plan, created_at, model_seconds FROM plans WHERE key = ?", (key,)).fetchone()
+                    if row is not None and not self._fresh(row[1], now):
+                        self._db.execute("DELETE FROM plans WHERE key = ?", (key,))
+                        self._db.commit()
+                        self.counters["expired"] += 1
+                        row = None
+                    elif row is not None:
+                        self._db.execute("UPDATE plans SET last_used = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"Plan cache read failed: {e}")
+                    row = None
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+            self.counters["disk_hits"] += 1
+            self.seconds_saved += row[2]
+            self._remember(key, row[0], row[1], row[2])
+            return json.loads(row[0])
+
+    def put(self, key: str, plan: dict, elapsed: float | None = None, query: str | None = None) -> None:
+        """Store ``plan``; ``elapsed`` is how long the model took to produce it.
+
+        The normalized ``query`` is kept next to the plan so the stored model
+        plans double as an evaluation corpus (see eval_fast_path.py).
+        """
+        text = json.dumps(plan, default=str)
+        now = time.time()
+        elapsed = elapsed or 0.0
+        with self._lock:
+            self._miss_seconds += elapsed
+            self._remember(key, text, now, elapsed)
+            self.counters["stores"] += 1
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO plans (key, plan, created_at, last_used, model_seconds, query) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, text, now, now, elapsed, normalize_query(query) if query else None),
+                )
+                excess = self._db.execute("SELECT COUNT(*) FROM plans").fetchone()[0] - self.max_entries
+                if excess > 0:
+                    self._db.execute(
+                        "DELETE FROM plans WHERE key IN (SELECT key FROM plans ORDER BY last_used LIMIT ?)", (excess,)
+                    )
+                    self.counters["evictions"] += excess
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Plan cache write failed: {e}")
+
+    def queries(self) -> list[tuple[str, dict]]:
+        """(normalized query, model plan) for every stored entry that recorded its query."""
+        if self._db is None:
+            return []
+        with self._lock:
+            rows = self._db.execute("SELECT query, plan FROM plans WHERE query IS NOT NULL").fetchall()
+        return [(query, json.loads(plan)) for query, plan in rows]
+
+    def _remember(self, key: str, text: str, created_at: float, model_seconds: float) -> None:
+        self._memory[key] = (text, created_at, model_seconds)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+            lookups = hits + self.counters["misses"]
+            entries = None
+            if self._db is not None:
+                try:
+                    entries = self._db.execute("SELECT COUNT(*) FROM plans").fetchone()[0]
+                except sqlite3.Error:
+                    pass
+            return {
+                **self.counters,
+                "hits": hits,
+                "hit_rate": hits / lookups if lookups else None,
+                "model_seconds": round(self._miss_seconds, 3),
+                "seconds_saved": round(self.seconds_saved, 3),
+                "memory_entries": len(self._memory),
+                "disk_entries": entries,
+                "ttl_seconds": self.ttl_seconds,
+                "max_entries": self.max_entries,
+            }
@@ -0,0 +1,164 @@
+"""The planning prompt ``app_v1.py`` sends to Bedrock."""
+from entity_index import PROMPT_PRUNING, prompt_vocabulary
+
+PRUNED_NOTE = (
+    "\n(Only the values that match words in the query are listed. If the query names "
+    "something that is not listed, use the user's own words.)"
+)
+
+
+def build_plan_prompt(query: str, data_analysis: dict, prune: bool | None = None) -> str:
+    """The prompt for ``query``; ``prune`` overrides ANANDHAAS_PROMPT_PRUNING."""
+    if prune is None:
+        prune = PROMPT_PRUNING
+    vocabulary = prompt_vocabulary(query, data_analysis, prune)
+    return _render(
+        f'Query: "{query}"', vocabulary, PRUNED_NOTE if prune else "",
+        "Return ONLY valid JSON in this exact format:",
+    )
+
+
+def build_batch_plan_prompt(queries: list[str], data_analysis: dict, prune: bool | None = None) -> str:
+    """One prompt asking for a JSON array with a plan per query, in order."""
+    if prune is None:
+        prune = PROMPT_PRUNING
+    vocabulary: dict[str, list] = {}
+    for query in queries:
+        for column, values in prompt_vocabulary(query, data_analysis, prune).items():
+            merged = vocabulary.setdefault(column, [])
+            merged.extend(v for v in values if v not in merged)
+    numbered = "\n".join(f'{i}. "{query}"' for i, query in enumerate(queries, 1))
+    return _render(
+        f"Queries (plan each one separately):\n{numbered}", vocabulary, PRUNED_NOTE if prune else "",
+        f"Return ONLY a valid JSON array of {len(queries)} objects, one per query in the order given, "
+        "each in this exact format:",
+    )
+
+
+def _render(question: str, vocabulary: dict, note: str, instruction: str) -> str:
+    return f"""
+Analyze this business query about restaurant sales and create a visualization plan.
+
+{question}
+
+Available Data:{note}
+- Branches: {vocabulary['branches']}
+- Categories: {vocabulary['categories']}
+- Items: {vocabulary['items']}
+- Groups: {vocabulary['groups']}
+- Customers: {vocabulary['customers']}
+- SubGroups: {vocabulary['subgroups']}
+
+IMPORTANT: There are TWO different columns:
+1. "Category" - Food categories like "roast", "biriyani varieties", "coffee", etc.
+2. "Item/Service Description" - Specific food items like individual roast items, biriyani items, etc.
+
+{instruction}
+{{
+  "chart_type": "bar|pie|line|dual_bar",
+  "x_axis": "Branch Name|Group Name|Category|Item/Service Description|Customer/Vendor Name|SubGroup|Month|Date",
+  "y_axis": "Row Total|Quantity|count|dual",
+  "y_axis_secondary": null or "Row Total|Quantity|count",
+  "aggregation": "sum|mean|count",
+  "aggregation_secondary": null or "sum|mean|count",
+  "category_filters": null or [string, ...],
+  "item_filters": null or [string, ...],
+  "branch_filters": null or [string, ...],
+  "group_filters": null or [string, ...],
+  "customer_filters": null or [string, ...],
+  "subgroup_filters": null or [string, ...],
+  "month_filter": null or month_number or [month_numbers],
+  "date_filter": null or "YYYY-MM-DD" or ["YYYY-MM-DD", "YYYY-MM-DD"],
+  "year_filter": null or year_number or [year_numbers],
+  "limit": null or number,
+  "title": "chart title",
+  "dual_metrics": false or true,
+  "comparison_type": null or "monthly" or "metric"
+}}
+
+CRITICAL TITLE GENERATION RULES:
+- NEVER use "Vivi" or any made-up names in titles
+- Use ACTUAL branch names from the available data: {vocabulary['branches']}
+- If query mentions specific branches, include those EXACT branch names in title
+- For branch analysis, use format: "[Branch Name] Revenue Analysis" or "Revenue Analysis by Branch"
+- For category analysis, use format: "[Category Name] Analysis" or "Analysis by Category"
+- For general queries, use descriptive titles like "Restaurant Revenue Analysis", "Sales Performance Analysis"
+- ALWAYS use real data values, never fictional names
+
+CRITICAL DISTINCTION RULES:
+- When user says "rava roast item" or "roast item" or "[anything] item" → ALWAYS use item_filters
+- When user says "rava roast category" or "roast category" or "[anything] category" → ALWAYS use category_filters
+- When user just says "rava roast" or "roast" without specifying item/category:
+  * If "rava roast" exists in categories, use category_filters: ["rava roast"]
+  * If "rava roast" exists in items, use item_filters: ["rava roast"]
+  * If both exist, prefer Category over Item
+- CRITICAL: If user explicitly mentions "item" anywhere in the query, ALWAYS use item_filters, NOT category_filters
+- CRITICAL: When user says "rava roast item", use item_filters: ["rava roast"] NOT ["Parcel Rava Roast"]
+- CRITICAL: Don't add prefixes like "Parcel" unless user specifically mentions them
+- CRITICAL: Use the EXACT term the user mentioned - if they say "rava roast", use "rava roast", not "parcel rava roast"
+
+Rules:
+- CRITICAL: TOP N QUERIES - Extract limit numbers from queries:
+  * "top 5", "top 10", "top 7", "first 5", "best 10" → extract as limit: 5, 10, 7, 5, 10
+  * "highest 3", "lowest 5", "bottom 10" → extract as limit: 3, 5, 10
+  * "show me 5", "give me 10", "list 7" → extract as limit: 5, 10, 7
+  * "Top 10 Roast Items" → extract as limit: 10
+  * "Top 5 branches" → extract as limit: 5
+  * ANY query with "top [NUMBER]" or "[NUMBER] top" → ALWAYS extract the NUMBER as limit
+  * When user specifies a number, ALWAYS extract it as limit
+  * If no number specified, set limit: null to show all results
+- Extract ALL filters from the query: categories, branches, groups, customers, subgroups, months, dates, and years
+- For months: january=1, february=2, march=3, april=4, may=5, june=6, july=7, august=8, september=9, october=10, november=11, december=12
+- For dates: extract specific dates ("2024-01-15") or date ranges (["2024-01-01", "2024-01-31"])
+- For years: extract year numbers (2023, 2024, etc.)
+- Groups are service types: "Parcel" (takeaway/delivery), "Line AC" (dine-in AC), "Line Non AC" (dine-in non-AC)
+- Categories are food items like "Biriyani Varieties", "Coffee", "Chappathi Single", etc.
+- Branches are locations: "VV", "SPM", "AVR", "RSP", "LMJ", "BRK", "GPM", "SBC", "GKNM"
+- CRITICAL: Extract ALL branch names mentioned in query, including variations:
+  * "VV branch" or "VV" → "VV"
+  * "SPM branch" or "SPM" → "SPM"
+  * "SBC branch" or "SBC" → "SBC"
+  * "GKNM branch" or "GKNM" → "GKNM"
+  * "AVR branch" or "AVR" → "AVR"
+  * Look for patterns like "X branch, Y branch, Z branch" or "X and Y and Z branches"
+  * Parse comma-separated lists: "VV, SPM, SBC, GKNM" should extract all four branches
+- When user mentions "parcel", "takeaway", "delivery" → use group_filters: ["Parcel"]
+- When user mentions "dine in AC", "AC hall" → use group_filters: ["Line AC"]
+- When user mentions "dine in", "hall", "non AC" → use group_filters: ["Line Non AC"]
+- When user mentions "customer", "vendor" → use x_axis: "Customer/Vendor Name" or customer_filters
+- When user mentions "subgroup" → use x_axis: "SubGroup" or subgroup_filters
+- If user asks "how many" or "count" with quantity → use y_axis: "Quantity" and aggregation: "sum"
+- If user asks "how many" or "count" without quantity → use y_axis: "count" and aggregation: "count"
+- For "each branch" or "by branch", use x_axis: "Branch Name"
+- For "each customer" or "by customer", use x_axis: "Customer/Vendor Name"
+- For "each subgroup" or "by subgroup", use x_axis: "SubGroup"
+- IMPORTANT: For "distribution", "breakdown", "share", "split", "proportion" → ALWAYS use chart_type: "pie"
+- For "comparison", "compare", "vs" → use bar chart
+- CRITICAL: When user mentions "by months", "monthly", "month wise", "each month" → use x_axis: "Month" NOT "Posting Date"
+- For time/trend with specific dates, use line chart with Posting Date
+- For monthly analysis, ALWAYS use x_axis: "Month" and chart_type: "bar"
+- For daily analysis over short periods, use x_axis: "Posting Date" and chart_type: "line"
+- For yearly comparisons, extract year_filter and use appropriate grouping
+- CRITICAL: DYNAMIC DUAL METRICS - Detect ANY combination of two metrics:
+  * "revenue and quantity" → y_axis: "Row Total", y_axis_secondary: "Quantity"
+  * "sales and count" → y_axis: "Row Total", y_axis_secondary: "count"
+  * "quantity and revenue" → y_axis: "Quantity", y_axis_secondary: "Row Total"
+  * "average revenue and total quantity" → y_axis: "Row Total", aggregation: "mean", y_axis_secondary: "Quantity", aggregation_secondary: "sum"
+  * "total sales and average quantity" → y_axis: "Row Total", aggregation: "sum", y_axis_secondary: "Quantity", aggregation_secondary: "mean"
+  * ANY query with "and" between two metrics → set dual_metrics: true, extract both metrics
+  * For comparison queries like "February vs March", use dual_metrics: true, comparison_type: "monthly"
+- CRITICAL: When user asks for roast count or any category count, include quantity in analysis by using y_axis: "Quantity" if available
+- CRITICAL: For category filtering, distinguish between similar items: "roast" should NOT include "rava roast", "dosa" should NOT include "masala dosa" unless specifically mentioned
+- Use exact matching first, then word boundary matching to avoid substring confusion
+- CRITICAL: Date filtering rules:
+  * "today", "yesterday" → extract current/previous date
+  * "last week", "this week" → extract date range
+  * "January 2024", "Jan 2024" → extract month and year filters
+  * "2024" → extract year filter
+  * "February 12th", "Feb 12", "12th February" → extract as "02-12" (MM-DD format)
+  * "February 12th, 2024" → extract as "2024-02-12"
+  * "from Jan 1 to Jan 31", "between 2024-01-01 and 2024-01-31" → extract date range
+  * "last 7 days", "past month" → calculate and extract date range
+- Match user terms intelligently to available data
+- IMPORTANT: When no year is specified in dates, assume current year (2025)
+"""
@@ -0,0 +1,189 @@
+"""Read the model's plan from a streamed Bedrock response.
+
+``invoke_model`` returns only after the model has finished, including any
+explanation it writes after the JSON. With ``invoke_model_with_response_stream``
+the text arrives in chunks; ``PlanScanner`` follows it with a small JSON
+tokenizer, hands out every top-level field as soon as it is complete, and
+stops reading once the plan object closes, so trailing text is never waited
+for. If the streamed text does not parse, the whole text gets the same
+first-"{"-to-last-"}" extraction as before.
+"""
+import json
+import os
+import time
+from dataclasses import dataclass, field
+
+from botocore.exceptions import ClientError
+
+STREAMING = os.getenv("ANANDHAAS_BEDROCK_STREAMING", "1").lower() not in ("0", "false", "no")
+
+
+def extract_plan(text: str) -> dict:
+    """The JSON object between the first "{" and the last "}" of ``text``."""
+    text = text.strip()
+    if "{" in text and "}" in text:
+        start = text.find("{")
+        end = text.rfind("}") + 1
+        return json.loads(text[start:end])
+    raise ValueError("Model did not return JSON")
+
+
+def extract_plans(text: str) -> list[dict]:
+    """The JSON array of plans between the first "[" and the last "]" of ``text``."""
+    text = text.strip()
+    if "[" in text and "]" in text:
+        plans = json.loads(text[text.find("["):text.rfind("]") + 1])
+        if isinstance(plans, list) and all(isinstance(p, dict) for p in plans):
+            return plans
+    raise ValueError("Model did not return a JSON array of plans")
+
+
+class PlanScanner:
+    """Incremental scanner for the first top-level JSON object in streamed text."""
+
+    def __init__(self, on_field=None):
+        self.on_field = on_field
+        self.plan: dict | None = None
+        self._buffer: list[str] = []
+        self._length = 0
+        self._text = ""
+        self._start: int | None = None
+        self._member_start = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.failed = False
+
+    @property
+    def text(self) -> str:
+        if len(self._text) != self._length:
+            self._text = "".join(self._buffer)
+        return self._text
+
+    def feed(self, chunk: str) -> dict | None:
+        """Consume ``chunk``; returns the plan once its closing brace arrives."""
+        offset = self._length
+        self._buffer.append(chunk)
+        self._length += len(chunk)
+        if self.plan is not None or self.failed:
+            return self.plan
+        for i, ch in enumerate(chunk, offset):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                if self._start is not None:
+                    self._in_string = True
+            elif ch in "{[":
+                if self._start is None:
+                    if ch == "[":
+                        continue
+                    self._start = self._member_start = i + 1
+                self._depth += 1
+            elif ch in "}]" and self._start is not None:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._member(i)
+                    return self._finish(i)
+            elif ch == "," and self._depth == 1:
+                self._member(i)
+                self._member_start = i + 1
+        return None
+
+    def _member(self, end: int) -> None:
+        if self.on_field is None:
+            return
+        member = self.text[self._member_start:end].strip()
+        if not member:
+            return
+        try:
+            parsed = json.loads("{" + member + "}")
+        except ValueError:
+            return
+        for key, value in parsed.items():
+            self.on_field(key, value)
+
+    def _finish(self, end: int) -> dict | None:
+        try:
+            plan = json.loads(self.text[self._start - 1:end + 1])
+        except ValueError:
+            self.failed = True
+            return None
+        if not isinstance(plan, dict):
+            self.failed = True
+            return None
+        self.plan = plan
+        return plan
+
+
+@dataclass
+class PlanResponse:
+    plan: dict
+    text: str
+    usage: dict = field(default_factory=dict)
+    # Seconds until the plan was usable, and whether the rest of the stream was skipped
+    seconds: float = 0.0
+    stopped_early: bool = False
+
+
+def invoke_plan(client, model_id: str, body: str, on_field=None, streaming: bool | None = None) -> PlanResponse:
+    """Send a planning request and return the parsed plan.
+
+    ``on_field(key, value)`` is called for each top-level plan field as soon
+    as it has streamed in.
+    """
+    global STREAMING
+    started = time.perf_counter()
+    if streaming is None:
+        streaming = STREAMING
+    if streaming:
+        try:
+            stream = client.invoke_model_with_response_stream(modelId=model_id, body=body)["body"]
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") != "AccessDeniedException":
+                raise
+            # Roles granted only bedrock:InvokeModel cannot stream; stop trying
+            print(f"Streaming not permitted, using invoke_model: {e}")
+            STREAMING = streaming = False
+    if not streaming:
+        result = json.loads(client.invoke_model(modelId=model_id, body=body)["body"].read())
+        text = result["output"]["message"]["content"][0]["text"].strip()
+        plan = extract_plan(text)
+        if on_field is not None:
+            for key, value in plan.items():
+                on_field(key, value)
+        return PlanResponse(plan, text, result.get("usage") or {}, time.perf_counter() - started)
+
+    scanner = PlanScanner(on_field)
+    usage = {}
+    try:
+        for event in stream:
+            if "chunk" not in event:
+                # modelStreamErrorException, throttlingException, ...
+                raise RuntimeError(f"Bedrock stream error: {event}")
+            message = json.loads(event["chunk"]["bytes"])
+            delta = (message.get("contentBlockDelta") or {}).get("delta") or {}
+            if "text" in delta and scanner.feed(delta["text"]) is not None:
+                return PlanResponse(scanner.plan, scanner.text, usage, time.perf_counter() - started, True)
+            if "metadata" in message:
+                usage = message["metadata"].get("usage") or {}
+    finally:
+        stream.close()
+    plan = scanner.plan or extract_plan(scanner.text)
+    return PlanResponse(plan, scanner.text.strip(), usage, time.perf_counter() - started)
+
+
+def invoke_plan_list(client, model_id: str, body: str) -> PlanResponse:
+    """Send a multi-question planning request; ``plan`` holds the list of plans.
+
+    Not streamed: every plan in the array is needed before any chart can be
+    answered in order, so there is nothing to start early.
+    """
+    started = time.perf_counter()
+    result = json.loads(client.invoke_model(modelId=model_id, body=body)["body"].read())
+    text = result["output"]["message"]["content"][0]["text"].strip()
+    return PlanResponse(extract_plans(text), text, result.get("usage") or {}, time.perf_counter() - started)
@@ -0,0 +1,124 @@
+"""Rendered chart files on local disk, addressed by what they show.
+
+The same plan over the same dataset version always draws the same chart, so
+a render is stored under a hash of the canonical plan, the aggregated series
+in its ``ChartSpec``, the dataset version and the renderer version. Files
+live under ``<cache dir>/renders`` and survive restarts. The total size is
+bounded by evicting the least recently used files; the index of sizes and
+use order is kept in memory and rebuilt from file modification times on
+startup.
+"""
+import dataclasses
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Plan fields that record how a plan was produced, not what it draws
+_VOLATILE_PLAN_FIELDS = ("plan_source", "plan_cached", "degraded", "degraded_reason", "data_source")
+
+
+def render_key(plan: dict, spec, dataset_version: str | None, renderer: str = "") -> str:
+    canonical_plan = {
+        k: v for k, v in plan.items() if v is not None and k not in _VOLATILE_PLAN_FIELDS
+    }
+    content = {
+        "plan": canonical_plan,
+        "spec": dataclasses.asdict(spec),
+        "dataset_version": dataset_version,
+        "renderer": renderer,
+    }
+    encoded = json.dumps(content, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # file name -> size, least recently used first
+        self._index: OrderedDict[str, int] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        try:
+            os.makedirs(directory, exist_ok=True)
+            entries = []
+            for name in os.listdir(directory):
+                if name.startswith("."):
+                    continue
+                stat = os.stat(os.path.join(directory, name))
+                entries.append((stat.st_mtime, name, stat.st_size))
+            for _, name, size in sorted(entries):
+                self._index[name] = size
+                self._bytes += size
+            self._evict()
+        except OSError as e:
+            print(f"Render cache disabled ({directory}): {e}")
+            self.directory = None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def get(self, key: str, fmt: str) -> bytes | None:
+        name = f"{key}.{fmt}"
+        with self._lock:
+            if self.directory is None or name not in self._index:
+                self.counters["misses"] += 1
+                return None
+            self._index.move_to_end(name)
+        try:
+            with open(self._path(name), "rb") as f:
+                body = f.read()
+            # mtime is the use order after a restart
+            os.utime(self._path(name))
+        except OSError:
+            with self._lock:
+                self._bytes -= self._index.pop(name, 0)
+                self.counters["misses"] += 1
+            return None
+        with self._lock:
+            self.counters["hits"] += 1
+        return body
+
+    def put(self, key: str, fmt: str, body: bytes) -> None:
+        if self.directory is None or len(body) > self.max_bytes:
+            return
+        name = f"{key}.{fmt}"
+        try:
+            # Write then rename, so a reader never sees half a file
+            fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(body)
+            os.replace(tmp, self._path(name))
+        except OSError as e:
+            print(f"Render cache write failed: {e}")
+            return
+        with self._lock:
+            self._bytes += len(body) - self._index.pop(name, 0)
+            self._index[name] = len(body)
+            self.counters["stores"] += 1
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._index:
+            name, size = self._index.popitem(last=False)
+            self._bytes -= size
+            self.counters["evictions"] += 1
+            try:
+                os.remove(self._path(name))
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "hit_ratio": self.counters["hits"] / lookups if lookups else None,
+                "entries": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
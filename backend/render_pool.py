@@ -0,0 +1,307 @@
+"""Chart rendering in pre-started worker processes.
+
+Drawing a chart is CPU-bound Python that holds the GIL, so charts drawn by
+request threads run one at a time even though each has its own Figure.
+``RenderPool`` keeps a few Python processes that run this file as a script.
+Each imports only ``chart_render``, draws a throwaway chart to load the Agg
+backend and fonts, and then waits for jobs on stdin. A job is a
+``chart_render`` function name with its arguments (``ChartSpec`` objects,
+which hold only aggregated series, and a render profile name); the reply is
+the file bytes or an error message. Messages are length-prefixed pickles.
+
+Workers are plain subprocesses rather than a multiprocessing pool because
+spawned multiprocessing children re-import the app's main module, and
+``app_v1.py`` connects to Slack and builds its caches at import time.
+
+A worker is replaced after ``max_jobs`` jobs to bound memory growth, or when
+it dies. A worker that is not ready within ``start_timeout`` seconds is killed
+and counts as failing to start. A worker that fails to start is retried with
+exponential backoff (up to ``max_backoff`` seconds apart), so the pool grows
+back once the cause goes away. Jobs wait for a free worker; when ``max_queue``
+are already waiting, ``render`` raises ``RenderQueueFull`` instead of piling
+up. While no worker is alive and none is warming up (every start failing),
+jobs are drawn in the calling thread, as with no pool at all, rather than
+waiting for one.
+"""
+import os
+import pickle
+import struct
+import subprocess
+import sys
+import threading
+import time
+from queue import Empty, Queue
+
+_HEADER = struct.Struct("<I")
+_JOBS = ("render_chart", "render_pages")
+
+
+class RenderQueueFull(RuntimeError):
+    pass
+
+
+def _send(stream, message) -> None:
+    data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    stream.write(_HEADER.pack(len(data)))
+    stream.write(data)
+    stream.flush()
+
+
+def _receive(stream):
+    header = stream.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise EOFError("render worker closed the pipe")
+    size, = _HEADER.unpack(header)
+    data = stream.read(size)
+    if len(data) < size:
+        raise EOFError("render worker closed the pipe")
+    return pickle.loads(data)
+
+
+class _Worker:
+    def __init__(self, start_timeout: float = 60.0):
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        self.jobs = 0
+        # The worker says it is ready once it has imported matplotlib and drawn its warm-up chart.
+        # The pipe read cannot time out, so it runs on a thread that is given up on at the deadline.
+        outcome = []
+
+        def wait_ready():
+            try:
+                outcome.append(_receive(self.process.stdout))
+            except Exception as e:
+                outcome.append(e)
+
+        reader = threading.Thread(target=wait_ready, name="render-worker-ready", daemon=True)
+        reader.start()
+        reader.join(start_timeout)
+        if not outcome or isinstance(outcome[0], Exception):
+            # Killing the process also ends the reader, which gets EOF
+            self.process.kill()
+            self.process.wait()
+            if not outcome:
+                raise TimeoutError(f"render worker not ready within {start_timeout:.0f}s")
+            raise outcome[0]
+
+    def call(self, name: str, args: tuple):
+        _send(self.process.stdin, (name, args))
+        status, value = _receive(self.process.stdout)
+        self.jobs += 1
+        if status == "error":
+            raise RuntimeError(value)
+        return value
+
+    def stop(self) -> None:
+        try:
+            # Closing stdin ends the worker's loop
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except Exception:
+            self.process.kill()
+
+
+class RenderPool:
+    def __init__(self, workers: int = 2, max_queue: int = 16, max_jobs: int = 200, wait_seconds: float = 30.0,
+                 max_backoff: float = 60.0, start_timeout: float = 60.0):
+        self.workers = max(1, workers)
+        self.max_jobs = max(1, max_jobs)
+        self.wait_seconds = wait_seconds
+        self.max_backoff = max_backoff
+        self.start_timeout = start_timeout
+        self._idle: Queue[_Worker] = Queue()
+        # Jobs being rendered plus jobs waiting for a worker
+        self._slots = threading.BoundedSemaphore(self.workers + max(0, max_queue))
+        self._lock = threading.Lock()
+        self._started = False
+        self._stopped = threading.Event()
+        # Workers that are up (idle or busy), and starts still warming up rather than backing off
+        self._live = 0
+        self._warming = 0
+        self.counters = {"jobs": 0, "failed": 0, "rejected": 0, "started_workers": 0, "recycled": 0, "crashed": 0,
+                         "start_failures": 0, "in_process": 0}
+        self.render_seconds = 0.0
+
+    def start(self) -> None:
+        """Start the workers in the background (they take about a second to warm up)."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for _ in range(self.workers):
+            self._replace()
+
+    def _replace(self) -> None:
+        with self._lock:
+            self._warming += 1
+
+        def launch():
+            delay = 1.0
+            while not self._stopped.is_set():
+                try:
+                    worker = _Worker(self.start_timeout)
+                except Exception as e:
+                    with self._lock:
+                        self.counters["start_failures"] += 1
+                        self._warming -= 1
+                    print(f"Render worker failed to start, retrying in {delay:.0f}s: {e}")
+                    if self._stopped.wait(delay):
+                        return
+                    delay = min(delay * 2, self.max_backoff)
+                    with self._lock:
+                        self._warming += 1
+                    continue
+                with self._lock:
+                    self.counters["started_workers"] += 1
+                    self._warming -= 1
+                    self._live += 1
+                self._idle.put(worker)
+                return
+            with self._lock:
+                self._warming -= 1
+
+        threading.Thread(target=launch, name="render-worker-start", daemon=True).start()
+
+    def _retire(self, worker: _Worker) -> None:
+        worker.stop()
+        with self._lock:
+            self._live -= 1
+
+    def _no_workers(self) -> bool:
+        with self._lock:
+            return self._live == 0 and self._warming == 0
+
+    def _get_worker(self) -> _Worker | None:
+        """A free worker, or None when there is none alive to wait for."""
+        deadline = time.perf_counter() + self.wait_seconds
+        while True:
+            if self._no_workers():
+                return None
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise RenderQueueFull(f"No render worker free within {self.wait_seconds:.0f}s")
+            try:
+                # Short waits, so a pool whose last worker has just died is noticed
+                return self._idle.get(timeout=min(remaining, 0.5))
+            except Empty:
+                pass
+
+    def _render_here(self, name: str, args: tuple):
+        import chart_render
+        started = time.perf_counter()
+        try:
+            result = getattr(chart_render, name)(*args)
+        except Exception:
+            with self._lock:
+                self.counters["failed"] += 1
+            raise
+        with self._lock:
+            self.counters["in_process"] += 1
+            self.render_seconds += time.perf_counter() - started
+        return result
+
+    def _call(self, name: str, args: tuple):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.counters["rejected"] += 1
+            raise RenderQueueFull("Too many charts waiting to be rendered")
+        try:
+            self.start()
+            worker = self._get_worker()
+            if worker is None:
+                return self._render_here(name, args)
+            started = time.perf_counter()
+            try:
+                result = worker.call(name, args)
+            except (EOFError, OSError) as e:
+                self._retire(worker)
+                self._replace()
+                with self._lock:
+                    self.counters["crashed"] += 1
+                raise RuntimeError(f"Render worker died: {e}")
+            except Exception:
+                self._release(worker)
+                with self._lock:
+                    self.counters["failed"] += 1
+                raise
+            self._release(worker)
+            with self._lock:
+                self.counters["jobs"] += 1
+                self.render_seconds += time.perf_counter() - started
+            return result
+        finally:
+            self._slots.release()
+
+    def _release(self, worker: _Worker) -> None:
+        if worker.jobs < self.max_jobs:
+            self._idle.put(worker)
+            return
+        # Long-lived matplotlib processes grow; start a fresh one
+        self._retire(worker)
+        self._replace()
+        with self._lock:
+            self.counters["recycled"] += 1
+
+    def render(self, spec, profile: str = "pdf") -> bytes:
+        return self._call("render_chart", (spec, profile))
+
+    def render_pages(self, specs: list, profile: str = "pdf") -> bytes:
+        return self._call("render_pages", (specs, profile))
+
+    def stop(self) -> None:
+        self._stopped.set()
+        while True:
+            try:
+                self._retire(self._idle.get_nowait())
+            except Empty:
+                return
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self.counters,
+                "workers": self.workers,
+                "live_workers": self._live,
+                "idle_workers": self._idle.qsize(),
+                "render_seconds": round(self.render_seconds, 3),
+            }
+
+
+def _warm_up(chart_render) -> None:
+    spec = chart_render.ChartSpec("single", "bar", "Warm-up", "Branch Name", ["A", "B"], [[1.0, 2.0]],
+                                  ["Row Total"], ["Row Total"], ["sum"])
+    # One file per writer backend and font setting, so each is imported and its fonts loaded
+    for profile in ("png", "pdf", "svg", "print"):
+        chart_render.render_chart(spec, profile)
+
+
+def _serve() -> None:
+    requests, replies = sys.stdin.buffer, sys.stdout.buffer
+    # Stray prints must not end up in the reply stream
+    sys.stdout = sys.stderr
+    import chart_render
+    _warm_up(chart_render)
+    _send(replies, ("ready", os.getpid()))
+    while True:
+        try:
+            name, args = _receive(requests)
+        except EOFError:
+            return
+        except Exception as e:
+            # The whole message was read, so the stream is still in step
+            _send(replies, ("error", f"Bad render job: {e}"))
+            continue
+        try:
+            if name not in _JOBS:
+                raise ValueError(f"Unknown render job: {name}")
+            _send(replies, ("ok", getattr(chart_render, name)(*args)))
+        except Exception as e:
+            _send(replies, ("error", f"{type(e).__name__}: {e}"))
+
+
+if __name__ == "__main__":
+    _serve()
@@ -0,0 +1,92 @@
+"""Answered charts waiting to be downloaded, rendered on first access.
+
+``/api/query`` stores the chart's ``ChartSpec`` (its aggregated series, not the
+rows) under a random id and returns right away. ``render`` draws the chart
+with a render profile (PDF, PNG, thumbnail, SVG, ...) the first time that
+profile is asked for and keeps the bytes, so later downloads and the Slack
+upload reuse them. Concurrent first requests for the same
+report render it once. The store keeps the most recently used reports.
+With a ``RenderCache``, a report whose ``cache_key`` was rendered before (by
+any request, or before a restart) is read from disk instead of drawn.
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from chart_render import ChartSpec, profile_suffix, render_chart
+
+
+@dataclass
+class Report:
+    spec: ChartSpec
+    title: str
+    insights: str
+    # Download name without the extension
+    filename: str
+    dataset_version: str | None = None
+    # Content hash for the render cache (None = do not cache)
+    cache_key: str | None = None
+    # Profile name -> file bytes
+    rendered: dict[str, bytes] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+class ReportStore:
+    def __init__(self, max_reports: int = 256, render=render_chart, cache=None):
+        self.max_reports = max(1, max_reports)
+        self._render = render
+        self.cache = cache
+        self._reports: OrderedDict[str, Report] = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"stored": 0, "evicted": 0, "renders": 0, "reused": 0, "cache_hits": 0}
+        self.render_seconds = 0.0
+
+    def add(self, report: Report) -> str:
+        report_id = secrets.token_hex(8)
+        with self._lock:
+            self._reports[report_id] = report
+            self.counters["stored"] += 1
+            while len(self._reports) > self.max_reports:
+                self._reports.popitem(last=False)
+                self.counters["evicted"] += 1
+        return report_id
+
+    def get(self, report_id: str) -> Report | None:
+        with self._lock:
+            report = self._reports.get(report_id)
+            if report is not None:
+                self._reports.move_to_end(report_id)
+            return report
+
+    def render(self, report: Report, profile: str = "pdf") -> bytes:
+        """The report drawn with ``profile``, drawn now unless it was already"""
+        suffix = profile_suffix(profile)
+        with report.lock:
+            if profile in report.rendered:
+                with self._lock:
+                    self.counters["reused"] += 1
+                return report.rendered[profile]
+            cached = self.cache is not None and report.cache_key is not None
+            body = self.cache.get(report.cache_key, suffix) if cached else None
+            if body is not None:
+                report.rendered[profile] = body
+                with self._lock:
+                    self.counters["cache_hits"] += 1
+                return body
+            started = time.perf_counter()
+            body = self._render(report.spec, profile)
+            report.rendered[profile] = body
+            if cached:
+                self.cache.put(report.cache_key, suffix, body)
+        elapsed = time.perf_counter() - started
+        print(f"DEBUG: Rendered {profile} for '{report.title}' in {elapsed:.2f}s ({len(body)} bytes)")
+        with self._lock:
+            self.counters["renders"] += 1
+            self.render_seconds += elapsed
+        return body
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.counters, "reports": len(self._reports), "render_seconds": round(self.render_seconds, 3)}
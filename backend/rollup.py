@@ -0,0 +1,135 @@
+"""Pre-aggregated rollup cube over the Anandhaas sales data.
+
+The cube has one row per (Branch, Group, Category, SubGroup, day). The day
+column keeps the raw date column's name, so year-month and every other
+calendar filter can be evaluated on it exactly as on the raw rows. Each cube
+row stores, per measure, the sum, the non-null count and the sum of squares,
+plus the number of raw rows it represents. The filter code can run on it
+unchanged; only the aggregation step needs ``group_size``/``group_agg``.
+"""
+import numpy as np
+import pandas as pd
+
+from date_index import add_calendar_columns
+
+CUBE_DIMENSIONS = ["Branch Name", "Group Name", "Category", "SubGroup"]
+CUBE_MEASURES = ["Row Total", "Quantity"]
+CUBE_AGGREGATIONS = {"sum", "mean", "count", "std", "var"}
+
+ROW_COUNT = "__rows"
+COUNT_SUFFIX = "__count"
+SUMSQ_SUFFIX = "__sumsq"
+
+_CUBE_FILTERS = {
+    "date_month", "date_month_in", "date_year", "date_year_in", "date_specific",
+    "Category_in", "Branch_in", "Group_in", "SubGroup_in",
+}
+_IN_FILTER_COLUMNS = {
+    "Category_in": "Category",
+    "Branch_in": "Branch Name",
+    "Group_in": "Group Name",
+    "SubGroup_in": "SubGroup",
+}
+
+
+def build_rollup_cube(df: pd.DataFrame, date_col: str = "Date") -> pd.DataFrame | None:
+    """Aggregate the raw rows into the rollup cube."""
+    if df is None or df.empty or date_col not in df.columns:
+        return None
+    dims = [c for c in CUBE_DIMENSIONS if c in df.columns]
+    measures = [c for c in CUBE_MEASURES if c in df.columns]
+    dates = df[date_col]
+    days = dates.dt.normalize()
+
+    keyed = pd.DataFrame({c: df[c] for c in dims})
+    keyed[date_col] = days
+    for m in measures:
+        values = df[m].astype("float64")
+        keyed[m] = values
+        keyed[m + COUNT_SUFFIX] = values.notna().astype("int64")
+        keyed[m + SUMSQ_SUFFIX] = values * values
+    keyed[ROW_COUNT] = 1
+
+    cube = (
+        keyed.groupby(dims + [date_col], observed=True, dropna=False, sort=False)
+        .sum()
+        .reset_index()
+    )
+    # Same date index as the raw frame, so date filters slice the cube too
+    cube = add_calendar_columns(cube, date_col)
+    # Days only stand in for timestamps when the raw dates carry no time of day
+    cube.attrs["date_col"] = date_col
+    cube.attrs["day_exact"] = bool(((dates == days) | dates.isna()).all())
+    cube.attrs["dimensions"] = dims
+    cube.attrs["measures"] = measures
+    print(f"Built rollup cube: {len(cube)} cells from {len(df)} records")
+    return cube
+
+
+def is_cube(frame: pd.DataFrame) -> bool:
+    return ROW_COUNT in frame.columns
+
+
+def cube_supports_plan(cube: pd.DataFrame | None, plan: dict) -> bool:
+    """True when every filter, the x axis and every metric can be answered from the cube."""
+    if cube is None:
+        return False
+    date_col = cube.attrs["date_col"]
+    day_exact = cube.attrs["day_exact"]
+    dims = cube.attrs["dimensions"]
+    measures = cube.attrs["measures"]
+
+    axes = set(dims) | {"Month"}
+    if day_exact:
+        axes.add(date_col)
+    if plan.get("x_axis", "Branch Name") not in axes:
+        return False
+
+    metrics = [(plan.get("y_axis", "Row Total"), plan.get("aggregation", "sum"))]
+    if plan.get("dual_metrics", False) or plan.get("y_axis") == "dual":
+        metrics.append((plan.get("y_axis_secondary", "Quantity"), plan.get("aggregation_secondary", "sum")))
+    for column, agg in metrics:
+        if column == "count":
+            continue
+        if column not in measures or agg not in CUBE_AGGREGATIONS:
+            return False
+
+    for filter_type, _ in plan.get("filters", []):
+        if filter_type in dims:
+            continue
+        if filter_type == "date_range" and day_exact:
+            continue
+        if filter_type in _IN_FILTER_COLUMNS and _IN_FILTER_COLUMNS[filter_type] not in dims:
+            return False
+        if filter_type not in _CUBE_FILTERS:
+            return False
+    return True
+
+
+def group_size(frame: pd.DataFrame, keys) -> pd.Series:
+    """Row count per group, for raw rows or cube cells."""
+    if is_cube(frame):
+        return frame.groupby(keys, observed=True)[ROW_COUNT].sum()
+    return frame.groupby(keys, observed=True).size()
+
+
+def group_agg(frame: pd.DataFrame, keys, column: str, agg: str) -> pd.Series:
+    """``groupby(keys)[column].agg(agg)`` for raw rows or cube cells."""
+    grouped = frame.groupby(keys, observed=True)
+    if not is_cube(frame):
+        return grouped[column].agg(agg)
+    if agg not in CUBE_AGGREGATIONS:
+        raise ValueError(f"Aggregation '{agg}' cannot be answered from the rollup cube")
+
+    total = grouped[column].sum()
+    if agg == "sum":
+        return total
+    count = grouped[column + COUNT_SUFFIX].sum().rename(column)
+    if agg == "count":
+        return count
+    mean = total / count.where(count > 0)
+    if agg == "mean":
+        return mean
+    sumsq = grouped[column + SUMSQ_SUFFIX].sum()
+    var = ((sumsq - count * mean * mean) / (count - 1).where(count > 1)).clip(lower=0)
+    return var if agg == "var" else np.sqrt(var)
@@ -0,0 +1,286 @@
+"""Parquet dataset loader for the S3 ``output/`` prefix.
+
+Files are read through ranged GETs, so only the footer, the projected
+columns and the row groups whose ``Date`` statistics overlap the requested
+window are downloaded. The footer takes one GET and each row group one more:
+its projected column chunks are fetched together before pyarrow decodes it,
+instead of one GET per pyarrow read. Each row group is decoded and converted
+to pandas on its own; nothing ever holds a whole object body, or a whole
+Arrow table next to the DataFrame made from it, in memory.
+"""
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pandas.api.types import union_categoricals
+
+DATASET_COLUMNS = [
+    "Date",
+    "Branch Name",
+    "Group Name",
+    "Category",
+    "SubGroup",
+    "Item/Service Description",
+    "Customer/Vendor Name",
+    "Row Total",
+    "Quantity",
+]
+
+# Bytes of the object tail fetched with the first read; covers the footer of most files
+FOOTER_PREFETCH_BYTES = int(os.getenv("ANANDHAAS_PARQUET_FOOTER_BYTES", str(64 * 1024)))
+# Column chunks of a row group this close together share a GET; the gap is downloaded and thrown away
+COALESCE_GAP_BYTES = int(os.getenv("ANANDHAAS_PARQUET_COALESCE_GAP", str(1024 * 1024)))
+
+
+class S3RangeFile(io.RawIOBase):
+    """Seekable read-only file over one S3 object, backed by ranged GETs."""
+
+    def __init__(self, s3_client, bucket: str, key: str, size: int | None = None):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        if size is None:
+            size = s3_client.head_object(Bucket=bucket, Key=key)["ContentLength"]
+        self.size = size
+        self.position = 0
+        self.bytes_fetched = 0
+        self.requests = 0
+        # (start, bytes) spans already downloaded: the footer and the current row group
+        self._footer = None
+        self._buffers = []
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        elif whence == io.SEEK_END:
+            self.position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        return self.position
+
+    def _get(self, start: int, end: int) -> bytes:
+        """Bytes ``start`` to ``end`` (inclusive) in one ranged GET."""
+        response = self.s3_client.get_object(Bucket=self.bucket, Key=self.key, Range=f"bytes={start}-{end}")
+        chunk = response["Body"].read()
+        self.requests += 1
+        self.bytes_fetched += len(chunk)
+        return chunk
+
+    def prefetch(self, ranges: list[tuple[int, int]]) -> None:
+        """Download the (offset, length) ranges, merging close ones, for the reads that follow.
+
+        Replaces whatever the previous prefetch downloaded.
+        """
+        spans = []
+        for offset, length in sorted(ranges):
+            end = min(offset + length, self.size)
+            if spans and offset - spans[-1][1] <= COALESCE_GAP_BYTES:
+                spans[-1][1] = max(spans[-1][1], end)
+            elif end > offset:
+                spans.append([offset, end])
+        self._buffers = [(start, self._get(start, end - 1)) for start, end in spans]
+
+    def release(self) -> None:
+        """Drop the prefetched ranges."""
+        self._buffers = []
+
+    def _cached(self, length: int):
+        if self._footer is None and self.position + length > self.size - FOOTER_PREFETCH_BYTES:
+            # pyarrow reads the footer length, then the footer: one GET covers both
+            start = max(0, self.size - FOOTER_PREFETCH_BYTES)
+            self._footer = (start, self._get(start, self.size - 1))
+        for start, data in ([self._footer] if self._footer else []) + self._buffers:
+            if start <= self.position and self.position + length <= start + len(data):
+                return memoryview(data)[self.position - start:self.position - start + length]
+        return None
+
+    def readinto(self, buffer) -> int:
+        if self.position >= self.size or len(buffer) == 0:
+            return 0
+        length = min(len(buffer), self.size - self.position)
+        chunk = self._cached(length)
+        if chunk is None:
+            chunk = self._get(self.position, self.position + length - 1)
+        buffer[: len(chunk)] = chunk
+        self.position += len(chunk)
+        return len(chunk)
+
+
+def list_parquet_objects(s3_client, bucket: str, prefix: str) -> list[dict]:
+    """All ``.parquet`` objects under ``prefix`` (Spark ``_SUCCESS`` markers etc. skipped)."""
+    objects = []
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            if obj["Key"].endswith(".parquet") and obj.get("Size", 0) > 0:
+                objects.append(obj)
+    return sorted(objects, key=lambda o: o["Key"])
+
+
+def _as_timestamp(value) -> pd.Timestamp | None:
+    try:
+        ts = pd.Timestamp(value)
+    except (TypeError, ValueError):
+        return None
+    if pd.isna(ts):
+        return None
+    return ts.tz_localize(None) if ts.tzinfo else ts
+
+
+def row_group_overlaps(metadata: pq.FileMetaData, index: int, date_col: str, since: pd.Timestamp | None) -> bool:
+    """False only when the row group's statistics prove every date is before ``since``."""
+    if since is None:
+        return True
+    row_group = metadata.row_group(index)
+    for i in range(row_group.num_columns):
+        column = row_group.column(i)
+        if column.path_in_schema != date_col:
+            continue
+        stats = column.statistics
+        if stats is None or not stats.has_min_max:
+            return True
+        newest = _as_timestamp(stats.max)
+        return newest is None or newest >= since
+    return True
+
+
+def column_chunk_ranges(metadata: pq.FileMetaData, index: int, columns: list[str]) -> list[tuple[int, int]]:
+    """(offset, length) of the row group's column chunks for ``columns``."""
+    row_group = metadata.row_group(index)
+    ranges = []
+    for i in range(row_group.num_columns):
+        column = row_group.column(i)
+        if column.path_in_schema.split(".")[0] not in columns:
+            continue
+        start = column.data_page_offset
+        if column.has_dictionary_page and 0 < column.dictionary_page_offset < start:
+            start = column.dictionary_page_offset
+        ranges.append((start, column.total_compressed_size))
+    return ranges
+
+
+def drop_before(df: pd.DataFrame, date_col: str, since: pd.Timestamp | None) -> pd.DataFrame:
+    """Rows dated on/after ``since`` (row group statistics only skip whole groups)."""
+    if since is None or date_col not in df.columns:
+        return df
+    dates = pd.to_datetime(df[date_col], errors="coerce")
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_localize(None)
+    return df[dates >= since]
+
+
+def _strings(categorical: pd.Series) -> pd.Series:
+    """A categorical of strings as objects, nulls as None."""
+    values = categorical.cat.categories.to_numpy(dtype=object)
+    # Code -1 (null) picks the None appended after the categories
+    return pd.Series(np.append(values, None)[categorical.cat.codes.to_numpy()], index=categorical.index)
+
+
+def _missing(index: pd.Index, like: pd.Series) -> pd.Series:
+    """Nulls standing in for a column a file does not have, typed like the files that do."""
+    if like.dtype.kind in "iuf":
+        return pd.Series(np.nan, index=index)
+    if like.dtype.kind == "M":
+        return pd.Series(pd.NaT, index=index, dtype=like.dtype)
+    return pd.Series(np.full(len(index), None, dtype=object), index=index)
+
+
+def concat_frames(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """One frame from the per-row-group frames, built a column at a time.
+
+    Each input column is dropped as soon as it has been copied, so the inputs
+    shrink while the result grows. String columns arrive as categoricals; their
+    categories are merged so every distinct string is one Python object shared
+    by all its rows, as a single ``to_pandas`` of the whole table gives, and
+    nulls come back as None. ``frames`` is emptied.
+    """
+    columns = list(dict.fromkeys(c for frame in frames for c in frame.columns))
+    data = {}
+    for column in columns:
+        like = next(frame[column] for frame in frames if column in frame.columns)
+        parts = [frame.pop(column) if column in frame.columns else _missing(frame.index, like) for frame in frames]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            data[column] = _strings(pd.Series(union_categoricals(parts)))
+        else:
+            # Schemas differ between files: all-null or missing columns
+            parts = [_strings(part) if isinstance(part.dtype, pd.CategoricalDtype) else part for part in parts]
+            if all(part.dtype == object for part in parts):
+                # pd.concat would turn all-None parts into NaN
+                data[column] = np.concatenate([part.to_numpy() for part in parts])
+            else:
+                data[column] = pd.concat(parts, ignore_index=True)
+        del like, parts
+    frames.clear()
+    return pd.DataFrame(data, copy=False)
+
+
+def read_parquet_file(source, columns: list[str] | None = None, date_col: str = "Date",
+                      since: pd.Timestamp | None = None) -> tuple[list[pd.DataFrame], int, int]:
+    """The projected columns of the row groups that can hold rows on/after ``since``, one frame per group."""
+    schema = pq.ParquetFile(source).schema_arrow
+    projected = [c for c in (columns or schema.names) if c in schema.names]
+    # Strings arrive as categoricals so each row group holds every distinct value once (see concat_frames)
+    strings = [c for c in projected if pa.types.is_string(schema.field(c).type) or pa.types.is_large_string(schema.field(c).type)]
+    parquet_file = pq.ParquetFile(source, read_dictionary=strings)
+    frames = []
+    skipped = 0
+    for index in range(parquet_file.num_row_groups):
+        if not row_group_overlaps(parquet_file.metadata, index, date_col, since):
+            skipped += 1
+            continue
+        if isinstance(source, S3RangeFile):
+            source.prefetch(column_chunk_ranges(parquet_file.metadata, index, projected))
+        table = parquet_file.read_row_group(index, columns=projected)
+        if isinstance(source, S3RangeFile):
+            source.release()
+        # self_destruct frees each Arrow column as soon as it has been converted
+        frames.append(drop_before(table.to_pandas(self_destruct=True, split_blocks=True), date_col, since))
+        del table
+    return frames, parquet_file.num_row_groups, skipped
+
+
+def load_parquet_dataset(s3_client, bucket: str, prefix: str, columns: list[str] | None = None,
+                         date_col: str = "Date", since: pd.Timestamp | None = None,
+                         objects: list[dict] | None = None) -> pd.DataFrame | None:
+    """Load every parquet file under ``s3://bucket/prefix`` (or just ``objects``) into one DataFrame."""
+    if objects is None:
+        objects = list_parquet_objects(s3_client, bucket, prefix)
+    if not objects:
+        print(f"No parquet files found under s3://{bucket}/{prefix}")
+        return None
+
+    frames = []
+    total_groups = skipped_groups = fetched = requests = 0
+    for obj in objects:
+        source = S3RangeFile(s3_client, bucket, obj["Key"], size=obj["Size"])
+        file_frames, groups, skipped = read_parquet_file(source, columns, date_col, since)
+        frames.extend(file_frames)
+        total_groups += groups
+        skipped_groups += skipped
+        fetched += source.bytes_fetched
+        requests += source.requests
+    print(
+        f"Read {len(objects)} parquet files from s3://{bucket}/{prefix}: "
+        f"{total_groups - skipped_groups}/{total_groups} row groups, "
+        f"{fetched / 1e6:.1f} MB downloaded in {requests} GETs"
+    )
+    if not frames:
+        return None
+
+    df = concat_frames(frames)
+    del frames
+    return df
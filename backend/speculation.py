@@ -0,0 +1,85 @@
+"""Run likely work on a worker while the planner is still thinking.
+
+``Speculator.submit`` starts ``fn`` on a small thread pool under a key that
+describes what it computes; once the real answer is known, ``claim`` hands
+back the result if the keys match and discards it otherwise. Each claim
+records whether the guess was right and how much of the work overlapped the
+wait, which is the latency a hit saves.
+"""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+
+
+@dataclass
+class Speculation:
+    key: object
+    future: Future
+    # perf_counter when the worker picked the work up and when it finished
+    started: float | None = None
+    finished: float | None = None
+
+
+class Speculator:
+    def __init__(self, workers: int = 2, name: str = "speculate"):
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self.counters = {"started": 0, "hits": 0, "misses": 0, "failed": 0}
+        self.seconds_saved = 0.0
+        self.seconds_wasted = 0.0
+
+    def submit(self, key, fn, *args) -> Speculation:
+        speculation = Speculation(key, Future())
+
+        def run():
+            speculation.started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                speculation.finished = time.perf_counter()
+
+        speculation.future = self._executor.submit(run)
+        with self._lock:
+            self.counters["started"] += 1
+        return speculation
+
+    def claim(self, speculation: Speculation | None, key):
+        """The speculative result if it was computed for ``key``, else None."""
+        if speculation is None:
+            return None
+        claimed = time.perf_counter()
+        if speculation.key != key:
+            if not speculation.future.cancel():
+                # Already running; let it finish in the background and count what it cost
+                speculation.future.add_done_callback(lambda _: self._wasted(speculation))
+            with self._lock:
+                self.counters["misses"] += 1
+            return None
+        try:
+            result = speculation.future.result()
+        except Exception as e:
+            print(f"Speculative work failed: {e}")
+            with self._lock:
+                self.counters["failed"] += 1
+            return None
+        # Only the part that ran before the real answer arrived was saved
+        saved = min(speculation.finished, claimed) - speculation.started if speculation.started < claimed else 0.0
+        with self._lock:
+            self.counters["hits"] += 1
+            self.seconds_saved += saved
+        return result
+
+    def _wasted(self, speculation: Speculation) -> None:
+        with self._lock:
+            self.seconds_wasted += speculation.finished - speculation.started
+
+    def stats(self) -> dict:
+        with self._lock:
+            claimed = self.counters["hits"] + self.counters["misses"] + self.counters["failed"]
+            return {
+                **self.counters,
+                "hit_rate": self.counters["hits"] / claimed if claimed else None,
+                "seconds_saved": round(self.seconds_saved, 3),
+                "seconds_wasted": round(self.seconds_wasted, 3),
+            }
@@ -0,0 +1,78 @@
+"""Trend lines over the date column: resampling and downsampling.
+
+``resample`` aggregates rows (raw or rollup cube cells) per day, week
+(starting Monday) or month, oldest first. Multi-year daily data still has
+thousands of points. ``downsample`` keeps a fixed number of them, chosen with
+largest-triangle-three-buckets (LTTB; Steinarsson, 2013). It keeps the first and
+last point and, from each bucket in between, the point that forms the
+largest triangle with the point kept before it and the average of the next
+bucket. Peaks and dips survive, which plain averaging or every-n-th sampling
+would flatten or skip.
+"""
+import numpy as np
+import pandas as pd
+
+from rollup import group_agg, group_size
+
+GRANULARITIES = ("day", "week", "month")
+
+
+def period_starts(dates: pd.Series, granularity: str) -> pd.Series:
+    """The first day of each date's day, week or month."""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity: {granularity}")
+    days = dates.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+    if granularity == "month":
+        days = days.astype("datetime64[M]").astype("datetime64[D]")
+    elif granularity == "week":
+        # 1970-01-01 was a Thursday, so day number + 3 is 0 on Mondays (mod 7)
+        days = days - (days.astype(np.int64) + 3) % 7
+    return pd.Series(days.astype("datetime64[ns]"), index=dates.index, name="Period")
+
+
+def resample(frame: pd.DataFrame, date_col: str, y_col: str, agg: str, granularity: str) -> pd.Series:
+    """``agg`` of ``y_col`` (or the row count for "count") per period, indexed by period start."""
+    periods = period_starts(frame[date_col], granularity)
+    if y_col == "count":
+        return group_size(frame, periods)
+    return group_agg(frame, periods, y_col, agg)
+
+
+def period_labels(starts: pd.DatetimeIndex, granularity: str) -> list[str]:
+    # Months read like the "Month" axis; days and weeks (by their Monday) as ISO dates
+    return list(starts.strftime("%B %Y" if granularity == "month" else "%Y-%m-%d"))
+
+
+def lttb(x: np.ndarray, y: np.ndarray, target: int) -> np.ndarray:
+    """Positions of the ``target`` points of (x, y) that LTTB keeps, in order."""
+    n = len(x)
+    if target >= n or target < 3:
+        return np.arange(n)
+    kept = np.empty(target, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    # target - 2 buckets between the first and the last point; each holds at least one point
+    edges = np.linspace(1, n - 1, target - 1).astype(np.int64)
+    previous = 0
+    for bucket in range(target - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_x, next_y = x[end:edges[bucket + 2]].mean(), y[end:edges[bucket + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        # Twice the triangle area; the constant factor does not change the argmax
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        kept[bucket + 1] = previous
+    return kept
+
+
+def downsample(series: pd.Series, target: int) -> pd.Series:
+    """At most ``target`` points of a series indexed by date, chosen with LTTB."""
+    if len(series) <= target:
+        return series
+    x = series.index.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(np.float64)
+    y = series.to_numpy(dtype=np.float64)
+    return series.iloc[lttb(x, y, target)]
@@ -228,13 +228,31 @@ export default function VoiceAssistant() {
     }
   }
 
+  // Charts are rendered by the backend on first download; older backends inline the PDF instead
+  function hasReport(data) {
+    return Boolean(data && (data.report_id || data.pdf_base64));
+  }
+
+  function reportUrl(data, format) {
+    return `${API_BASE}/report/${data.report_id}.${format}`;
+  }
+
   async function handleDownloadPDF() {
-    if (!chartData || !chartData.pdf_base64) {
+    if (!hasReport(chartData)) {
       alert('No PDF available to download');
       return;
     }
     
     try {
+      if (chartData.report_id) {
+        const link = document.createElement('a');
+        link.href = `${reportUrl(chartData, 'pdf')}?download=1`;
+        link.download = chartData.pdf_filename || 'report.pdf';
+        document.body.appendChild(link);
+        link.click();
+        document.body.removeChild(link);
+        return;
+      }
       const byteCharacters = atob(chartData.pdf_base64);
       const byteNumbers = new Array(byteCharacters.length);
       for (let i = 0; i < byteCharacters.length; i++) {
@@ -258,7 +276,7 @@ export default function VoiceAssistant() {
   }
 
   async function handleSendToSlack() {
-    if (!chartData || !chartData.pdf_base64) {
+    if (!hasReport(chartData)) {
       alert('No report available to send');
       return;
     }
@@ -622,7 +640,7 @@ export default function VoiceAssistant() {
         </div>
 
         {/* PDF and Slack Actions */}
-        {chartData && chartData.pdf_base64 && (
+        {hasReport(chartData) && (
           <div className="mt-6 p-4 bg-slate-50 rounded-xl border">
             <h4 className="font-semibold text-slate-800 mb-3">Export Options</h4>
             <div className="flex gap-3 items-center">
@@ -690,9 +708,9 @@ export default function VoiceAssistant() {
               </button>
             </div>
             <div className="flex-1 p-6 overflow-auto">
-              {chartData.pdf_base64 ? (
+              {hasReport(chartData) ? (
                 <iframe
-                  src={`data:application/pdf;base64,${chartData.pdf_base64}`}
+                  src={chartData.report_id ? reportUrl(chartData, 'pdf') : `data:application/pdf;base64,${chartData.pdf_base64}`}
                   className="w-full h-full border-0 rounded-lg"
                   title="Chart PDF"
                 />